@@ -0,0 +1,34 @@
+# tests/test_evaluation.py
+import numpy as np
+import pytest
+
+from src.evaluation import bootstrap_ci, bootstrap_metric, mae
+
+def _data(n=301, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.normal(size=n)
+    return y, y + rng.normal(size=n)
+
+@pytest.mark.parametrize("fn", ["mae", "auc", mae])
+@pytest.mark.parametrize("method", ["iid", "block", "stationary"])
+def test_samples_independent_of_chunk_size_and_n_jobs(fn, method):
+    y, p = _data()
+    if fn == "auc":
+        y = (y > 0).astype(int)
+    ref = bootstrap_ci(y, p, fn, n_boot=150, method=method, return_samples=True)["samples"]
+    for chunk_size, n_jobs in [(1, 1), (7, 1), (64, 2)]:
+        got = bootstrap_ci(y, p, fn, n_boot=150, method=method, chunk_size=chunk_size,
+                           n_jobs=n_jobs, return_samples=True)["samples"]
+        assert np.array_equal(got, ref)
+
+def test_prefix_of_longer_run():
+    y, p = _data()
+    short = bootstrap_ci(y, p, "mae", n_boot=100, return_samples=True)["samples"]
+    long = bootstrap_ci(y, p, "mae", n_boot=250, chunk_size=32, return_samples=True)["samples"]
+    assert np.array_equal(long[:100], short)
+
+def test_vectorized_matches_callable():
+    y, p = _data()
+    a = bootstrap_metric(y, p, mae, n_boot=200)
+    b = bootstrap_ci(y, p, "mae", n_boot=200, chunk_size=50)
+    assert a == pytest.approx(b, rel=1e-12)
@@ -1,30 +1,140 @@
-from flask import Flask, request, jsonify, Response
-import joblib
+from flask import Flask, request, jsonify, Response, g
 from pathlib import Path
 import numpy as np
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import io, base64
+import base64, hmac, os, time
 
-from src.model_io import ensure_model, load_bundle, save_bundle, MODEL_PATH, DEFAULT_FEATURES
-from src.analysis import validate_features, run_full_analysis
+# Serving imports stay NumPy-only for a fast cold start. pandas / sklearn / matplotlib are
+# imported inside the routes that need them (batch bodies, /plot, analysis, thresholds).
+from src.registry import ModelRegistry, ModelHolder, UnknownModelVersion
+from src.validation import validate_features, validate_batch
+from src.batching import MicroBatcher
+from src.metrics import best_threshold
+from src.jobs import JobRunner
+from src.plots import LRUCache, plot_etag, sweep_grid, render_proba_curve
+from src.feature_store import FeatureStore, WINDOW
+from src.instrument import METRICS, REQUEST_SECONDS, REQUESTS_TOTAL, sampled, stage_timer
+
+REPORTS = Path("reports")
 
 app = Flask(__name__)
 
-# Load or train-once at startup
-bundle = ensure_model(features=DEFAULT_FEATURES, threshold=0.44)
-pipe = bundle["pipeline"]
-FEATURES = bundle["features"]
-THRESH = float(bundle.get("threshold", 0.50))
+# Binary batch bodies, keyed by request mimetype
+BATCH_BINARY_TYPES = {
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.parquet": "parquet",
+}
+
+# Versioned model registry; seed it from model/model.pkl (train-once) on first start
+registry = ModelRegistry()
+if registry.current() is None:
+    from src.model_io import ensure_model, DEFAULT_FEATURES
+    registry.publish(ensure_model(features=DEFAULT_FEATURES, threshold=0.44))
+
+# Closed-form NumPy scorer by default; FAST_SCORER=0 falls back to the sklearn pipeline.
+# MODEL_RELOAD_SECONDS: how often requests re-check the registry's CURRENT pointer.
+holder = ModelHolder(registry, keep_warm=int(os.getenv("MODELS_WARM", "2")),
+                     check_interval=float(os.getenv("MODEL_RELOAD_SECONDS", "2")),
+                     fast=os.getenv("FAST_SCORER", "1") != "0")
+
+def predict_proba_up(X: np.ndarray) -> np.ndarray:
+    return holder.current.predict_proba_up(X)
+
+@app.before_request
+def _before_request():
+    # METRICS_SAMPLE_RATE decides once per request whether its timings are recorded
+    g.sampled = sampled()
+    g.t0 = time.perf_counter()
+    holder.maybe_reload()
+
+@app.after_request
+def _after_request(resp):
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    REQUESTS_TOTAL.inc(route=route, method=request.method, status=resp.status_code)
+    if g.get("sampled"):
+        REQUEST_SECONDS.observe(time.perf_counter() - g.t0, route=route, method=request.method,
+                                status=resp.status_code)
+    return resp
+
+def _model():
+    """
+    Model for this request: ?model=<version> pins a stored version, else the A/B split / current.
+    Raises UnknownModelVersion (-> 404) for an id that is malformed or not in the registry.
+    """
+    version = request.args.get("model")
+    if version:
+        return holder.get(version)
+    return holder.pick(request.headers.get("X-Routing-Key"))
+
+# Optional request coalescing for /predict: COALESCE_WINDOW_MS=2 COALESCE_MAX_BATCH=256
+_window_ms = float(os.getenv("COALESCE_WINDOW_MS", "0"))
+batcher = (MicroBatcher(predict_proba_up, len(holder.current.features),
+                        max_batch=int(os.getenv("COALESCE_MAX_BATCH", "256")),
+                        max_wait_ms=_window_ms) if _window_ms > 0 else None)
+
+# Online feature store: per-ticker ring buffers of recent bars, fed by POST /bars/<symbol>
+store = FeatureStore(window=int(os.getenv("STORE_WINDOW", str(WINDOW))))
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status":"ok","model":"loaded","features":FEATURES,"threshold":THRESH})
+    m = holder.current
+    return jsonify({"status":"ok","model":"loaded","features":m.features,"threshold":m.threshold,
+                    "version": m.version, "scorer": "compiled" if m.scorer is not None else "sklearn"})
 
 @app.route("/features", methods=["GET"])
 def features():
-    return jsonify({"features": FEATURES, "threshold": THRESH})
+    m = holder.current
+    return jsonify({"features": m.features, "threshold": m.threshold})
+
+@app.route("/models", methods=["GET"])
+def models():
+    ab = holder.ab
+    return jsonify({"current": holder.current.version, "warm": holder.warm_versions(),
+                    "ab": {"version": ab[0], "fraction": ab[1]} if ab else None,
+                    "versions": registry.versions()})
+
+# Changing the served model is an admin action: POST /models/current and /models/ab need
+# "Authorization: Bearer $MODEL_ADMIN_TOKEN" and are disabled while MODEL_ADMIN_TOKEN is unset.
+ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "")
+
+def _admin_denied():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Model admin endpoints are disabled; set MODEL_ADMIN_TOKEN."}), 403
+    given = request.headers.get("Authorization", "").encode()
+    if not hmac.compare_digest(given, f"Bearer {ADMIN_TOKEN}".encode()):
+        return jsonify({"error": "Admin token required."}), 401
+    return None
+
+@app.route("/models/current", methods=["POST"])
+def set_current_model():
+    """POST {"version": "<id>"}: promote a stored version; swaps in without a restart."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        registry.set_current(str((request.get_json(force=True) or {})["version"]))
+        holder.reload()
+        return jsonify({"current": holder.current.version})
+    except UnknownModelVersion as e:
+        return jsonify({"error": e.args[0]}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/models/ab", methods=["POST"])
+def set_ab_split():
+    """POST {"version": "<id>", "fraction": 0.1} routes that share of X-Routing-Key values to it; {} clears."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        payload = request.get_json(force=True) or {}
+        holder.set_ab(payload.get("version"), float(payload.get("fraction", 0.0)))
+        return jsonify({"ab": payload if holder.ab else None, "warm": holder.warm_versions()})
+    except UnknownModelVersion as e:
+        return jsonify({"error": e.args[0]}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route("/predict", methods=["POST"])
 def predict():
@@ -33,14 +143,143 @@ def predict():
     {"features": {"gap_pct":..., "daily_range_pct":..., ...}}
     """
     try:
+        t = stage_timer("/predict", g.sampled)
+        m = _model()
         payload = request.get_json(force=True)
-        X = validate_features(payload, FEATURES)
-        p_up = float(pipe.predict_proba(X)[:,1])
-        yhat = int(p_up >= THRESH)
-        return jsonify({"prediction": yhat, "p_up": p_up, "threshold": THRESH})
+        t.lap("parse")
+        X = validate_features(payload, m.features)
+        t.lap("validate")
+        if batcher is not None:  # scored by m itself, even if the current model swaps meanwhile
+            p_up = batcher.score(X, model=m)
+        else:
+            p_up = m.score_one(X)
+        yhat = int(p_up >= m.threshold)
+        t.lap("score")
+        resp = jsonify({"prediction": yhat, "p_up": p_up, "threshold": m.threshold, "version": m.version})
+        t.lap("serialize")
+        return resp
+    except UnknownModelVersion as e:
+        return jsonify({"error": e.args[0]}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/bars/<symbol>", methods=["POST"])
+def push_bars(symbol: str):
+    """
+    POST JSON, oldest first (a single bar object is accepted too):
+    {"bars": [{"date": "2025-08-15T00:00:00-04:00", "open":..., "high":..., "low":..., "close":..., "volume":...}]}
+    """
+    try:
+        payload = request.get_json(force=True)
+        bars = payload.get("bars", payload) if isinstance(payload, dict) else payload
+        return jsonify({"symbol": symbol.upper(), **store.push(symbol, bars)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/bars/<symbol>", methods=["GET"])
+def ticker_state(symbol: str):
+    try:
+        return jsonify({"symbol": symbol.upper(), **store.info(symbol)})
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+
+@app.route("/predict/ticker/<symbol>", methods=["GET"])
+def predict_ticker(symbol: str):
+    """Score the latest pushed bar of `symbol` from the store (no features in the request)."""
+    t = stage_timer("/predict/ticker", g.sampled)
+    try:
+        m = _model()
+        X = store.vector(symbol, m.features)
+    except KeyError as e:  # unknown ticker, or UnknownModelVersion for ?model=
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    t.lap("features")
+    p_up = m.score_one(X)
+    t.lap("score")
+    return jsonify({"symbol": symbol.upper(), "prediction": int(p_up >= m.threshold), "p_up": p_up,
+                    "threshold": m.threshold, "version": m.version,
+                    "features": dict(zip(m.features, X[0].tolist()))})
+
+def _serving_metrics():
+    """Scrape-time gauges: served model, plot cache and (if enabled) the micro-batcher."""
+    lines = ["# HELP model_info Served model version (value is always 1).", "# TYPE model_info gauge",
+             f'model_info{{version="{holder.current.version}"}} 1',
+             "# HELP plot_cache_entries Rendered plots held in the LRU.", "# TYPE plot_cache_entries gauge",
+             f"plot_cache_entries {len(plot_cache)}",
+             "# HELP plot_cache_hits_total Plot cache hits.", "# TYPE plot_cache_hits_total counter",
+             f"plot_cache_hits_total {plot_cache.hits}",
+             "# HELP plot_cache_misses_total Plot renders.", "# TYPE plot_cache_misses_total counter",
+             f"plot_cache_misses_total {plot_cache.misses}"]
+    if batcher is not None:
+        st = batcher.stats()
+        lines += ["# HELP microbatch_queue_depth Rows waiting to be scored.", "# TYPE microbatch_queue_depth gauge",
+                  f"microbatch_queue_depth {st['queue_depth']}",
+                  "# HELP microbatch_batch_size Rows per coalesced batch.", "# TYPE microbatch_batch_size histogram"]
+        lines += [f'microbatch_batch_size_bucket{{le="{ub}"}} {n}' for ub, n in st["batch_size_hist"].items()]
+        lines += [f"microbatch_batch_size_sum {st['rows']}", f"microbatch_batch_size_count {st['batches']}",
+                  "# HELP microbatch_wait_seconds Time from enqueue to result, summed over rows.",
+                  "# TYPE microbatch_wait_seconds summary",
+                  f"microbatch_wait_seconds_sum {st['wait_seconds_sum']!r}",
+                  f"microbatch_wait_seconds_count {st['rows']}"]
+    return lines
+
+METRICS.add_collector(_serving_metrics)
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text format: request latency/stage histograms, pipeline spans, batcher, model."""
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/batcher", methods=["GET"])
+def batcher_metrics():
+    if batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **batcher.stats()})
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    POST JSON rows:     [{"gap_pct":..., ...}, ...]  or {"rows": [...]}
+    POST JSON columns:  {"columns": {"gap_pct": [...], ...}}
+    POST Arrow IPC / Parquet body with one column per feature.
+    Bad rows get null p_up/prediction and an entry in "errors"; the rest are scored together.
+    """
+    t = stage_timer("/predict/batch", g.sampled)
+    try:
+        m = _model()
+        fmt = BATCH_BINARY_TYPES.get(request.mimetype)
+        if fmt:
+            from src.utils_storage import read_df_bytes
+            payload = read_df_bytes(request.get_data(), fmt)
+        else:
+            payload = request.get_json(force=True)
+        t.lap("parse")
+        X, errors = validate_batch(payload, m.features)
+        t.lap("validate")
+    except UnknownModelVersion as e:
+        return jsonify({"error": e.args[0]}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+    ok = np.array([err is None for err in errors], dtype=bool)
+    p_up = np.full(len(errors), np.nan)
+    if ok.any():
+        p_up[ok] = m.predict_proba_up(X[ok])
+    yhat = (p_up >= m.threshold).astype(int)
+    t.lap("score")
+    resp = jsonify({
+        "n_rows": int(len(errors)),
+        "n_scored": int(ok.sum()),
+        "threshold": m.threshold,
+        "version": m.version,
+        "p_up": [float(p) if k else None for p, k in zip(p_up, ok)],
+        "prediction": [int(y) if k else None for y, k in zip(yhat, ok)],
+        "errors": [{"row": i, "error": err} for i, err in enumerate(errors) if err is not None],
+    })
+    t.lap("serialize")
+    return resp
+
 @app.route("/predict/<float:input1>", methods=["GET"])
 def predict_one(input1: float):
     return jsonify({"prediction": float(input1 * 2.0)})
@@ -49,32 +288,119 @@ def predict_one(input1: float):
 def predict_two(input1: float, input2: float):
     return jsonify({"prediction": float(input1 + input2)})
 
+# Rendered /plot PNGs, keyed by model version + query parameters
+plot_cache = LRUCache(maxsize=int(os.getenv("PLOT_CACHE_SIZE", "64")))
+
 @app.route("/plot", methods=["GET"])
 def plot():
-    grid = np.linspace(-2, 2, 60)
-    X = np.zeros((len(grid), len(FEATURES)))
-    X[:,0] = grid
-    p = pipe.predict_proba(X)[:,1]
-
-    fig, ax = plt.subplots(figsize=(5,3))
-    ax.plot(grid, p)
-    ax.axhline(THRESH, ls="--", color="gray")
-    ax.set_title("P(Up) vs first feature")
-    ax.set_xlabel(FEATURES[0]); ax.set_ylabel("P(Up)")
-    buf = io.BytesIO(); fig.tight_layout(); fig.savefig(buf, format="png", dpi=150); plt.close(fig)
-    buf.seek(0)
-    b64 = base64.b64encode(buf.read()).decode("utf-8")
-    return Response(f'<img src="data:image/png;base64,{b64}"/>', mimetype="text/html")
-
-# ---- NEW: run the full analysis and return file paths + metrics
+    """
+    P(up) vs one feature, the others held fixed. Served as image/png with an ETag (304 on a match).
+    Query: feature=<name> (default: first), hold=mean|zero (others at training means or 0),
+           lo=, hi= (default: mean +/- 2 std for hold=mean, else -2..2), n=60, format=png|html
+    """
+    try:
+        m = _model()
+        feature = request.args.get("feature", m.features[0])
+        if feature not in m.features:
+            raise ValueError(f"Unknown feature '{feature}'. Expected one of {m.features}.")
+        hold = request.args.get("hold", "mean")
+        if hold not in ("mean", "zero"):
+            raise ValueError("`hold` must be 'mean' or 'zero'.")
+        stats = m.feature_stats() if hold == "mean" else {}
+        if hold == "mean" and not stats:
+            raise ValueError("This model has no training means; use hold=zero.")
+        j = m.features.index(feature)
+        center, spread = (stats["feature_means"][j], stats["feature_scales"][j]) if stats else (0.0, 1.0)
+        lo = float(request.args.get("lo", center - 2 * spread))
+        hi = float(request.args.get("hi", center + 2 * spread))
+        n = int(request.args.get("n", 60))
+        if not 2 <= n <= 1000 or not lo < hi:
+            raise ValueError("Need 2 <= n <= 1000 and lo < hi.")
+    except UnknownModelVersion as e:
+        return jsonify({"error": e.args[0]}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    key = (m.version, feature, hold, lo, hi, n)
+    etag = plot_etag(key)
+    html = request.args.get("format") == "html"
+    if not html and request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        def render() -> bytes:
+            grid, X = sweep_grid(m.features, feature, lo, hi, n, stats.get("feature_means"))
+            title = f"P(Up) vs {feature}" + (" (others at training mean)" if hold == "mean" else "")
+            return render_proba_curve(grid, m.predict_proba_up(X), m.threshold, feature, title)
+        png = plot_cache.get_or_create(key, render)
+        if html:
+            b64 = base64.b64encode(png).decode("utf-8")
+            return Response(f'<img src="data:image/png;base64,{b64}"/>', mimetype="text/html")
+        resp = Response(png, mimetype="image/png")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"  # revalidate: the served model can change
+    return resp
+
+@app.route("/threshold/optimal", methods=["GET"])
+def threshold_optimal():
+    """
+    Best threshold for the served model on the chronological holdout.
+    Query: metric=f1|accuracy|precision|recall|youden_j|expected_cost, test_frac=0.2, cost_fp=1, cost_fn=1
+    """
+    try:
+        metric = request.args.get("metric", "f1")
+        test_frac = float(request.args.get("test_frac", 0.2))
+        m = _model()
+        from src.feature_cache import load_feature_matrix
+        fm = load_feature_matrix(m.features)
+        cut = int(len(fm) * (1 - test_frac))
+        thr, val = best_threshold(fm.y[cut:], m.predict_proba_up(fm.X[cut:]), metric=metric,
+                                  cost_fp=float(request.args.get("cost_fp", 1.0)),
+                                  cost_fn=float(request.args.get("cost_fn", 1.0)))
+        return jsonify({"metric": metric, "threshold": thr, "value": val, "n_holdout": int(len(fm) - cut),
+                        "current_threshold": m.threshold, "version": m.version})
+    except UnknownModelVersion as e:
+        return jsonify({"error": e.args[0]}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+# ---- Full analysis as background jobs (cached per data version + parameters)
+def _run_analysis(**kwargs):
+    from src.analysis import run_full_analysis
+    return run_full_analysis(**kwargs)
+
+jobs = JobRunner(_run_analysis, cache_dir=REPORTS / "runs",
+                 max_workers=int(os.getenv("ANALYSIS_WORKERS", "1")))
+
+def _truthy(v) -> bool:
+    return str(v).lower() in ("1", "true", "yes")
+
+def _start_analysis(threshold: float, test_frac: float, wait: bool):
+    """
+    Submit (or reuse) the run for these parameters. A finished/cached run returns 200 with its
+    result; otherwise 202 with the job id, unless `wait` asks to block until it finishes.
+    """
+    from src.analysis import analysis_key
+    key = analysis_key(threshold=threshold, test_frac=test_frac)
+    job = jobs.submit(key, threshold=threshold, test_frac=test_frac)
+    if wait:
+        job = jobs.wait(job["id"])
+    if job["status"] == "done":
+        return jsonify({**job["result"], "job_id": job["id"], "cached": job["cached"]})
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"], "job_id": job["id"]}), 400
+    return jsonify({"job_id": job["id"], "status": job["status"], "status_url": f"/jobs/{job['id']}"}), 202
+
 @app.route("/run_full_analysis", methods=["POST", "GET"])
 def run_full():
+    """
+    Body (optional): {"threshold": 0.44, "test_frac": 0.2, "wait": false}
+    Outputs go to reports/runs/<key>/; poll GET /jobs/<job_id> for the result.
+    """
     try:
         payload = request.get_json(silent=True) or {}
-        threshold = float(payload.get("threshold", THRESH))
+        threshold = float(payload.get("threshold", holder.current.threshold))
         test_frac = float(payload.get("test_frac", 0.2))
-        out = run_full_analysis(threshold=threshold, test_frac=test_frac)
-        return jsonify(out)
+        return _start_analysis(threshold, test_frac, _truthy(payload.get("wait", request.args.get("wait", False))))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -82,10 +408,20 @@ def run_full():
 @app.route("/run_full_analysis/<float:threshold>/<float:test_frac>", methods=["GET"])
 def run_full_params(threshold: float, test_frac: float):
     try:
-        out = run_full_analysis(threshold=threshold, test_frac=test_frac)
-        return jsonify(out)
+        return _start_analysis(threshold, test_frac, _truthy(request.args.get("wait", False)))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": jobs.list()})
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    return jsonify(job)
+
 if __name__ == "__main__":
     app.run(port=5000, debug=False, use_reloader=False)
@@ -0,0 +1,293 @@
+# benchmarks/bench.py
+"""
+Benchmark suite for the hot paths (features, cleaning, outliers, evaluation, serving).
+
+    python benchmarks/bench.py run                          # sizes 1k,100k -> benchmarks/results/<ts>.json
+    python benchmarks/bench.py run --sizes 1k,100k,10m -k features --out base.json
+    python benchmarks/bench.py compare base.json new.json --tolerance 0.10
+
+Each benchmark is timed like timeit.autorange: calls per repeat are chosen so one repeat
+takes >= --min-time seconds, and the median over --repeat repeats is reported per call.
+`compare` exits with status 1 if any benchmark's median is slower than base * (1 + tolerance).
+Run from the project root or anywhere (the script switches to the project directory).
+"""
+from __future__ import annotations
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+PROJECT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = PROJECT / "benchmarks" / "results"
+EVALUATION_PY = PROJECT.parent / "homework" / "homework11" / "src" / "evaluation.py"
+sys.path.insert(0, str(PROJECT))
+sys.path.insert(0, str(PROJECT / "benchmarks"))
+
+from synthetic import SIZES, make_ohlcv, as_raw_csv_frame, make_classification  # noqa: E402
+
+# name -> (setup(n_rows) -> fn, sizes it runs at; None = size-independent)
+BENCHMARKS: Dict[str, Tuple[Callable[[int], Callable[[], object]], Optional[Tuple[str, ...]]]] = {}
+
+def bench(name: str, sizes: Optional[Tuple[str, ...]] = ("1k", "100k", "10m")):
+    def deco(setup: Callable[[int], Callable[[], object]]):
+        BENCHMARKS[name] = (setup, sizes)
+        return setup
+    return deco
+
+# ---- features / cleaning
+
+@bench("features.add_technical_features")
+def _features(n: int):
+    from src.features import add_technical_features
+    df = make_ohlcv(n)
+    return lambda: add_technical_features(df)
+
+@bench("cleaning.sort_and_cast_ohlcv")
+def _sort_cast(n: int):
+    from src.cleaning import sort_and_cast_ohlcv
+    raw = as_raw_csv_frame(make_ohlcv(n))
+    return lambda: sort_and_cast_ohlcv(raw)
+
+@bench("cleaning.fill_missing_median")
+def _fill_median(n: int):
+    from src.cleaning import fill_missing_median
+    df = make_ohlcv(n, nan_frac=0.02)
+    return lambda: fill_missing_median(df, ["open", "high", "low", "close", "ret_1d"])
+
+@bench("cleaning.normalize_data")
+def _normalize(n: int):
+    from src.cleaning import normalize_data
+    df = make_ohlcv(n)
+    return lambda: normalize_data(df, ["open", "high", "low", "close", "volume", "ret_1d"])
+
+def _ohlcv_pipeline(n: int):
+    from src.cleaning import (CleaningPipeline, add_returns, ffill_ohlcv_by_date, fill_missing_median,
+                              sort_and_cast_ohlcv, winsorize_zscores)
+    df = make_ohlcv(n, nan_frac=0.01).drop(columns="ret_1d").sample(frac=1.0, random_state=0)
+    pipe = CleaningPipeline([sort_and_cast_ohlcv, ffill_ohlcv_by_date, add_returns,
+                             (winsorize_zscores, {"columns": ["ret_1d"], "z": 5.0}), fill_missing_median])
+    return pipe, df
+
+@bench("cleaning.pipeline")
+def _pipeline(n: int):
+    pipe, df = _ohlcv_pipeline(n)
+    return lambda: pipe.run(df)
+
+@bench("cleaning.pipeline_sequential")
+def _pipeline_sequential(n: int):
+    pipe, df = _ohlcv_pipeline(n)
+    return lambda: pipe.run_sequential(df)
+
+# ---- outliers
+
+@bench("outliers.detect_outliers_iqr")
+def _iqr(n: int):
+    from src.outliers import detect_outliers_iqr
+    s = make_ohlcv(n)["ret_1d"]
+    return lambda: detect_outliers_iqr(s)
+
+@bench("outliers.detect_outliers_zscore")
+def _zscore(n: int):
+    from src.outliers import detect_outliers_zscore
+    s = make_ohlcv(n)["ret_1d"]
+    return lambda: detect_outliers_zscore(s)
+
+@bench("outliers.winsorize_series")
+def _winsorize(n: int):
+    from src.outliers import winsorize_series
+    s = make_ohlcv(n)["ret_1d"]
+    return lambda: winsorize_series(s)
+
+@bench("outliers.detect_outliers_frame")
+def _outliers_frame(n: int):
+    from src.outliers import detect_outliers_frame
+    df = make_ohlcv(n)
+    return lambda: detect_outliers_frame(df, ["open", "high", "low", "close", "volume", "ret_1d"])
+
+@bench("outliers.QuantileSketch.update", sizes=("1k", "100k"))
+def _sketch(n: int):
+    from src.outliers import QuantileSketch
+    x = make_ohlcv(n)["ret_1d"].to_numpy()
+    return lambda: QuantileSketch(200, seed=0).update(x).quantile([0.05, 0.25, 0.75, 0.95])
+
+# ---- evaluation
+
+@bench("analysis.evaluate_classifier")
+def _evaluate(n: int):
+    from src.analysis import evaluate_classifier
+    y, p = make_classification(n)
+    return lambda: evaluate_classifier(y, p, thr=0.44)
+
+@bench("analysis.plot_pred_vs_threshold", sizes=("1k", "100k"))
+def _plot_threshold(n: int):
+    import numpy as np
+    import tempfile
+    from src.analysis import plot_pred_vs_threshold
+    y, p = make_classification(n)
+    out = Path(tempfile.mkdtemp()) / "sweep.png"
+    grid = np.linspace(0.2, 0.8, 25)
+    return lambda: plot_pred_vs_threshold(p, grid, y, out)
+
+@bench("evaluation.bootstrap_metric", sizes=("1k", "100k"))
+def _bootstrap(n: int):
+    spec = importlib.util.spec_from_file_location("hw11_evaluation", EVALUATION_PY)
+    ev = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ev)
+    y, p = make_classification(n)
+    y = y.astype(float)
+    return lambda: ev.bootstrap_metric(y, p, ev.mae, n_boot=200, seed=111)
+
+# ---- serving (Flask test client, in-process)
+
+def _client():
+    import app
+    return app, app.app.test_client()
+
+@bench("serving.predict", sizes=None)
+def _predict(n: int):
+    app, c = _client()
+    row = {"features": {f: 0.1 for f in app.holder.current.features}}
+    return lambda: c.post("/predict", json=row)
+
+@bench("serving.predict_batch", sizes=("1k",))
+def _predict_batch(n: int):
+    app, c = _client()
+    rows = [{f: 0.1 * i for f in app.holder.current.features} for i in range(n)]
+    return lambda: c.post("/predict/batch", json=rows)
+
+@bench("serving.predict_ticker", sizes=None)
+def _predict_ticker(n: int):
+    app, c = _client()
+    df = make_ohlcv(60)
+    bars = [{"date": d.isoformat(), "open": r.open, "high": r.high, "low": r.low, "close": r.close,
+             "volume": int(r.volume)} for d, r in zip(df["date"], df.itertuples())]
+    c.post("/bars/BENCH", json={"bars": bars})
+    return lambda: c.get("/predict/ticker/BENCH")
+
+@bench("store.push", sizes=("1k",))
+def _store_push(n: int):
+    from src.feature_store import FeatureStore
+    df = make_ohlcv(n)
+    bars = [{"date": d.isoformat(), "open": r.open, "high": r.high, "low": r.low, "close": r.close,
+             "volume": int(r.volume)} for d, r in zip(df["date"], df.itertuples())]
+    return lambda: FeatureStore().push("BENCH", bars)
+
+# ---- runner
+
+def _time(fn: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    fn()  # warm-up (imports, caches)
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if dt < min_time / 10 else 2
+    runs = [dt / number]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - t0) / number)
+    return {"median_s": statistics.median(runs), "min_s": min(runs), "mean_s": statistics.fmean(runs),
+            "stdev_s": statistics.pstdev(runs), "repeat": repeat, "number": number}
+
+def _meta() -> Dict:
+    import numpy, pandas
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "numpy": numpy.__version__, "pandas": pandas.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+def run(sizes: Sequence[str], pattern: Optional[str], repeat: int, min_time: float, out: Optional[Path]) -> Path:
+    os.chdir(PROJECT)  # app.py / model registry use project-relative paths
+    results: Dict[str, Dict] = {}
+    for name, (setup, bench_sizes) in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        for size in ([None] if bench_sizes is None else [s for s in sizes if s in bench_sizes]):
+            key = name if size is None else f"{name}[{size}]"
+            n = SIZES[size] if size else 1
+            fn = setup(n)
+            res = _time(fn, repeat, min_time)
+            res["rows"] = n
+            results[key] = res
+            print(f"{key:<50} {res['median_s'] * 1e3:12.3f} ms  (x{res['number']}, {repeat} repeats)", flush=True)
+            del fn
+    out = Path(out) if out else RESULTS_DIR / f"bench_{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"meta": _meta(), "results": results}, indent=2))
+    print(f"Saved: {out}")
+    return out
+
+def compare(base_path: Path, new_path: Path, tolerance: float) -> int:
+    """Print new/base median ratios; return 1 if any benchmark regressed beyond `tolerance`."""
+    base = json.loads(Path(base_path).read_text())["results"]
+    new = json.loads(Path(new_path).read_text())["results"]
+    regressions: List[str] = []
+    print(f"{'benchmark':<50} {'base ms':>12} {'new ms':>12} {'ratio':>8}")
+    for key in sorted(set(base) | set(new)):
+        if key not in base or key not in new:
+            print(f"{key:<50} {'(only in ' + ('new' if key in new else 'base') + ')':>34}")
+            continue
+        b, n = base[key]["median_s"], new[key]["median_s"]
+        ratio = n / b if b > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        print(f"{key:<50} {b * 1e3:12.3f} {n * 1e3:12.3f} {ratio:8.2f}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions beyond {tolerance:.0%}.")
+    return 0
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run benchmarks and save JSON results")
+    r.add_argument("--sizes", default="1k,100k", help=f"comma-separated subset of {list(SIZES)}")
+    r.add_argument("-k", dest="pattern", default=None, help="regex filter on benchmark names")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat (calls are batched)")
+    r.add_argument("--out", type=Path, default=None)
+    r.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("base", type=Path)
+    c.add_argument("new", type=Path)
+    c.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "compare":
+        return compare(args.base, args.new, args.tolerance)
+    if args.list:
+        for name, (_, sizes) in BENCHMARKS.items():
+            print(name, "" if sizes is None else list(sizes))
+        return 0
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        ap.error(f"unknown size(s) {unknown}; choose from {list(SIZES)}")
+    run(sizes, args.pattern, args.repeat, args.min_time, args.out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
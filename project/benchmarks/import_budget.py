@@ -0,0 +1,75 @@
+# benchmarks/import_budget.py
+"""
+Cold-start budget for the serving entry point.
+
+Runs `python -X importtime -c "import app"` in fresh interpreters (from the project root),
+takes the median cumulative import time of the module and fails (exit 1) if it is over the
+budget or if any forbidden heavy package was imported.
+
+    python benchmarks/import_budget.py                      # default: app, 600 ms
+    python benchmarks/import_budget.py --budget-ms 400 --runs 7
+"""
+from __future__ import annotations
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+PROJECT = Path(__file__).resolve().parents[1]
+DEFAULT_FORBID = ("pandas", "sklearn", "matplotlib", "scipy", "pyarrow")
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure(module: str) -> Tuple[float, Set[str], List[Tuple[int, str]]]:
+    """One fresh interpreter: (cumulative ms for `module`, top-level packages imported, top self-times)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=PROJECT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    cumulative: Dict[str, int] = {}
+    selfs: List[Tuple[int, str]] = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            cumulative[m.group(4)] = int(m.group(2))
+            selfs.append((int(m.group(1)), m.group(4)))
+    if module not in cumulative:
+        raise RuntimeError(f"No importtime record for {module} (already imported by sitecustomize?)")
+    packages = {name.split(".")[0] for name in cumulative}
+    return cumulative[module] / 1000.0, packages, sorted(selfs, reverse=True)[:10]
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--module", default="app")
+    ap.add_argument("--budget-ms", type=float, default=600.0)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--forbid", default=",".join(DEFAULT_FORBID),
+                    help="comma-separated packages that must not load at import")
+    args = ap.parse_args(argv)
+
+    measure(args.module)  # warm-up: seeds the model registry and the OS file cache
+    times, packages, top = [], set(), []
+    for _ in range(args.runs):
+        ms, packages, top = measure(args.module)
+        times.append(ms)
+    median = statistics.median(times)
+    forbidden = sorted(set(filter(None, args.forbid.split(","))) & packages)
+
+    print(f"import {args.module}: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(times):.1f}, max {max(times):.1f}); budget {args.budget_ms:.0f} ms")
+    print("largest self times (ms): " + ", ".join(f"{name} {us / 1000:.1f}" for us, name in top[:5]))
+    failed = False
+    if forbidden:
+        print(f"FAIL: heavy packages imported at startup: {forbidden}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: import time {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# benchmarks/synthetic.py
+"""Seeded synthetic OHLCV generators for benchmarks (same seed + size -> identical frame)."""
+from __future__ import annotations
+from typing import Dict
+import numpy as np
+import pandas as pd
+
+SIZES: Dict[str, int] = {"1k": 1_000, "100k": 100_000, "10m": 10_000_000}
+
+def make_ohlcv(n_rows: int, seed: int = 0, start: str = "2000-01-03", nan_frac: float = 0.0) -> pd.DataFrame:
+    """
+    Bars as a geometric random walk: date (UTC, one per minute so 10M rows still fit in
+    datetime64[ns]; the feature code only needs sorted unique dates), open/high/low/close
+    (float64, high >= max(open, close), low <= min(open, close)), volume (int64), ret_1d (%).
+    `nan_frac` blanks that share of OHLCV cells at random (for the cleaning benchmarks).
+    """
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n_rows)))
+    prev = np.r_[close[0], close[:-1]]
+    open_ = prev * np.exp(rng.normal(0.0, 0.004, n_rows))
+    hi = np.maximum(open_, close) * (1 + np.abs(rng.normal(0.0, 0.006, n_rows)))
+    lo = np.minimum(open_, close) * (1 - np.abs(rng.normal(0.0, 0.006, n_rows)))
+    volume = rng.lognormal(16.0, 0.4, n_rows).astype(np.int64)
+    df = pd.DataFrame({
+        "date": pd.date_range(start, periods=n_rows, freq="min", tz="UTC"),
+        "open": open_, "high": hi, "low": lo, "close": close, "volume": volume,
+    })
+    df["ret_1d"] = df["close"].pct_change() * 100.0
+    if nan_frac > 0:
+        cols = ["open", "high", "low", "close"]
+        mask = rng.random((n_rows, len(cols))) < nan_frac
+        df[cols] = df[cols].mask(mask)
+    return df
+
+def as_raw_csv_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """The frame as pd.read_csv returns a raw snapshot: string dates with offsets, rows unsorted."""
+    out = df[["date", "open", "high", "low", "close", "volume"]].copy()
+    out["date"] = out["date"].dt.tz_convert("America/New_York").dt.strftime("%Y-%m-%d %H:%M:%S%z")
+    out["date"] = out["date"].str.replace(r"(\d{2})(\d{2})$", r"\1:\2", regex=True)
+    return out.sample(frac=1.0, random_state=0).reset_index(drop=True)
+
+def make_classification(n_rows: int, seed: int = 0):
+    """(y_true int, p_up float) with a weak signal, like the holdout of the direction model."""
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 2, n_rows)
+    p = np.clip(0.5 + 0.1 * (y - 0.5) + rng.normal(0.0, 0.15, n_rows), 0.0, 1.0)
+    return y, p
@@ -1,34 +1,20 @@
 # src/analysis.py
 from __future__ import annotations
+import hashlib
+import json
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional
 import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 from sklearn.metrics import classification_report, roc_auc_score, accuracy_score, precision_score, recall_score, f1_score
-from .model_io import load_latest_processed, train_model, save_bundle
+from .model_io import train_from_matrix, save_bundle, latest_processed_path, MODEL_PATH
+from .feature_cache import load_feature_matrix, cache_key
+from .registry import ModelRegistry
+from .validation import validate_features, validate_batch  # re-exported for callers of src.analysis
+from .metrics import threshold_sweep, best_threshold
+from .instrument import span, timed
 
 REPORTS = Path("reports")
-REPORTS.mkdir(parents=True, exist_ok=True)
-
-def validate_features(payload: Dict[str, Any], required: List[str]) -> np.ndarray:
-    """
-    Expect payload like: {"features": {"gap_pct":0.01, "daily_range_pct":0.02, ...}}
-    Returns 2D array (1, n_features) ordered per `required`.
-    """
-    if "features" not in payload or not isinstance(payload["features"], dict):
-        raise ValueError("Payload must contain an object 'features' with named keys.")
-    feats = payload["features"]
-    missing = [f for f in required if f not in feats]
-    if missing:
-        raise ValueError(f"Missing feature(s): {missing}")
-    try:
-        row = [float(feats[f]) for f in required]
-    except Exception as e:
-        raise ValueError(f"All features must be numeric: {e}")
-    return np.array(row, dtype=float).reshape(1, -1)
 
 def evaluate_classifier(y_true: np.ndarray, proba_up: np.ndarray, thr: float = 0.5) -> Dict[str, float]:
     y_pred = (proba_up >= thr).astype(int)
@@ -41,68 +27,94 @@ def evaluate_classifier(y_true: np.ndarray, proba_up: np.ndarray, thr: float = 0
     }
 
 def plot_pred_vs_threshold(proba_up: np.ndarray, thresholds: np.ndarray, y_true: np.ndarray, outpath: Path) -> Path:
-    accs, f1s = [], []
-    for t in thresholds:
-        y_pred = (proba_up >= t).astype(int)
-        accs.append(accuracy_score(y_true, y_pred))
-        f1s.append(f1_score(y_true, y_pred, zero_division=0))
-    fig, ax = plt.subplots(figsize=(6,4))
+    sweep = threshold_sweep(y_true, proba_up, thresholds)
+    accs, f1s = sweep["accuracy"], sweep["f1"]
+    # Figure API (no pyplot global state) so charts can render from worker threads
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(6,4))
+    ax = fig.subplots()
     ax.plot(thresholds, accs, label="Accuracy")
     ax.plot(thresholds, f1s, label="F1")
     ax.set_xlabel("Threshold"); ax.set_ylabel("Score"); ax.set_title("Threshold Sweep")
     ax.legend(); fig.tight_layout()
     outpath.parent.mkdir(parents=True, exist_ok=True)
-    fig.savefig(outpath, dpi=150); plt.close(fig)
+    fig.savefig(outpath, dpi=150)
     return outpath
 
-def run_full_analysis(threshold: float = 0.44, test_frac: float = 0.2, features: List[str] = None) -> Dict:
+DEFAULT_ANALYSIS_FEATURES = ["gap_pct","daily_range_pct","ma_ratio_5_20","ret_vol_10","volume_z20","rsi_14","macd","macd_signal"]
+
+def analysis_key(threshold: float = 0.44, test_frac: float = 0.2, features: List[str] = None,
+                 optimize: str = "f1") -> str:
+    """
+    Identity of a run_full_analysis result: data version (content hash of the latest processed
+    file, via the feature-cache key), feature list and parameters.
+    """
+    features = features or DEFAULT_ANALYSIS_FEATURES
+    data_key = cache_key(latest_processed_path(), features)
+    params = json.dumps({"threshold": float(threshold), "test_frac": float(test_frac), "optimize": optimize},
+                        sort_keys=True)
+    return hashlib.sha256(f"{data_key}\n{params}".encode()).hexdigest()[:16]
+
+@timed("analysis")
+def run_full_analysis(threshold: float = 0.44, test_frac: float = 0.2, features: List[str] = None,
+                      optimize: str = "f1", out_dir: Path = REPORTS, model_path: Path = MODEL_PATH,
+                      registry: Optional[ModelRegistry] = None) -> Dict:
+    """
+    Train on the first (1 - test_frac) rows, evaluate on the holdout and write metrics CSV,
+    threshold-sweep chart and holdout predictions into `out_dir`. The model goes to `model_path`
+    and is published as the registry's current version (servers pick it up on their next check).
+    """
     if features is None:
-        features = ["gap_pct","daily_range_pct","ma_ratio_5_20","ret_vol_10","volume_z20","rsi_14","macd","macd_signal"]
+        features = DEFAULT_ANALYSIS_FEATURES
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Load data
-    df = load_latest_processed()
-    df["y_up"] = (df["ret_1d"].shift(-1) > 0).astype(int)
-    dfm = df.dropna(subset=features + ["y_up"]).reset_index(drop=True)
+    # Load the cleaned feature block (memory-mapped cache keyed by source file + features)
+    fm = load_feature_matrix(features)
 
     # Time-aware split
-    cut = int(len(dfm) * (1 - test_frac))
-    train, test = dfm.iloc[:cut], dfm.iloc[cut:]
-    X_tr, y_tr = train[features], train["y_up"]
-    X_te, y_te = test[features], test["y_up"]
+    cut = int(len(fm) * (1 - test_frac))
+    X_te, y_te = fm.frame(slice(cut, None)), np.asarray(fm.y[cut:], dtype=int)
 
     # Train fresh model & save a versioned copy
-    bundle = train_model(df, features=features, threshold=threshold)
-    save_bundle(bundle, Path("model/model.pkl"))
+    bundle = train_from_matrix(fm, threshold=threshold)
+    save_bundle(bundle, Path(model_path))
+    model_version = (registry or ModelRegistry()).publish(bundle)
 
-    # Predictions on holdout
-    proba_up = bundle["pipeline"].predict_proba(X_te)[:,1]
-    metrics = evaluate_classifier(y_te.values, proba_up, thr=threshold)
+    with span("evaluate", rows=len(y_te)):
+        # Predictions on holdout
+        proba_up = bundle["pipeline"].predict_proba(X_te)[:,1]
+        metrics = evaluate_classifier(y_te, proba_up, thr=threshold)
+        opt_thr, opt_val = best_threshold(y_te, proba_up, metric=optimize)
 
-    # Save metrics CSV
-    mdf = pd.DataFrame([metrics])
-    metrics_path = REPORTS / "full_analysis_metrics.csv"
-    mdf.to_csv(metrics_path, index=False)
+    with span("report"):
+        # Save metrics CSV
+        mdf = pd.DataFrame([metrics])
+        metrics_path = out_dir / "full_analysis_metrics.csv"
+        mdf.to_csv(metrics_path, index=False)
 
-    # Save threshold sweep chart
-    thr_grid = np.linspace(0.2, 0.8, 25)
-    chart_path = REPORTS / "threshold_sweep.png"
-    plot_pred_vs_threshold(proba_up, thr_grid, y_te.values, chart_path)
+        # Save threshold sweep chart
+        thr_grid = np.linspace(0.2, 0.8, 25)
+        chart_path = out_dir / "threshold_sweep.png"
+        plot_pred_vs_threshold(proba_up, thr_grid, y_te, chart_path)
 
-    # Save predictions CSV
-    out_pred = test[["date"]].copy()
-    out_pred["p_up"] = proba_up
-    out_pred["y_true"] = y_te.values
-    out_pred["y_pred_thr"] = (proba_up >= threshold).astype(int)
-    pred_path = REPORTS / "holdout_predictions.csv"
-    out_pred.to_csv(pred_path, index=False)
+        # Save predictions CSV
+        out_pred = pd.DataFrame({"date": fm.date_index()[cut:]})
+        out_pred["p_up"] = proba_up
+        out_pred["y_true"] = y_te
+        out_pred["y_pred_thr"] = (proba_up >= threshold).astype(int)
+        pred_path = out_dir / "holdout_predictions.csv"
+        out_pred.to_csv(pred_path, index=False)
 
     return {
-        "n_train": int(len(train)),
-        "n_test": int(len(test)),
+        "n_train": int(cut),
+        "n_test": int(len(fm) - cut),
         "features": features,
         "threshold": float(threshold),
+        "model_version": model_version,
         "metrics_path": str(metrics_path),
         "predictions_path": str(pred_path),
         "chart_path": str(chart_path),
-        "metrics": metrics
+        "metrics": metrics,
+        "optimal_threshold": {"metric": optimize, "threshold": opt_thr, "value": opt_val}
     }
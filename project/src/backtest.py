@@ -0,0 +1,186 @@
+# src/backtest.py
+from __future__ import annotations
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .feature_cache import CACHE_DIR, FeatureMatrix, load_feature_matrix, open_feature_matrix, save_feature_matrix
+from .instrument import timed
+from .metrics import threshold_sweep
+from .model_io import DEFAULT_FEATURES, build_pipeline
+
+BACKTEST_DIR = Path("reports/backtest")
+
+class Fold(NamedTuple):
+    """Row ranges [start, end) into a chronologically sorted FeatureMatrix."""
+    fold: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+def walk_forward_splits(n: int, test_size: int, min_train: Optional[int] = None, step: Optional[int] = None,
+                        window: str = "expanding", train_size: Optional[int] = None,
+                        embargo: int = 0) -> List[Fold]:
+    """
+    Walk-forward folds over n rows.
+    - window="expanding": train on every row before the test block (minus the embargo).
+    - window="rolling": train on the last `train_size` rows before the test block (minus the embargo).
+    - step: rows between consecutive test starts (default `test_size`, i.e. non-overlapping tests).
+    - embargo: rows dropped between train end and test start; y_up at t looks at t+1, so
+      embargo=1 keeps the last training label from overlapping the first test row.
+    - min_train: size of the first training window (default `train_size`, else n // 2).
+    """
+    if window not in ("expanding", "rolling"):
+        raise ValueError("`window` must be 'expanding' or 'rolling'.")
+    if window == "rolling" and not train_size:
+        raise ValueError("A rolling window needs `train_size`.")
+    if test_size < 1 or embargo < 0:
+        raise ValueError("`test_size` must be >= 1 and `embargo` >= 0.")
+    step = int(step or test_size)
+    min_train = int(min_train or train_size or n // 2)
+    folds: List[Fold] = []
+    test_start = min_train + embargo
+    while test_start < n:
+        train_end = test_start - embargo
+        train_start = 0 if window == "expanding" else max(0, train_end - int(train_size))
+        folds.append(Fold(len(folds), train_start, train_end, test_start, min(test_start + test_size, n)))
+        test_start += step
+    return folds
+
+def _fit_folds(entry: str, folds: List[Fold], threshold: float,
+               warm_start: bool) -> List[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """
+    Fit and score a contiguous run of folds against the memory-mapped matrix at `entry`.
+    With warm_start the LogisticRegression starts each fold from the previous fold's coefficients.
+    """
+    from sklearn.metrics import roc_auc_score
+    fm = open_feature_matrix(Path(entry))
+    pipe = build_pipeline()
+    if warm_start:
+        pipe.set_params(clf__warm_start=True)
+    out = []
+    for f in folds:
+        t0 = time.perf_counter()
+        pipe.fit(fm.frame(slice(f.train_start, f.train_end)), fm.y[f.train_start:f.train_end])
+        fit_s = time.perf_counter() - t0
+        y_te = np.asarray(fm.y[f.test_start:f.test_end], dtype=np.int8)
+        p_up = pipe.predict_proba(fm.frame(slice(f.test_start, f.test_end)))[:, 1]
+        sweep = threshold_sweep(y_te, p_up, [threshold])
+        rec = f._asdict()
+        rec.update({
+            "n_train": f.train_end - f.train_start,
+            "n_test": f.test_end - f.test_start,
+            "test_first_date": int(fm.dates[f.test_start]),
+            "test_last_date": int(fm.dates[f.test_end - 1]),
+            **{m: float(sweep[m][0]) for m in ("accuracy", "precision", "recall", "f1")},
+            "roc_auc": float(roc_auc_score(y_te, p_up)) if len(np.unique(y_te)) > 1 else float("nan"),
+            "fit_seconds": fit_s,
+            "n_iter": int(pipe.named_steps["clf"].n_iter_[0]),
+        })
+        preds = {
+            "fold": np.full(len(y_te), f.fold, dtype=np.int32),
+            "date": np.asarray(fm.dates[f.test_start:f.test_end]),
+            "y_true": y_te,
+            "p_up": p_up,
+            "y_pred": (p_up >= threshold).astype(np.int8),
+        }
+        out.append((rec, preds))
+    return out
+
+def _cache_entry(fm: FeatureMatrix, cache_dir: Path) -> Path:
+    """Cache directory holding `fm`, writing it there first if it was built in memory."""
+    key = fm.key
+    if key is None:
+        h = hashlib.sha256(np.ascontiguousarray(fm.X).tobytes())
+        h.update(np.ascontiguousarray(fm.y).tobytes())
+        h.update("\n".join(fm.features).encode())
+        key = fm.key = "adhoc-" + h.hexdigest()[:20]
+    entry = Path(cache_dir) / key
+    if not (entry / "meta.json").exists():
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        save_feature_matrix(fm, entry)
+    return entry
+
+@timed("backtest")
+def walk_forward(fm: Optional[FeatureMatrix] = None, features: Optional[List[str]] = None,
+                 test_size: int = 21, min_train: Optional[int] = None, step: Optional[int] = None,
+                 window: str = "expanding", train_size: Optional[int] = None, embargo: int = 0,
+                 threshold: float = 0.44, warm_start: bool = False, n_jobs: Optional[int] = None,
+                 out_dir: Path = BACKTEST_DIR, cache_dir: Path = CACHE_DIR) -> Dict:
+    """
+    Walk-forward validation of the standard pipeline (see walk_forward_splits for the windows).
+    Folds are fitted in a process pool; every worker memory-maps the same cached feature matrix
+    read-only, so only row ranges cross process boundaries. Per-fold metrics and out-of-sample
+    predictions are appended to <out_dir>/folds.parquet and predictions.parquet as folds finish
+    (rows are in completion order; sort by `fold`).
+    warm_start=True gives each worker a contiguous run of folds and starts every fit from the
+    previous fold's coefficients (fewer lbfgs iterations; results can differ within the solver
+    tolerance and depend on how folds are chunked).
+    n_jobs=None uses every CPU; n_jobs=1 fits in-process.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if fm is None:
+        fm = load_feature_matrix(features or DEFAULT_FEATURES, cache_dir=cache_dir)
+    entry = str(_cache_entry(fm, cache_dir))
+    folds = walk_forward_splits(len(fm), test_size, min_train, step, window, train_size, embargo)
+    if not folds:
+        raise ValueError(f"No folds: {len(fm)} rows is not enough for min_train={min_train}, embargo={embargo}.")
+
+    n_workers = max(1, min(n_jobs or os.cpu_count() or 1, len(folds)))
+    if warm_start:
+        tasks = [list(c) for c in np.array_split(np.arange(len(folds)), n_workers) if len(c)]
+        tasks = [[folds[i] for i in c] for c in tasks]
+    else:
+        tasks = [[f] for f in folds]
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    folds_path, preds_path = out_dir / "folds.parquet", out_dir / "predictions.parquet"
+    fold_schema = pa.schema(
+        [(c, pa.int64()) for c in Fold._fields + ("n_train", "n_test")]
+        + [("test_first_date", pa.timestamp("ns", tz="UTC")), ("test_last_date", pa.timestamp("ns", tz="UTC"))]
+        + [(c, pa.float64()) for c in ("accuracy", "precision", "recall", "f1", "roc_auc", "fit_seconds")]
+        + [("n_iter", pa.int64())]
+    )
+    pred_schema = pa.schema([("fold", pa.int32()), ("date", pa.timestamp("ns", tz="UTC")), ("y_true", pa.int8()),
+                             ("p_up", pa.float64()), ("y_pred", pa.int8())])
+
+    records: List[Dict] = []
+    t0 = time.perf_counter()
+    with pq.ParquetWriter(folds_path, fold_schema) as fw, pq.ParquetWriter(preds_path, pred_schema) as pw:
+        def write(results: List[Tuple[Dict, Dict[str, np.ndarray]]]) -> None:
+            for rec, preds in results:
+                fw.write_table(pa.Table.from_pylist([rec], schema=fold_schema))
+                pw.write_table(pa.Table.from_pydict(preds, schema=pred_schema))
+                records.append(rec)
+
+        if n_workers == 1:
+            for task in tasks:
+                write(_fit_folds(entry, task, threshold, warm_start))
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as ex:
+                futs = [ex.submit(_fit_folds, entry, task, threshold, warm_start) for task in tasks]
+                for fut in as_completed(futs):
+                    write(fut.result())
+
+    table = pd.DataFrame(records).sort_values("fold").reset_index(drop=True)
+    metric_cols = ["accuracy", "precision", "recall", "f1", "roc_auc"]
+    return {
+        "n_folds": len(folds),
+        "window": window,
+        "test_size": int(test_size),
+        "embargo": int(embargo),
+        "threshold": float(threshold),
+        "warm_start": bool(warm_start),
+        "seconds": time.perf_counter() - t0,
+        "folds_path": str(folds_path),
+        "predictions_path": str(preds_path),
+        "summary": {m: {"mean": float(table[m].mean()), "std": float(table[m].std())} for m in metric_cols},
+        "folds": table.drop(columns=["test_first_date", "test_last_date"]).to_dict(orient="records"),
+    }
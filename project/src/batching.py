@@ -0,0 +1,139 @@
+# src/batching.py
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+# Batch-size histogram buckets (upper bounds, inclusive)
+BATCH_BUCKETS: Tuple[int, ...] = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-row scoring calls into one matrix call.
+    A background thread waits up to `max_wait_ms` after the first queued row (or until
+    `max_batch` rows are queued), scores them with `score_fn(X) -> p_up` and resolves each
+    caller's Future with its own value. A row submitted with `model=` (anything with
+    predict_proba_up, e.g. a registry LoadedModel) is scored by that model: a batch is split
+    by model, so a caller always gets the model it asked for, even across a hot swap.
+    """
+
+    def __init__(self, score_fn: Callable[[np.ndarray], np.ndarray], n_features: int,
+                 max_batch: int = 256, max_wait_ms: float = 2.0):
+        if max_batch < 1:
+            raise ValueError("`max_batch` must be >= 1.")
+        self.score_fn = score_fn
+        self.n_features = int(n_features)
+        self.max_batch = int(max_batch)
+        self.max_wait = float(max_wait_ms) / 1000.0
+        self._pending: List[Tuple[np.ndarray, float, Future, object]] = []
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._hist = [0] * (len(BATCH_BUCKETS) + 1)
+        self._n_batches = 0
+        self._n_rows = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, row: np.ndarray, model=None) -> Future:
+        """
+        Queue one row (shape (n_features,) or (1, n_features)); the Future resolves to p_up from
+        `model.predict_proba_up`, or from score_fn when model is None.
+        """
+        row = np.asarray(row, dtype=np.float64).reshape(-1)
+        n_features = self.n_features if model is None else len(model.features)
+        if row.shape[0] != n_features:
+            raise ValueError(f"Expected {n_features} features, got {row.shape[0]}.")
+        fut: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            self._pending.append((row, time.perf_counter(), fut, model))
+            self._cond.notify()
+        return fut
+
+    def score(self, row: np.ndarray, model=None, timeout: Optional[float] = None) -> float:
+        return self.submit(row, model).result(timeout=timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    def _take_batch(self) -> List[Tuple[np.ndarray, float, Future, object]]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return []
+            deadline = self._pending[0][1] + self.max_wait
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            groups: Dict[int, list] = {}  # model identity -> its rows, in arrival order
+            for item in batch:
+                groups.setdefault(id(item[3]), []).append(item)
+            for items in groups.values():
+                self._score_group(items)
+
+    def _score_group(self, items: List[Tuple[np.ndarray, float, Future, object]]) -> None:
+        model = items[0][3]
+        X = np.vstack([r for r, _, _, _ in items])
+        try:
+            fn = self.score_fn if model is None else model.predict_proba_up
+            p = np.asarray(fn(X), dtype=np.float64)
+        except Exception as e:
+            for _, _, fut, _ in items:
+                fut.set_exception(e)
+            return
+        done = time.perf_counter()
+        for (_, t0, fut, _), p_i in zip(items, p):
+            fut.set_result(float(p_i))
+        self._record(len(items), [done - t0 for _, t0, _, _ in items])
+
+    def _record(self, size: int, waits: List[float]) -> None:
+        b = next((i for i, ub in enumerate(BATCH_BUCKETS) if size <= ub), len(BATCH_BUCKETS))
+        with self._stats_lock:
+            self._hist[b] += 1
+            self._n_batches += 1
+            self._n_rows += size
+            self._wait_sum += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def stats(self) -> Dict:
+        """Queue depth, batch-size histogram (cumulative, Prometheus-style) and wait times."""
+        with self._cond:
+            depth = len(self._pending)
+        with self._stats_lock:
+            cum, hist = 0, {}
+            for ub, n in zip(list(BATCH_BUCKETS) + ["+Inf"], self._hist):
+                cum += n
+                hist[str(ub)] = cum
+            return {
+                "queue_depth": depth,
+                "batches": self._n_batches,
+                "rows": self._n_rows,
+                "batch_size_hist": hist,
+                "mean_batch_size": self._n_rows / self._n_batches if self._n_batches else 0.0,
+                "wait_seconds_sum": self._wait_sum,
+                "wait_seconds_mean": self._wait_sum / self._n_rows if self._n_rows else 0.0,
+                "wait_seconds_max": self._wait_max,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
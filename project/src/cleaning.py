@@ -1,9 +1,18 @@
 # project/src/cleaning.py
 from __future__ import annotations
-from typing import Iterable, Optional, Union
+import inspect
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 import numpy as np
 import pandas as pd
 
+try:
+    from .instrument import span, timed
+except ImportError:  # imported flat from notebooks: from cleaning import ...
+    from instrument import span, timed
+
 # Generic
 
 def _ensure_columns(df: pd.DataFrame, columns: Optional[Iterable[str]]) -> list[str]:
@@ -79,26 +88,119 @@ def normalize_data(
 
 # Finance
 
-def sort_and_cast_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+# Formats tried (in order) on a sample of the date column; the first that parses every sampled
+# value is used for the whole column in one vectorized pass.
+DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S%z",   # yfinance / our raw CSVs: 2024-08-16 00:00:00-04:00
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+)
+_DATE_FORMAT_CACHE: Dict[str, str] = {}  # source (resolved path) -> detected format
+
+def detect_date_format(dates: pd.Series, sample: int = 1000) -> str:
+    """
+    Format string for pd.to_datetime(format=...) that parses an evenly spaced sample of the
+    non-empty values: one of DATE_FORMATS, else "ISO8601", else "mixed" (per-element inference).
+    """
+    s = dates.dropna()
+    if len(s) > sample:
+        s = s.iloc[np.linspace(0, len(s) - 1, sample).astype(np.int64)]
+    s = s.astype(str).str.strip()
+    s = s[s != ""]
+    for fmt in DATE_FORMATS + ("ISO8601",):
+        if pd.to_datetime(s, format=fmt, errors="coerce", utc=True).notna().all():
+            return fmt
+    return "mixed"
+
+_OFFSET_FORMATS = {"%Y-%m-%d %H:%M:%S%z": " ", "%Y-%m-%dT%H:%M:%S%z": "T"}
+
+def _offset_seconds(tail: str) -> float:
+    """'-05:00' / '+0530' / 'Z' / '' -> seconds east of UTC (NaN if not an offset)."""
+    if tail in ("", "Z"):
+        return 0.0
+    if len(tail) in (5, 6) and tail[0] in "+-" and tail[1:3].isdigit() and tail[-2:].isdigit() \
+            and (len(tail) == 5 or tail[3] == ":"):
+        return (1 if tail[0] == "+" else -1) * (int(tail[1:3]) * 3600 + int(tail[-2:]) * 60)
+    return np.nan
+
+def _parse_offset_dates(s: pd.Series, sep: str) -> pd.Series:
+    """
+    'YYYY-mm-dd HH:MM:SS±hh:mm' -> UTC without the per-element %z path: parse the fixed-width
+    local part vectorized, then subtract the offsets, of which a column only has a handful (DST).
+    """
+    local = pd.to_datetime(s.str.slice(0, 19), format=f"%Y-%m-%d{sep}%H:%M:%S", errors="coerce")
+    codes, tails = pd.factorize(s.str.slice(19))
+    secs = np.append(np.array([_offset_seconds(t) for t in tails], dtype=np.float64), np.nan)[codes]
+    return (local - pd.to_timedelta(secs, unit="s")).dt.tz_localize("UTC")
+
+def _parse_dates(date: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """
+    Dates -> datetime64[ns, UTC] in one vectorized pass with a single format (detected from a
+    sample unless given). Mixed UTC offsets (DST) land on one typed UTC column instead of
+    object-dtype datetimes; values the format misses (stray whitespace, fractional seconds) are
+    re-parsed element-wise, anything still unparseable becomes NaT.
+    """
+    s = date if date.dtype == object else date.astype(str)
+    fmt = date_format or detect_date_format(s)
+    if fmt in _OFFSET_FORMATS:
+        dt = _parse_offset_dates(s, _OFFSET_FORMATS[fmt])
+    else:
+        dt = pd.to_datetime(s, format=fmt, errors="coerce", utc=True)
+    miss = dt.isna() & date.notna()
+    if fmt != "mixed" and miss.any():
+        dt[miss] = pd.to_datetime(s[miss].astype(str).str.strip(), format="mixed", errors="coerce", utc=True)
+    return dt
+
+@timed("clean.sort_and_cast_ohlcv")
+def sort_and_cast_ohlcv(df: pd.DataFrame, date_format: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parse `date` to UTC (skipped if already datetime; see _parse_dates), sort by it (skipped when
+    already monotonic), cast OHLC to float and volume to Int64.
+    """
     out = df.copy()
     # Only parse if not already datetime-like
     if "date" in out.columns and not pd.api.types.is_datetime64_any_dtype(out["date"]):
-        s = out["date"].astype(str).str.strip()
-        # try tz-aware first, then fallback
-        dt = pd.to_datetime(s, format="%Y-%m-%d %H:%M:%S%z", errors="coerce")
-        dt = dt.fillna(pd.to_datetime(s, errors="coerce", utc=False))
-        out["date"] = dt
+        out["date"] = _parse_dates(out["date"], date_format)
     if "date" in out.columns:
-        out = out.sort_values("date", kind="mergesort").reset_index(drop=True)
+        if not out["date"].is_monotonic_increasing:
+            out = out.sort_values("date", kind="mergesort")
+        out = out.reset_index(drop=True)
 
     for c in ["open","high","low","close"]:
-        if c in out.columns:
+        if c in out.columns and out[c].dtype != np.float64:
             out[c] = pd.to_numeric(out[c], errors="coerce")
     if "volume" in out.columns:
         out["volume"] = pd.to_numeric(out["volume"], errors="coerce").astype("Int64")
     return out
 
+def read_ohlcv(path: Union[str, Path], date_format: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load a raw OHLCV CSV/Parquet file straight into sort_and_cast_ohlcv output: OHLC read as
+    float64 (falls back to a coercing cast on malformed cells), dates parsed once with the format
+    detected on the first read of this file and cached for later reads.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        cols = pd.read_csv(path, nrows=0).columns
+        dtype = {c: np.float64 for c in ["open", "high", "low", "close", "volume"] if c in cols}
+        try:
+            df = pd.read_csv(path, dtype=dtype)
+        except ValueError:
+            df = pd.read_csv(path)
+    if "date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        key = str(path.resolve())
+        if date_format is None:
+            date_format = _DATE_FORMAT_CACHE.get(key) or detect_date_format(df["date"])
+        _DATE_FORMAT_CACHE[key] = date_format
+    return sort_and_cast_ohlcv(df, date_format=date_format)
+
 
+@timed("clean.ffill_ohlcv_by_date")
 def ffill_ohlcv_by_date(df: pd.DataFrame) -> pd.DataFrame:
     """
     Forward-fill small gaps for OHLCV columns.
@@ -109,6 +211,7 @@ def ffill_ohlcv_by_date(df: pd.DataFrame) -> pd.DataFrame:
     out[cols] = out[cols].ffill()
     return out
 
+@timed("clean.add_returns")
 def add_returns(df: pd.DataFrame, price_col: str = "close",
                 ret_col: str = "ret_1d", ret_z_col: str = "ret_1d_z") -> pd.DataFrame:
     """
@@ -150,3 +253,280 @@ def add_gap(df: pd.DataFrame) -> pd.DataFrame:
     if {"open", "close"} <= set(df.columns):
         df["gap"] = (df["open"] - df["close"].shift(1)) / df["close"].shift(1)
     return df
+
+# Fused pipeline
+
+class _Columns:
+    """
+    Column store the pipeline works on: name -> ndarray / ExtensionArray plus the row index.
+    Arrays borrowed from the input frame are copied the first time a step writes to them
+    (`mutable`), so the caller's DataFrame is never modified.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if not df.columns.is_unique:
+            raise ValueError("CleaningPipeline needs unique column names.")
+        self.index = df.index
+        self.cols: Dict[str, object] = {c: _values(df[c]) for c in df.columns}
+        self.owned: set = set()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def series(self, c: str) -> pd.Series:
+        return pd.Series(self.cols[c], index=self.index, name=c, copy=False)
+
+    def set(self, c: str, values, owned: bool = True) -> None:
+        self.cols[c] = values
+        (self.owned.add if owned else self.owned.discard)(c)
+
+    def mutable(self, c: str) -> np.ndarray:
+        if c not in self.owned:
+            self.set(c, np.array(self.cols[c]))
+        return self.cols[c]
+
+    def take(self, positions: np.ndarray) -> None:
+        for c, a in self.cols.items():
+            self.cols[c] = a.take(positions)
+        self.owned = set(self.cols)
+        self.index = self.index.take(positions)
+
+    def schema(self) -> pd.DataFrame:
+        """Zero-row frame with the current dtypes (for _ensure_columns)."""
+        return pd.DataFrame({c: pd.Series(a[:0], copy=False) for c, a in self.cols.items()})
+
+    def to_frame(self) -> pd.DataFrame:
+        """The result frame; columns still borrowed from the input are copied so it owns every buffer."""
+        cols = {c: (a if c in self.owned else a.copy()) for c, a in self.cols.items()}
+        return pd.DataFrame(cols, index=self.index, copy=False)
+
+def _values(s: pd.Series):
+    """Backing values: ndarray for NumPy dtypes, the ExtensionArray (Int64, tz-aware dates) otherwise."""
+    return s.to_numpy() if isinstance(s.dtype, np.dtype) else s.array
+
+def _is_float64(a) -> bool:
+    return isinstance(a, np.ndarray) and a.dtype == np.float64
+
+def _ffill_inplace(a: np.ndarray) -> None:
+    mask = np.isnan(a)
+    if mask.any():
+        idx = np.where(mask, 0, np.arange(len(a)))
+        np.maximum.accumulate(idx, out=idx)
+        a[:] = a[idx]
+
+def _stats_frame(fr: _Columns, cols: List[str]) -> pd.DataFrame:
+    """
+    No-copy DataFrame over the (float64) column arrays: a single frame.median() / .mean() /
+    .std() call reduces every column with the same pandas code, and results, as the per-column
+    Series calls, while temporaries stay one column in size.
+    """
+    return pd.DataFrame({c: fr.cols[c] for c in cols}, copy=False)
+
+def _fused_sort_and_cast_ohlcv(fr: _Columns, date_format: Optional[str] = None) -> None:
+    if "date" in fr.cols:
+        d = fr.series("date")
+        if not pd.api.types.is_datetime64_any_dtype(d):
+            d = _parse_dates(d, date_format)
+            fr.set("date", _values(d))
+        d = d.reset_index(drop=True)
+        if not d.is_monotonic_increasing:
+            fr.take(d.sort_values(kind="mergesort").index.to_numpy())
+        fr.index = pd.RangeIndex(len(fr))
+    for c in ["open", "high", "low", "close"]:
+        if c in fr.cols and fr.cols[c].dtype != np.float64:
+            prev = fr.cols[c]
+            new = _values(pd.to_numeric(fr.series(c), errors="coerce"))
+            fr.set(c, new, owned=c in fr.owned or not np.may_share_memory(new, prev))
+    if "volume" in fr.cols:
+        fr.set("volume", _values(pd.to_numeric(fr.series("volume"), errors="coerce").astype("Int64")))
+
+def _fused_ffill_ohlcv_by_date(fr: _Columns) -> None:
+    for c in ["open", "high", "low", "close", "volume"]:
+        if c in fr.cols:
+            if _is_float64(fr.cols[c]):
+                _ffill_inplace(fr.mutable(c))
+            else:
+                fr.set(c, _values(fr.series(c).ffill()))
+
+def _fused_add_returns(fr: _Columns, price_col: str, ret_col: str, ret_z_col: str) -> None:
+    if price_col not in fr.cols:
+        raise ValueError(f"Price column '{price_col}' not found.")
+    ret = fr.series(price_col).pct_change() * 100.0  # % return
+    fr.set(ret_col, _values(ret))
+    mu = ret.mean(skipna=True)
+    sd = ret.std(ddof=0, skipna=True)
+    if sd and sd != 0:
+        fr.set(ret_z_col, _values((ret - mu) / sd))
+    else:
+        fr.set(ret_z_col, np.full(len(fr), np.nan))
+
+def _fused_winsorize_zscores(fr: _Columns, columns, z: float) -> None:
+    for col in columns:
+        z_col = f"{col}_z"
+        if z_col not in fr.cols:
+            continue
+        if _is_float64(fr.cols[z_col]) and z >= 0:
+            a = fr.mutable(z_col)
+            np.clip(a, -z, z, out=a)
+        else:
+            fr.set(z_col, _values(fr.series(z_col).clip(lower=-z, upper=z)))
+
+def _fused_fill_missing_median(fr: _Columns, columns) -> None:
+    cols = _ensure_columns(fr.schema(), columns)
+    fast = [c for c in cols if _is_float64(fr.cols[c])]
+    if fast:
+        med = _stats_frame(fr, fast).median()
+        for c in fast:
+            a = fr.cols[c]
+            mask = np.isnan(a)
+            if mask.any():
+                a = fr.mutable(c)
+                np.copyto(a, med[c], where=mask)
+    for c in cols:
+        if c not in fast:
+            s = fr.series(c)
+            fr.set(c, _values(s.fillna(s.median(skipna=True))))
+
+def _fused_drop_missing(fr: _Columns, threshold: float, axis: str) -> None:
+    if not 0 <= threshold <= 1:
+        raise ValueError("`threshold` must be between 0 and 1.")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if axis.lower() in ("rows", "row", "r"):
+            na = np.zeros(len(fr), dtype=np.int64)
+            for a in fr.cols.values():
+                na += pd.isna(a)
+            keep = na / float(len(fr.cols)) <= threshold
+            if not keep.all():
+                fr.take(np.flatnonzero(keep))
+        elif axis.lower() in ("cols", "columns", "c", "column"):
+            n = float(len(fr))
+            fr.cols = {c: a for c, a in fr.cols.items() if int(pd.isna(a).sum()) / n <= threshold}
+            fr.owned &= set(fr.cols)
+        else:
+            raise ValueError("`axis` must be 'rows' or 'cols'.")
+
+def _fused_normalize_data(fr: _Columns, columns, method: str) -> None:
+    cols = _ensure_columns(fr.schema(), columns)
+    if method.lower() != "zscore":
+        raise ValueError("Only method='zscore' supported.")
+    for c in cols:
+        if _is_float64(fr.cols[c]):
+            fr.mutable(c)
+        else:
+            fr.set(c, fr.series(c).astype(float).to_numpy())
+    frame = _stats_frame(fr, cols)
+    mu, sd = frame.mean(), frame.std(ddof=0)
+    for c in cols:
+        a = fr.cols[c]
+        if sd[c] == 0 or np.isclose(sd[c], 0.0):
+            a[:] = 0.0
+        else:
+            a -= mu[c]
+            a /= sd[c]
+
+# step function -> (fused implementation, original function)
+_FUSED: Dict[str, Tuple[Callable, Callable]] = {
+    f.__name__: (fused, f) for f, fused in [
+        (fill_missing_median, _fused_fill_missing_median),
+        (drop_missing, _fused_drop_missing),
+        (normalize_data, _fused_normalize_data),
+        (sort_and_cast_ohlcv, _fused_sort_and_cast_ohlcv),
+        (ffill_ohlcv_by_date, _fused_ffill_ohlcv_by_date),
+        (add_returns, _fused_add_returns),
+        (winsorize_zscores, _fused_winsorize_zscores),
+    ]
+}
+
+class _peak_memory:
+    """Context manager: peak bytes traced by tracemalloc inside the block (nothing if disabled)."""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.result: Dict[str, Optional[int]] = {"peak_bytes": None}
+
+    def __enter__(self) -> Dict[str, Optional[int]]:
+        if self.enabled:
+            self._started = not tracemalloc.is_tracing()
+            if self._started:
+                tracemalloc.start()
+            self._base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        return self.result
+
+    def __exit__(self, *exc) -> None:
+        if self.enabled:
+            self.result["peak_bytes"] = tracemalloc.get_traced_memory()[1] - self._base
+            if self._started:
+                tracemalloc.stop()
+
+StepSpec = Union[str, Callable, Tuple[Union[str, Callable], Dict]]
+
+class CleaningPipeline:
+    """
+    Ordered cleaning steps applied in one pass over a single owned column store.
+
+        pipe = CleaningPipeline([sort_and_cast_ohlcv, ffill_ohlcv_by_date,
+                                 (add_returns, {"price_col": "close"}),
+                                 (winsorize_zscores, {"columns": ["ret_1d"], "z": 5.0})])
+        clean = pipe.run(df)            # == the same functions chained one by one
+        pipe.last_report                # seconds per step, peak memory (track_memory=True)
+
+    Steps are the functions above (or their names), optionally with keyword arguments; arguments
+    are bound against the original signatures when the pipeline is built, so a bad step or argument
+    fails before any data is touched. Instead of a df.copy() per step, a column is copied only when
+    a step first writes to it, statistics (medians / means / stds) for all selected columns come
+    from one reduction call per step, and fills, scaling, forward-fills and clipping are applied in
+    place on the owned arrays. The output matches run_sequential() exactly (values, dtypes, index).
+    """
+
+    def __init__(self, steps: Sequence[StepSpec]):
+        self.steps: List[Tuple[str, Dict]] = [self._bind(s) for s in steps]
+        self.last_report: Optional[Dict] = None
+
+    @staticmethod
+    def _bind(step: StepSpec) -> Tuple[str, Dict]:
+        fn, kwargs = (step if isinstance(step, tuple) else (step, {}))
+        name = fn if isinstance(fn, str) else getattr(fn, "__name__", repr(fn))
+        if name not in _FUSED:
+            raise ValueError(f"Unknown cleaning step {name!r}; choose from {sorted(_FUSED)}.")
+        bound = inspect.signature(_FUSED[name][1]).bind(None, **dict(kwargs))
+        bound.apply_defaults()
+        return name, dict(list(bound.arguments.items())[1:])
+
+    def explain(self) -> List[str]:
+        return [f"{i}: {name}({', '.join(f'{k}={v!r}' for k, v in kw.items())})"
+                for i, (name, kw) in enumerate(self.steps)]
+
+    def run(self, df: pd.DataFrame, track_memory: bool = False) -> pd.DataFrame:
+        """
+        Apply every step and return a new DataFrame (df itself is left untouched).
+        track_memory=True records the peak traced allocation in last_report["peak_bytes"]
+        (tracemalloc slows the run down; leave it off outside profiling).
+        """
+        with _peak_memory(track_memory) as mem, span("clean.pipeline", len(df)):
+            t0 = time.perf_counter()
+            fr = _Columns(df)
+            timings = []
+            for name, kwargs in self.steps:
+                t = time.perf_counter()
+                _FUSED[name][0](fr, **kwargs)
+                timings.append({"step": name, "seconds": time.perf_counter() - t})
+            out = fr.to_frame()
+            seconds = time.perf_counter() - t0
+        self.last_report = {"rows_in": len(df), "rows_out": len(out), "seconds": seconds,
+                            "peak_bytes": mem.get("peak_bytes"), "steps": timings}
+        return out
+
+    def run_sequential(self, df: pd.DataFrame, track_memory: bool = False) -> pd.DataFrame:
+        """Reference: the original functions chained one by one (same report fields as run)."""
+        with _peak_memory(track_memory) as mem:
+            t0 = time.perf_counter()
+            out, timings = df, []
+            for name, kwargs in self.steps:
+                t = time.perf_counter()
+                out = _FUSED[name][1](out, **kwargs)
+                timings.append({"step": name, "seconds": time.perf_counter() - t})
+            seconds = time.perf_counter() - t0
+        self.last_report = {"rows_in": len(df), "rows_out": len(out), "seconds": seconds,
+                            "peak_bytes": mem.get("peak_bytes"), "steps": timings}
+        return out
@@ -0,0 +1,110 @@
+# src/feature_cache.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from .instrument import timed
+
+CACHE_DIR = Path("data/cache/features")
+CACHE_FORMAT = "1"  # bump when the on-disk layout or the labeling rule changes
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file's bytes; memoized per (path, size, mtime) within the process."""
+    st = path.stat()
+    memo = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    if memo not in _digests:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _digests[memo] = h.hexdigest()
+    return _digests[memo]
+
+def cache_key(path: Path, features: List[str]) -> str:
+    h = hashlib.sha256(f"{CACHE_FORMAT}\n{file_digest(path)}\n".encode())
+    h.update("\n".join(features).encode())
+    return h.hexdigest()[:20]
+
+class FeatureMatrix:
+    """
+    Cleaned modeling block: X (n, k) float64, y (n,) int8 next-day-up label, dates (n,) int64
+    UTC nanoseconds. Arrays loaded from the cache are read-only memory maps (no copies).
+    """
+    __slots__ = ("X", "y", "dates", "features", "key", "source_file")
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, dates: np.ndarray, features: List[str],
+                 key: Optional[str] = None, source_file: str = "<unknown>"):
+        self.X, self.y, self.dates = X, y, dates
+        self.features = list(features)
+        self.key = key
+        self.source_file = source_file
+
+    def __len__(self) -> int:
+        return int(self.X.shape[0])
+
+    def date_index(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(np.asarray(self.dates).view("M8[ns]"), tz="UTC", name="date")
+
+    def frame(self, rows: slice = slice(None)) -> pd.DataFrame:
+        """Features as a DataFrame over a view of X (keeps sklearn's feature names)."""
+        return pd.DataFrame(self.X[rows], columns=self.features, copy=False)
+
+@timed("features.matrix")
+def build_feature_matrix(df: pd.DataFrame, features: List[str]) -> FeatureMatrix:
+    """Same labeling/cleaning as train_model: y_up = next ret_1d > 0, drop rows with NaN features."""
+    y_up = (df["ret_1d"].shift(-1) > 0).astype(np.int8)
+    keep = df[features].notna().all(axis=1).to_numpy()
+    X = np.ascontiguousarray(df.loc[keep, features].to_numpy(dtype=np.float64))
+    dates = pd.DatetimeIndex(pd.to_datetime(df.loc[keep, "date"], utc=True)).asi8
+    return FeatureMatrix(X, y_up.to_numpy()[keep], np.ascontiguousarray(dates), features,
+                         source_file=df.attrs.get("source_file", "<unknown>"))
+
+def save_feature_matrix(fm: FeatureMatrix, out_dir: Path) -> Path:
+    """Write X.npy / y.npy / dates.npy / meta.json into `out_dir` atomically (temp dir + rename)."""
+    tmp = out_dir.with_name(f".{out_dir.name}.{uuid.uuid4().hex}.tmp")
+    tmp.mkdir(parents=True)
+    np.save(tmp / "X.npy", fm.X)
+    np.save(tmp / "y.npy", fm.y)
+    np.save(tmp / "dates.npy", fm.dates)
+    (tmp / "meta.json").write_text(json.dumps({"features": fm.features, "source_file": fm.source_file,
+                                               "rows": len(fm), "key": fm.key}))
+    try:
+        os.replace(tmp, out_dir)
+    except OSError:  # another process won the race; its copy is identical
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out_dir
+
+def load_feature_matrix(features: List[str], path: Optional[Union[str, Path]] = None,
+                        cache_dir: Union[str, Path] = CACHE_DIR) -> FeatureMatrix:
+    """
+    Feature matrix for `features` from the processed CSV at `path` (default: latest processed),
+    keyed by the file's content hash and the feature list. A cache hit memory-maps the arrays.
+    """
+    from .model_io import latest_processed_path
+    path = Path(path) if path is not None else latest_processed_path()
+    key = cache_key(path, features)
+    entry = Path(cache_dir) / key
+    if not (entry / "meta.json").exists():
+        df = pd.read_csv(path, parse_dates=["date"]).sort_values("date").reset_index(drop=True)
+        df.attrs["source_file"] = path.name
+        fm = build_feature_matrix(df, features)
+        fm.key = key
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        save_feature_matrix(fm, entry)
+    return open_feature_matrix(entry)
+
+def open_feature_matrix(entry: Path) -> FeatureMatrix:
+    """Memory-map a saved cache entry (read-only; safe to open from many processes)."""
+    entry = Path(entry)
+    meta = json.loads((entry / "meta.json").read_text())
+    return FeatureMatrix(np.load(entry / "X.npy", mmap_mode="r"), np.load(entry / "y.npy", mmap_mode="r"),
+                         np.load(entry / "dates.npy", mmap_mode="r"), meta["features"],
+                         key=meta.get("key") or entry.name, source_file=meta["source_file"])
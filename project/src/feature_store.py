@@ -0,0 +1,223 @@
+# src/feature_store.py
+from __future__ import annotations
+import math
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Mapping, Sequence, Union
+import numpy as np
+
+# Online feature store for the serving path: NumPy only at import (see benchmarks/import_budget.py).
+
+WINDOW = 35  # bars kept per ticker; covers the longest rolling window of add_technical_features (20)
+STORE_FEATURES: List[str] = [  # same names / order as features.FEATURE_COLUMNS
+    "gap_pct", "daily_range_pct", "ma_5", "ma_20", "ma_ratio_5_20",
+    "ret_vol_10", "volume_z20", "rsi_14", "macd", "macd_signal",
+]
+_O, _H, _L, _C, _V, _R = range(6)  # ring buffer columns: open high low close volume ret_1d
+
+# EWM accumulators (pandas ewm, adjust=False): rsi_up, rsi_down, ema12, ema26, macd signal.
+# alpha / min_periods computed exactly as features.FeatureState does.
+_ALPHA = (1.0 / (1.0 + (1.0 - 1 / 14) / (1 / 14)),) * 2 + tuple(1.0 / (1.0 + (s - 1) / 2.0) for s in (12, 26, 9))
+_MINP = (14, 14, 1, 1, 1)
+_WEIGHTED, _OLD_WT, _NOBS, _STARTED = range(4)
+
+def _div(a: float, b: float) -> float:
+    """a / b with NumPy float semantics (x/0 -> ±inf, 0/0 -> nan) instead of ZeroDivisionError."""
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+def _num(x) -> float:
+    return math.nan if x is None else float(x)
+
+def _to_ns(d) -> int:
+    """ISO-8601 string (offset or naive = UTC) or epoch seconds -> UTC epoch nanoseconds."""
+    if isinstance(d, (int, float)):
+        return int(round(float(d) * 1e9))
+    dt = datetime.fromisoformat(str(d).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86_400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+
+def _ewm_step(st: np.ndarray, cur: float, alpha: float) -> None:
+    """One step of pandas' ewm kernel (adjust=False, ignore_na=False) on state row `st`."""
+    weighted = st[_WEIGHTED]
+    if not st[_STARTED]:
+        st[_STARTED] = 1.0
+        st[_WEIGHTED] = cur
+        st[_OLD_WT] = 1.0
+        st[_NOBS] = float(cur == cur)
+        return
+    is_obs = cur == cur
+    st[_NOBS] += is_obs
+    if weighted == weighted:
+        old_wt = st[_OLD_WT] * (1.0 - alpha)
+        if is_obs:
+            if weighted != cur:
+                weighted = old_wt * weighted + alpha * cur
+                st[_WEIGHTED] = weighted / (old_wt + alpha)
+            old_wt = 1.0
+        st[_OLD_WT] = old_wt
+    elif is_obs:
+        st[_WEIGHTED] = cur
+
+def _ewm_value(st: np.ndarray, min_periods: int) -> float:
+    return float(st[_WEIGHTED]) if st[_STARTED] and st[_NOBS] >= min_periods else math.nan
+
+def _mean(x: np.ndarray) -> float:
+    lo, hi = x.min(), x.max()
+    return float(lo) if lo == hi else float(x.mean())  # NaN propagates, like min_periods=window
+
+def _std(x: np.ndarray) -> float:
+    lo, hi = x.min(), x.max()
+    return 0.0 if lo == hi else float(x.std(ddof=1))
+
+class FeatureStore:
+    """
+    Per-ticker state for scoring "ticker X now" without a pandas feature run: the last `window`
+    bars in one ring-buffer array (tickers x window x [open, high, low, close, volume, ret_1d])
+    plus the five EWM accumulators (RSI up/down, EMA12/26, MACD signal) as a tickers x 5 x 4 state
+    array. push() advances a ticker by one or many bars in O(1) per bar and caches its latest
+    feature vector; vector() is a row lookup.
+
+    Values are those of add_technical_features over the same pushed bars: the EWM terms follow
+    pandas' kernel step for step; the rolling means / stds are recomputed from the window (NumPy)
+    instead of pandas' online add/remove sums, so they agree to floating-point rounding. EWM terms
+    remember the whole history, so seed a ticker with its full history, not just `window` bars.
+    """
+
+    def __init__(self, window: int = WINDOW, capacity: int = 64):
+        if window < 20:
+            raise ValueError("window must hold at least 20 bars (longest rolling feature).")
+        self.window = int(window)
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._bars = np.full((capacity, self.window, 6), np.nan)
+        self._dates = np.zeros((capacity, self.window), dtype=np.int64)
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._ewm = np.zeros((capacity, len(_ALPHA), 4))
+        self._feats = np.full((capacity, len(STORE_FEATURES)), np.nan)
+
+    def _row(self, symbol: str, create: bool) -> int:
+        symbol = symbol.upper()
+        r = self._index.get(symbol)
+        if r is None:
+            if not create:
+                raise KeyError(f"Unknown ticker {symbol!r}; push bars first.")
+            r = len(self._index)
+            if r == len(self._count):  # grow every array by doubling
+                grow = lambda a, fill: np.concatenate([a, np.full_like(a, fill)])
+                self._bars, self._dates = grow(self._bars, np.nan), grow(self._dates, 0)
+                self._count, self._ewm = grow(self._count, 0), grow(self._ewm, 0.0)
+                self._feats = grow(self._feats, np.nan)
+            self._index[symbol] = r
+        return r
+
+    def push(self, symbol: str, bars: Union[Mapping, Sequence[Mapping]]) -> Dict:
+        """
+        Append bars (date, open, high, low, close, volume[, ret_1d]) to `symbol`, oldest first, with
+        dates strictly after the last pushed one. ret_1d defaults to the % change of close, as in
+        add_returns. The whole push is validated before the state changes.
+        """
+        bars = [bars] if isinstance(bars, Mapping) else list(bars)
+        if not bars:
+            raise ValueError("No bars given.")
+        try:
+            rows = [(_to_ns(b["date"]), _num(b["open"]), _num(b["high"]), _num(b["low"]),
+                     _num(b["close"]), _num(b["volume"]), _num(b["ret_1d"]) if "ret_1d" in b else None)
+                    for b in bars]
+        except KeyError as e:
+            raise ValueError(f"Bar is missing field {e}.")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Bad bar value: {e}")
+        dates = [r[0] for r in rows]
+        if any(b <= a for a, b in zip(dates, dates[1:])):
+            raise ValueError("Bars must be strictly increasing in date.")
+        with self._lock:
+            r = self._row(symbol, create=True)
+            k, w = int(self._count[r]), self.window
+            if k and dates[0] <= self._dates[r, (k - 1) % w]:
+                raise ValueError("Bars must be strictly increasing in date (after the last pushed bar).")
+            buf, ewm = self._bars[r], self._ewm[r]
+            prev = float(buf[(k - 1) % w, _C]) if k else math.nan
+            for ns, o, h, l, c, v, ret in rows:
+                slot = k % w
+                if ret is None:
+                    ret = (_div(c, prev) - 1) * 100.0
+                buf[slot] = (o, h, l, c, v, ret)
+                self._dates[r, slot] = ns
+                k += 1
+                delta = c - prev
+                _ewm_step(ewm[0], 0.0 if delta < 0 else delta, _ALPHA[0])
+                _ewm_step(ewm[1], -(0.0 if delta > 0 else delta), _ALPHA[1])
+                _ewm_step(ewm[2], c, _ALPHA[2])
+                _ewm_step(ewm[3], c, _ALPHA[3])
+                _ewm_step(ewm[4], _ewm_value(ewm[2], 1) - _ewm_value(ewm[3], 1), _ALPHA[4])
+                prev = c
+            self._count[r] = k
+            self._feats[r] = self._compute(r)
+            return self._info(r)
+
+    def _compute(self, r: int) -> np.ndarray:
+        """Feature vector of ticker row r's latest bar, from its window and EWM state."""
+        k, w, buf, ewm = int(self._count[r]), self.window, self._bars[r], self._ewm[r]
+
+        def tail(n: int, col: int) -> np.ndarray:
+            if k < n:
+                return np.full(n, np.nan)
+            return buf[(k - n + np.arange(n)) % w, col]
+
+        o, h, l, c, v = buf[(k - 1) % w, :5]
+        prev = buf[(k - 2) % w, _C] if k > 1 else math.nan
+        ma5, ma20 = _mean(tail(5, _C)), _mean(tail(20, _C))
+        vol20 = tail(20, _V)
+        roll_up, roll_down = _ewm_value(ewm[0], _MINP[0]), _ewm_value(ewm[1], _MINP[1])
+        macd = _ewm_value(ewm[2], 1) - _ewm_value(ewm[3], 1)
+        return np.array([
+            _div(o, prev) - 1,
+            _div(h - l, c if c != 0 else math.nan),
+            ma5,
+            ma20,
+            _div(ma5, ma20) - 1,
+            _std(tail(10, _R)),
+            _div(v - _mean(vol20), _std(vol20)),
+            100 - _div(100, 1 + _div(roll_up, roll_down)),
+            macd,
+            _ewm_value(ewm[4], _MINP[4]),
+        ])
+
+    def _info(self, r: int) -> Dict:
+        k = int(self._count[r])
+        last = int(self._dates[r, (k - 1) % self.window])
+        return {"n_bars": k,
+                "last_date": datetime.fromtimestamp(last / 1e9, tz=timezone.utc).isoformat(),
+                "features": {f: (None if x != x else float(x)) for f, x in zip(STORE_FEATURES, self._feats[r])}}
+
+    def info(self, symbol: str) -> Dict:
+        with self._lock:
+            return self._info(self._row(symbol, create=False))
+
+    def vector(self, symbol: str, names: Sequence[str]) -> np.ndarray:
+        """
+        (1, len(names)) latest features of `symbol` in model order. KeyError for an unknown ticker,
+        ValueError for a feature the store does not compute or that is still NaN (too few bars).
+        """
+        with self._lock:
+            r = self._row(symbol, create=False)
+            feats, n_bars = self._feats[r].copy(), int(self._count[r])
+        pos = {f: i for i, f in enumerate(STORE_FEATURES)}
+        unknown = [f for f in names if f not in pos]
+        if unknown:
+            raise ValueError(f"Feature(s) not available from the store: {unknown}")
+        x = feats[[pos[f] for f in names]]
+        if not np.isfinite(x).all():
+            bad = [f for f, xi in zip(names, x) if not math.isfinite(xi)]
+            raise ValueError(f"Not enough history for {bad} ({n_bars} bars pushed).")
+        return x.reshape(1, -1)
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return list(self._index)
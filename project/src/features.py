@@ -1,13 +1,25 @@
 # src/features.py
 from __future__ import annotations
+import json
+import math
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Union
 import pandas as pd
 import numpy as np
+from .instrument import timed
 
 def _ensure_datetime_tz(df: pd.DataFrame, col: str = "date") -> pd.DataFrame:
     out = df.copy()
     if col not in out.columns:
         raise KeyError(f"Expected a '{col}' column in prices DataFrame.")
-    out[col] = pd.to_datetime(out[col], errors="coerce", utc=True)
+    dtype = out[col].dtype
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        # already parsed (sort_and_cast_ohlcv / read_ohlcv): convert, never re-parse
+        if str(dtype.tz) != "UTC":
+            out[col] = out[col].dt.tz_convert("UTC")
+    else:
+        out[col] = pd.to_datetime(out[col], errors="coerce", utc=True)
     return out
 
 def _rsi(series: pd.Series, n: int = 14) -> pd.Series:
@@ -19,6 +31,7 @@ def _rsi(series: pd.Series, n: int = 14) -> pd.Series:
     rs = roll_up / roll_down
     return 100 - (100 / (1 + rs))
 
+@timed("features")
 def add_technical_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     Add common, reproducible daily features from OHLCV.
@@ -57,11 +70,95 @@ def add_technical_features(df: pd.DataFrame) -> pd.DataFrame:
 
     return out
 
+@timed("features.panel")
+def add_technical_features_panel(df: pd.DataFrame, ticker_col: str = "ticker") -> pd.DataFrame:
+    """
+    Panel version of `add_technical_features` for a long-format frame with one row per
+    (ticker, date). Every indicator is computed for all tickers in one grouped, vectorized
+    pass (pandas runs each rolling/EWM kernel once over the whole column with per-ticker
+    window bounds), so windows never cross tickers and each ticker's rows match
+    `add_technical_features` run on that ticker alone.
+    Returns a copy sorted by (ticker, date).
+    """
+    if ticker_col not in df.columns:
+        raise KeyError(f"Expected a '{ticker_col}' column in panel DataFrame.")
+    out = _ensure_datetime_tz(df).sort_values([ticker_col, "date"], kind="mergesort").reset_index(drop=True)
+    g = out.groupby(ticker_col, sort=False)
+
+    def _by(s: pd.Series):
+        return s.groupby(out[ticker_col], sort=False)
+
+    def _ungroup(r: pd.Series) -> pd.Series:
+        return r.reset_index(level=0, drop=True)
+
+    prev_close = g["close"].shift(1)
+    out["gap_pct"] = out["open"] / prev_close - 1
+    out["daily_range_pct"] = (out["high"] - out["low"]) / out["close"].replace(0, np.nan)
+
+    out["ma_5"] = _ungroup(g["close"].rolling(5).mean())
+    out["ma_20"] = _ungroup(g["close"].rolling(20).mean())
+    out["ma_ratio_5_20"] = out["ma_5"] / out["ma_20"] - 1
+
+    out["ret_vol_10"] = _ungroup(g["ret_1d"].rolling(10).std())
+
+    volume = out["volume"].astype(float)
+    vol_mean_20 = _ungroup(_by(volume).rolling(20).mean())
+    vol_std_20 = _ungroup(_by(volume).rolling(20).std())
+    # subtract from the column itself so an Int64 volume gives Float64, as add_technical_features does
+    out["volume_z20"] = (out["volume"] - vol_mean_20) / vol_std_20
+
+    delta = out["close"] - prev_close
+    up = delta.clip(lower=0)
+    down = -delta.clip(upper=0)
+    roll_up = _ungroup(_by(up).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean())
+    roll_down = _ungroup(_by(down).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean())
+    out["rsi_14"] = 100 - (100 / (1 + roll_up / roll_down))
+
+    ema12 = _ungroup(g["close"].ewm(span=12, adjust=False).mean())
+    ema26 = _ungroup(g["close"].ewm(span=26, adjust=False).mean())
+    out["macd"] = ema12 - ema26
+    out["macd_signal"] = _ungroup(_by(out["macd"]).ewm(span=9, adjust=False).mean())
+
+    return out
+
+def add_technical_features_wide(fields: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Wide-layout variant: `fields` maps open/high/low/close/volume/ret_1d to a date x ticker
+    DataFrame (one column per ticker, shared sorted date index). Each indicator is one
+    column-wise NumPy/pandas call over the whole 2-D block.
+    Assumes an aligned calendar: a NaN cell is a missing bar, and rolling windows count it
+    as a position (as `add_technical_features` does for a NaN row).
+    Returns a dict of feature name -> date x ticker DataFrame.
+    """
+    missing = [k for k in ("open", "high", "low", "close", "volume", "ret_1d") if k not in fields]
+    if missing:
+        raise KeyError(f"Missing fields for wide feature computation: {missing}")
+    o, h, l, c = (fields[k].astype(float) for k in ("open", "high", "low", "close"))
+    v, r = fields["volume"].astype(float), fields["ret_1d"].astype(float)
+    prev_close = c.shift(1)
+
+    feats: Dict[str, pd.DataFrame] = {}
+    feats["gap_pct"] = o / prev_close - 1
+    feats["daily_range_pct"] = (h - l) / c.replace(0, np.nan)
+    feats["ma_5"] = c.rolling(5).mean()
+    feats["ma_20"] = c.rolling(20).mean()
+    feats["ma_ratio_5_20"] = feats["ma_5"] / feats["ma_20"] - 1
+    feats["ret_vol_10"] = r.rolling(10).std()
+    feats["volume_z20"] = (v - v.rolling(20).mean()) / v.rolling(20).std()
+    delta = c - prev_close
+    roll_up = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    roll_down = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    feats["rsi_14"] = 100 - (100 / (1 + roll_up / roll_down))
+    feats["macd"] = c.ewm(span=12, adjust=False).mean() - c.ewm(span=26, adjust=False).mean()
+    feats["macd_signal"] = feats["macd"].ewm(span=9, adjust=False).mean()
+    return feats
+
 def select_model_dataset(df: pd.DataFrame) -> pd.DataFrame:
     """
     Keep a compact modeling table (drop rows with NaNs from rolling windows).
+    Panel frames keep their `ticker` column.
     """
-    cols = [
+    cols = (["ticker"] if "ticker" in df.columns else []) + [
         "date", "ret_1d", "ret_1d_z",
         "gap_pct", "daily_range_pct",
         "ma_ratio_5_20", "ret_vol_10",
@@ -72,3 +169,361 @@ def select_model_dataset(df: pd.DataFrame) -> pd.DataFrame:
     if missing:
         raise KeyError(f"Missing columns for modeling dataset: {missing}")
     return df[cols].dropna().reset_index(drop=True)
+
+# ---- Incremental (streaming) feature engine
+
+FEATURE_COLUMNS: List[str] = [
+    "gap_pct", "daily_range_pct", "ma_5", "ma_20", "ma_ratio_5_20",
+    "ret_vol_10", "volume_z20", "rsi_14", "macd", "macd_signal",
+]
+
+def _div(a: float, b: float) -> float:
+    """a / b with NumPy float semantics (x/0 -> ±inf, 0/0 -> nan) instead of ZeroDivisionError."""
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+class _Accumulator(ABC):
+    """
+    Base for the O(1) accumulators below: plain-value state that round-trips through a dict.
+    run(values) is the kernel (state held in locals over a whole chunk); update(v) == run([v])[0].
+    """
+    __slots__ = ()
+
+    def update(self, val: float) -> float:
+        return self.run((float(val),))[0]
+
+    @abstractmethod
+    def run(self, vals: Sequence[float]) -> List[float]:
+        """Advance the state over `vals` in order; returns the output after each value."""
+
+    def to_dict(self) -> Dict:
+        return {k: (v.tolist() if isinstance(v, np.ndarray) else list(v) if k == "buf" else v) for k, v in
+                ((k, getattr(self, k)) for k in self.__slots__)}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "_Accumulator":
+        obj = cls.__new__(cls)
+        for k in cls.__slots__:
+            v = d[k]
+            setattr(obj, k, [float(x) for x in v] if k == "buf" else v)
+        return obj
+
+class _RollingMean(_Accumulator):
+    """
+    Fixed-window mean; mirrors pandas' roll_mean kernel (Kahan-compensated add/remove,
+    same-value and sign guards) so results match Series.rolling(w).mean() bit for bit.
+    """
+    __slots__ = ("window", "buf", "n_seen", "nobs", "sum_x", "comp_add", "comp_remove",
+                 "neg_ct", "n_same", "prev")
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self.buf = [math.nan] * self.window
+        self.n_seen = 0
+        self.nobs = 0
+        self.sum_x = self.comp_add = self.comp_remove = 0.0
+        self.neg_ct = self.n_same = 0
+        self.prev = None
+
+    def run(self, vals: Sequence[float]) -> List[float]:
+        window, buf, n_seen, nobs = self.window, self.buf, self.n_seen, self.nobs
+        sum_x, comp_add, comp_remove = self.sum_x, self.comp_add, self.comp_remove
+        neg_ct, n_same, prev = self.neg_ct, self.n_same, self.prev
+        copysign, nan = math.copysign, math.nan
+        out: List[float] = []
+        for val in vals:
+            slot = n_seen % window
+            if n_seen >= window:
+                old = buf[slot]
+                if old == old:
+                    nobs -= 1
+                    y = -old - comp_remove
+                    t = sum_x + y
+                    comp_remove = t - sum_x - y
+                    sum_x = t
+                    if copysign(1.0, old) < 0:
+                        neg_ct -= 1
+            buf[slot] = val
+            n_seen += 1
+            if prev is None:
+                prev = val
+            if val == val:
+                nobs += 1
+                y = val - comp_add
+                t = sum_x + y
+                comp_add = t - sum_x - y
+                sum_x = t
+                if copysign(1.0, val) < 0:
+                    neg_ct += 1
+                n_same = n_same + 1 if val == prev else 1
+                prev = val
+            if nobs < window or nobs == 0:
+                out.append(nan)
+            elif n_same >= nobs:
+                out.append(prev)
+            else:
+                result = sum_x / nobs
+                if (neg_ct == 0 and result < 0) or (neg_ct == nobs and result > 0):
+                    result = 0.0
+                out.append(result)
+        self.n_seen, self.nobs = n_seen, nobs
+        self.sum_x, self.comp_add, self.comp_remove = sum_x, comp_add, comp_remove
+        self.neg_ct, self.n_same, self.prev = neg_ct, n_same, prev
+        return out
+
+class _RollingStd(_Accumulator):
+    """Fixed-window sample std (ddof=1); mirrors pandas' roll_var kernel (Welford + Kahan)."""
+    __slots__ = ("window", "buf", "n_seen", "nobs", "mean_x", "ssqdm_x", "comp_add",
+                 "comp_remove", "n_same", "prev")
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self.buf = [math.nan] * self.window
+        self.n_seen = 0
+        self.nobs = 0.0
+        self.mean_x = self.ssqdm_x = self.comp_add = self.comp_remove = 0.0
+        self.n_same = 0
+        self.prev = None
+
+    def run(self, vals: Sequence[float]) -> List[float]:
+        window, buf, n_seen, nobs = self.window, self.buf, self.n_seen, self.nobs
+        mean_x, ssqdm_x, comp_add, comp_remove = self.mean_x, self.ssqdm_x, self.comp_add, self.comp_remove
+        n_same, prev = self.n_same, self.prev
+        sqrt, nan = math.sqrt, math.nan
+        out: List[float] = []
+        for val in vals:
+            slot = n_seen % window
+            if n_seen >= window:
+                old = buf[slot]
+                if old == old:
+                    nobs -= 1
+                    if nobs:
+                        prev_mean = mean_x - comp_remove
+                        y = old - comp_remove
+                        t = y - mean_x
+                        comp_remove = t + mean_x - y
+                        mean_x = mean_x - t / nobs
+                        ssqdm_x = ssqdm_x - (old - prev_mean) * (old - mean_x)
+                    else:
+                        mean_x = ssqdm_x = 0.0
+            buf[slot] = val
+            n_seen += 1
+            if prev is None:
+                prev = val
+            if val == val:
+                nobs += 1
+                n_same = n_same + 1 if val == prev else 1
+                prev = val
+                prev_mean = mean_x - comp_add
+                y = val - comp_add
+                t = y - mean_x
+                comp_add = t + mean_x - y
+                mean_x = mean_x + t / nobs
+                ssqdm_x = ssqdm_x + (val - prev_mean) * (val - mean_x)
+            if nobs < window or nobs <= 1:
+                out.append(nan)
+            else:
+                var = 0.0 if n_same >= nobs else ssqdm_x / (nobs - 1.0)
+                out.append(sqrt(var) if var >= 0 else 0.0)
+        self.n_seen, self.nobs = n_seen, nobs
+        self.mean_x, self.ssqdm_x, self.comp_add, self.comp_remove = mean_x, ssqdm_x, comp_add, comp_remove
+        self.n_same, self.prev = n_same, prev
+        return out
+
+class _EWMean(_Accumulator):
+    """Exponentially weighted mean with adjust=False; mirrors pandas' ewm kernel (ignore_na=False)."""
+    __slots__ = ("alpha", "min_periods", "weighted", "old_wt", "nobs", "started")
+
+    def __init__(self, com: float, min_periods: int = 0):
+        self.alpha = 1.0 / (1.0 + com)
+        self.min_periods = max(int(min_periods), 1)
+        self.weighted = math.nan
+        self.old_wt = 1.0
+        self.nobs = 0
+        self.started = False
+
+    def run(self, vals: Sequence[float]) -> List[float]:
+        alpha, min_periods = self.alpha, self.min_periods
+        weighted, old_wt, nobs, started = self.weighted, self.old_wt, self.nobs, self.started
+        decay, nan = 1.0 - alpha, math.nan
+        out: List[float] = []
+        for cur in vals:
+            is_obs = cur == cur
+            if not started:
+                started = True
+                weighted = cur
+                nobs = int(is_obs)
+            else:
+                nobs += is_obs
+                if weighted == weighted:
+                    old_wt *= decay
+                    if is_obs:
+                        if weighted != cur:
+                            weighted = old_wt * weighted + alpha * cur
+                            weighted /= old_wt + alpha
+                        old_wt = 1.0
+                elif is_obs:
+                    weighted = cur
+            out.append(weighted if nobs >= min_periods else nan)
+        self.weighted, self.old_wt, self.nobs, self.started = weighted, old_wt, nobs, started
+        return out
+
+def _com_from_span(span: float) -> float:
+    return (span - 1) / 2.0
+
+def _com_from_alpha(alpha: float) -> float:
+    return (1.0 - alpha) / alpha
+
+class FeatureState:
+    """
+    Stateful, incremental version of `add_technical_features` for one ticker.
+    Holds O(1) rolling/EWM accumulators, so appending a bar costs the same regardless of
+    history length. Accumulators replicate pandas' window kernels, so feeding the same bars
+    reproduces the batch output exactly. Serializable via to_dict()/save() and from_dict()/load().
+    """
+    _ACCS = ("ma_5", "ma_20", "vol_mean_20", "vol_std_20", "ret_std_10",
+             "rsi_up", "rsi_down", "ema12", "ema26", "signal")
+
+    def __init__(self):
+        self.ma_5 = _RollingMean(5)
+        self.ma_20 = _RollingMean(20)
+        self.vol_mean_20 = _RollingMean(20)
+        self.vol_std_20 = _RollingStd(20)
+        self.ret_std_10 = _RollingStd(10)
+        self.rsi_up = _EWMean(_com_from_alpha(1 / 14), min_periods=14)
+        self.rsi_down = _EWMean(_com_from_alpha(1 / 14), min_periods=14)
+        self.ema12 = _EWMean(_com_from_span(12))
+        self.ema26 = _EWMean(_com_from_span(26))
+        self.signal = _EWMean(_com_from_span(9))
+        self.prev_close = math.nan
+        self.last_date: Optional[pd.Timestamp] = None
+        self.n_bars = 0
+
+    def update(self, bar: Mapping) -> Dict[str, float]:
+        """
+        Consume one bar (date, open, high, low, close, volume[, ret_1d]) and return its feature
+        values. If `ret_1d` is absent it is derived from close (% change, as in add_returns).
+        """
+        date = pd.Timestamp(bar["date"])
+        date = date.tz_localize("UTC") if date.tzinfo is None else date.tz_convert("UTC")
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Bars must be strictly increasing in date: {date} <= {self.last_date}.")
+        o, h, l, c = (_to_float(bar[k]) for k in ("open", "high", "low", "close"))
+        v = _to_float(bar["volume"])
+        prev = self.prev_close
+        ret = _to_float(bar["ret_1d"]) if "ret_1d" in bar else (_div(c, prev) - 1) * 100.0
+
+        ma5, ma20 = self.ma_5.update(c), self.ma_20.update(c)
+        delta = c - prev
+        up = 0.0 if delta < 0 else delta
+        down = -(0.0 if delta > 0 else delta)
+        roll_up, roll_down = self.rsi_up.update(up), self.rsi_down.update(down)
+        ema12, ema26 = self.ema12.update(c), self.ema26.update(c)
+        macd = ema12 - ema26
+
+        feats = {
+            "gap_pct": _div(o, prev) - 1,
+            "daily_range_pct": _div(h - l, c if c != 0 else math.nan),
+            "ma_5": ma5,
+            "ma_20": ma20,
+            "ma_ratio_5_20": _div(ma5, ma20) - 1,
+            "ret_vol_10": self.ret_std_10.update(ret),
+            "volume_z20": _div(v - self.vol_mean_20.update(v), self.vol_std_20.update(v)),
+            "rsi_14": 100 - _div(100, 1 + _div(roll_up, roll_down)),
+            "macd": macd,
+            "macd_signal": self.signal.update(macd),
+        }
+        self.prev_close = c
+        self.last_date = date
+        self.n_bars += 1
+        return feats
+
+    def update_many(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Consume a frame of new bars; returns it (UTC dates, sorted) with the feature columns
+        that `add_technical_features` would produce for those rows. Same results as calling
+        update() per bar, but element-wise features are NumPy column ops and each accumulator
+        runs its kernel once over the chunk.
+        """
+        out = _ensure_datetime_tz(bars).sort_values("date").reset_index(drop=True)
+        if out.empty:
+            for col in FEATURE_COLUMNS:
+                out[col] = pd.Series(dtype=float)
+            return out
+        dates = out["date"]
+        if dates.isna().any() or not dates.is_unique:
+            raise ValueError("Bars must have valid, strictly increasing dates.")
+        if self.last_date is not None and dates.iloc[0] <= self.last_date:
+            raise ValueError(f"Bars must be strictly increasing in date: {dates.iloc[0]} <= {self.last_date}.")
+        o, h, l, c, v = (_float_array(out[k]) for k in ("open", "high", "low", "close", "volume"))
+        prev = np.empty_like(c)
+        prev[0] = self.prev_close
+        prev[1:] = c[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = _float_array(out["ret_1d"]) if "ret_1d" in out.columns else (c / prev - 1) * 100.0
+            c_list, v_list = c.tolist(), v.tolist()
+            ma5 = np.array(self.ma_5.run(c_list))
+            ma20 = np.array(self.ma_20.run(c_list))
+            delta = c - prev
+            up = np.where(delta < 0, 0.0, delta)
+            down = -np.where(delta > 0, 0.0, delta)
+            roll_up = np.array(self.rsi_up.run(up.tolist()))
+            roll_down = np.array(self.rsi_down.run(down.tolist()))
+            macd = np.array(self.ema12.run(c_list)) - np.array(self.ema26.run(c_list))
+            feats = {
+                "gap_pct": o / prev - 1,
+                "daily_range_pct": (h - l) / np.where(c != 0, c, np.nan),
+                "ma_5": ma5,
+                "ma_20": ma20,
+                "ma_ratio_5_20": ma5 / ma20 - 1,
+                "ret_vol_10": np.array(self.ret_std_10.run(ret.tolist())),
+                "volume_z20": (v - np.array(self.vol_mean_20.run(v_list))) / np.array(self.vol_std_20.run(v_list)),
+                "rsi_14": 100 - 100 / (1 + roll_up / roll_down),
+                "macd": macd,
+                "macd_signal": np.array(self.signal.run(macd.tolist())),
+            }
+        for col in FEATURE_COLUMNS:
+            out[col] = feats[col]
+        self.prev_close = float(c[-1])
+        self.last_date = dates.iloc[-1]
+        self.n_bars += len(out)
+        return out
+
+    def to_dict(self) -> Dict:
+        return {
+            "accumulators": {k: getattr(self, k).to_dict() for k in self._ACCS},
+            "prev_close": self.prev_close,
+            "last_date": None if self.last_date is None else self.last_date.isoformat(),
+            "n_bars": self.n_bars,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "FeatureState":
+        state = cls()
+        for k in cls._ACCS:
+            setattr(state, k, type(getattr(state, k)).from_dict(d["accumulators"][k]))
+        state.prev_close = d["prev_close"]
+        state.last_date = None if d["last_date"] is None else pd.Timestamp(d["last_date"])
+        state.n_bars = d["n_bars"]
+        return state
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.to_dict()))
+        tmp.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "FeatureState":
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+def _to_float(x) -> float:
+    return math.nan if x is None or x is pd.NA else float(x)
+
+def _float_array(s: pd.Series) -> np.ndarray:
+    return s.to_numpy(dtype=np.float64, na_value=np.nan)
@@ -1,25 +1,174 @@
 # project/src/ingest_api.py
+from __future__ import annotations
 from pathlib import Path
 from datetime import datetime
-import os, json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Protocol, Sequence, Union
+import os, json, time
 import pandas as pd
-import yfinance as yf
 from dotenv import load_dotenv
 
+try:
+    from .utils_storage import PartitionedDataset
+    from .instrument import span, timed
+except ImportError:  # run as a script: python src/ingest_api.py
+    from utils_storage import PartitionedDataset
+    from instrument import span, timed
+
+OHLCV_RENAME = {"Date":"date","Open":"open","High":"high","Low":"low","Close":"close","Volume":"volume"}
+
 def ts(): return datetime.now().strftime("%Y%m%d-%H%M")
 
-def run(ticker: str, out_dir: Path):
-    load_dotenv(Path(__file__).resolve().parents[1] / ".env")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    df = yf.Ticker(ticker).history(period="1y", interval="1d").reset_index()
-    df = df.rename(columns={"Date":"date","Open":"open","High":"high","Low":"low","Close":"close","Volume":"volume"})
-    df["date"] = pd.to_datetime(df["date"])
+# ---- Sources
+
+class PriceSource(Protocol):
+    """Anything that returns daily OHLCV bars for one ticker (columns as in `normalize_ohlcv`)."""
+    name: str
+    def fetch(self, ticker: str, period: str = "1y", interval: str = "1d",
+              start: Optional[pd.Timestamp] = None) -> pd.DataFrame: ...
+
+class YFinanceSource:
+    name = "yfinance"
+
+    def fetch(self, ticker: str, period: str = "1y", interval: str = "1d",
+              start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        import yfinance as yf
+        if start is not None:
+            # yfinance ignores `period` when `start` is given
+            return yf.Ticker(ticker).history(start=start.strftime("%Y-%m-%d"), interval=interval).reset_index()
+        return yf.Ticker(ticker).history(period=period, interval=interval).reset_index()
+
+class FileSource:
+    """
+    Offline source backed by fixture files: `<root>/<TICKER>.csv|.parquet`, or the newest
+    `api_yfinance_<TICKER>_*.csv` snapshot (the layout `run` writes to data/raw).
+    `latency` (seconds) simulates a network round-trip for benchmarking.
+    """
+    name = "file"
+
+    def __init__(self, root: Union[str, Path], latency: float = 0.0):
+        self.root = Path(root)
+        self.latency = float(latency)
+
+    def _path(self, ticker: str) -> Path:
+        for suffix in (".parquet", ".csv"):
+            p = self.root / f"{ticker}{suffix}"
+            if p.exists():
+                return p
+        snaps = sorted(self.root.glob(f"api_yfinance_{ticker}_*.csv"))
+        if not snaps:
+            raise FileNotFoundError(f"No fixture for {ticker} in {self.root}")
+        return snaps[-1]
+
+    def fetch(self, ticker: str, period: str = "1y", interval: str = "1d",
+              start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        if self.latency:
+            time.sleep(self.latency)
+        p = self._path(ticker)
+        df = pd.read_parquet(p) if p.suffix == ".parquet" else pd.read_csv(p)
+        if start is not None:
+            df = normalize_ohlcv(df)
+            df = df[df["date"] >= start.normalize()]
+        return df
+
+def normalize_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Standard column names and dtypes for raw bars (date, open, high, low, close, volume).
+    `date` is always tz-aware UTC: naive datetimes are taken as UTC and other zones converted,
+    so bars compare cleanly with the dataset's UTC watermarks.
+    """
+    df = df.rename(columns=OHLCV_RENAME)
+    df["date"] = pd.to_datetime(df["date"], utc=True)
     for c in ["open","high","low","close"]: df[c] = pd.to_numeric(df[c], errors="coerce")
     df["volume"] = pd.to_numeric(df["volume"], errors="coerce").astype("Int64")
+    return df
+
+# ---- Single ticker (timestamped CSV snapshot)
+
+@timed("ingest")
+def run(ticker: str, out_dir: Path, source: Optional[PriceSource] = None):
+    load_dotenv(Path(__file__).resolve().parents[1] / ".env")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df = normalize_ohlcv((source or YFinanceSource()).fetch(ticker, period="1y", interval="1d"))
     path = out_dir / f"api_yfinance_{ticker}_{ts()}.csv"
     df.to_csv(path, index=False)
     return path
 
+# ---- Many tickers (bounded pool -> partitioned Parquet)
+
+def fetch_with_retry(source: PriceSource, ticker: str, retries: int = 3, backoff: float = 0.5,
+                     **kwargs) -> tuple[pd.DataFrame, int]:
+    """Call source.fetch with exponential backoff (backoff, 2*backoff, ...). Returns (df, attempts)."""
+    for attempt in range(1, retries + 2):
+        try:
+            df = source.fetch(ticker, **kwargs)
+            if df is None:
+                raise ValueError(f"No data returned for {ticker}")
+            return df, attempt
+        except Exception:
+            if attempt > retries:
+                raise
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+def _ingest_one(source: PriceSource, ticker: str, dataset: PartitionedDataset, retries: int,
+                backoff: float, period: str, interval: str, wm: Optional[pd.Timestamp]) -> Dict:
+    t0 = time.perf_counter()
+    rec: Dict = {"ticker": ticker, "status": "ok", "rows": 0, "attempts": 0, "version": None, "error": None,
+                 "watermark": None if wm is None else wm.isoformat()}
+    try:
+        with span("ingest.fetch"):
+            raw, rec["attempts"] = fetch_with_retry(source, ticker, retries, backoff,
+                                                    period=period, interval=interval, start=wm)
+        fetched = time.perf_counter()
+        df = normalize_ohlcv(raw)
+        # keep only bars newer than what is stored; the upsert dedupes on (ticker, date)
+        if wm is not None:
+            df = df[df["date"] > wm]
+        if df.empty:
+            rec["status"] = "up_to_date"
+        else:
+            with span("ingest.write", rows=len(df)):
+                rec["version"] = dataset.write(df.assign(ticker=ticker), mode="upsert")
+            rec["rows"] = int(df["date"].nunique())
+        rec.update(fetch_s=fetched - t0, write_s=time.perf_counter() - fetched)
+    except Exception as e:
+        rec.update(status="error", error=f"{type(e).__name__}: {e}")
+    rec["seconds"] = time.perf_counter() - t0
+    return rec
+
+@timed("ingest")
+def run_many(tickers: Sequence[str], out_root: Path, source: Optional[PriceSource] = None,
+             max_workers: int = 8, retries: int = 3, backoff: float = 0.5,
+             period: str = "1y", interval: str = "1d", incremental: bool = True) -> pd.DataFrame:
+    """
+    Ingest many tickers through a bounded thread pool (at most `max_workers` fetches in flight),
+    retrying each with exponential backoff, into the partitioned dataset at `out_root`
+    (ticker/year Parquet partitions, see utils_storage.PartitionedDataset).
+    Returns a per-ticker report (status, rows, attempts, timings, manifest version).
+    A failed ticker is reported, not raised.
+    With `incremental=True` only bars newer than the ticker's stored watermark (its last
+    `date` in the dataset manifest) are fetched and upserted (status "up_to_date" if none).
+    """
+    load_dotenv(Path(__file__).resolve().parents[1] / ".env")
+    source = source or YFinanceSource()
+    dataset = PartitionedDataset(out_root)
+    marks = dataset.watermarks() if incremental else {}
+    tickers = list(dict.fromkeys(tickers))
+    records: List[Dict] = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers) or 1))) as ex:
+        futs = [ex.submit(_ingest_one, source, t, dataset, retries, backoff, period, interval, marks.get(t))
+                for t in tickers]
+        for fut in as_completed(futs):
+            records.append(fut.result())
+    cols = ["ticker", "status", "rows", "watermark", "attempts", "seconds", "fetch_s", "write_s", "version", "error"]
+    return pd.DataFrame(records).reindex(columns=cols).sort_values("ticker").reset_index(drop=True)
+
 if __name__ == "__main__":
-    out = run(os.getenv("TICKER", "AAPL"), Path(__file__).resolve().parents[1] / "data" / "raw")
-    print("Saved:", out)
+    raw_dir = Path(__file__).resolve().parents[1] / "data" / "raw"
+    tickers = [t for t in os.getenv("TICKERS", "").split(",") if t]
+    if tickers:
+        report = run_many(tickers, raw_dir / "prices", max_workers=int(os.getenv("MAX_WORKERS", "8")))
+        print(json.dumps(report.to_dict(orient="records"), indent=2, default=str))
+    else:
+        out = run(os.getenv("TICKER", "AAPL"), raw_dir)
+        print("Saved:", out)
@@ -0,0 +1,205 @@
+# src/instrument.py
+from __future__ import annotations
+import functools
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Request latencies (seconds): 100µs .. 10s
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                                      0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Pipeline stages (seconds): 1ms .. 10min
+STAGE_BUCKETS: Tuple[float, ...] = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+# Fraction of requests/spans whose timings are recorded (METRICS_SAMPLE_RATE=0.1 keeps 10%).
+# Counters are always exact; histogram _count/_sum cover the sampled observations only.
+SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))
+
+def set_sample_rate(rate: float) -> None:
+    global SAMPLE_RATE
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError("Sample rate must be in [0, 1].")
+    SAMPLE_RATE = float(rate)
+
+def sampled() -> bool:
+    return SAMPLE_RATE >= 1.0 or (SAMPLE_RATE > 0.0 and random.random() < SAMPLE_RATE)
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_num(v: float) -> str:
+    v = float(v)
+    return str(int(v)) if v.is_integer() and abs(v) < 1e15 else repr(v)
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(v)}" for k, v in items]
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram per label set (cumulative buckets on exposition, like prometheus_client)."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # [bucket counts..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        if not sampled():
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, s in items:
+            cum = 0.0
+            for ub, n in zip(list(self.buckets) + ["+Inf"], s[:-1]):
+                cum += n
+                le = 'le="+Inf"' if ub == "+Inf" else f'le="{float(ub)!r}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {_fmt_num(cum)}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_num(s[-1])}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {_fmt_num(cum)}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics plus collector callbacks that emit extra exposition lines at scrape time."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, fn: Callable[[], List[str]]) -> None:
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            lines += m.expose()
+        for fn in self._collectors:
+            lines += fn()
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+
+REQUEST_SECONDS = METRICS.histogram("http_request_duration_seconds", "HTTP request latency by route.",
+                                    ("route", "method", "status"))
+REQUESTS_TOTAL = METRICS.counter("http_requests_total", "HTTP requests by route and status.",
+                                 ("route", "method", "status"))
+REQUEST_STAGE_SECONDS = METRICS.histogram("http_request_stage_seconds",
+                                          "Time per request stage (parse, validate, score, serialize).",
+                                          ("route", "stage"))
+STAGE_SECONDS = METRICS.histogram("pipeline_stage_seconds", "Pipeline stage duration (ingest, clean, "
+                                  "features, train, report, ...).", ("stage",), buckets=STAGE_BUCKETS)
+STAGE_ROWS = METRICS.counter("pipeline_stage_rows_total", "Rows processed per pipeline stage.", ("stage",))
+STAGE_ERRORS = METRICS.counter("pipeline_stage_errors_total", "Pipeline stage failures.", ("stage",))
+
+class StageTimer:
+    """
+    Laps within one request: lap("parse"), lap("validate"), ... each record the time since the
+    previous lap. Built via stage_timer(), which returns a no-op timer for unsampled requests.
+    """
+    __slots__ = ("route", "_t")
+
+    def __init__(self, route: str):
+        self.route = route
+        self._t = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        REQUEST_STAGE_SECONDS.observe(now - self._t, route=self.route, stage=stage)
+        self._t = now
+
+class _NullTimer:
+    __slots__ = ()
+
+    def lap(self, stage: str) -> None:
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+def stage_timer(route: str, enabled: Optional[bool] = None):
+    return StageTimer(route) if (sampled() if enabled is None else enabled) else _NULL_TIMER
+
+@contextmanager
+def span(stage: str, rows: Optional[int] = None) -> Iterator[None]:
+    """Time a pipeline stage into pipeline_stage_seconds{stage}; failures count in _errors_total."""
+    if rows is not None:
+        STAGE_ROWS.inc(rows, stage=stage)
+    t0 = time.perf_counter() if sampled() else None
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        if t0 is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - t0, stage=stage)
+
+def timed(stage: str) -> Callable:
+    """Decorator form of span(); counts rows when the first argument is a DataFrame / array."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rows = int(args[0].shape[0]) if args and hasattr(args[0], "shape") else None
+            with span(stage, rows):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
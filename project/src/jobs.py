@@ -0,0 +1,113 @@
+# src/jobs.py
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+RESULT_FILE = "result.json"
+
+class JobRunner:
+    """
+    Run `fn(out_dir=<cache_dir>/<key>, **params)` in a background thread pool, one job per call.
+    - Results are cached by `key` (in memory and as <cache_dir>/<key>/result.json), so a repeat
+      call with the same key finishes immediately without running `fn`.
+    - A key that is already queued or running returns the in-flight job instead of a duplicate.
+    - Every run writes into its own directory, so concurrent runs never share output files.
+    Job records: {"id", "key", "status": queued|running|done|failed, "cached", "submitted_at",
+    "started_at", "finished_at", "result", "error"}. Only the last `max_jobs` are kept.
+    """
+
+    def __init__(self, fn: Callable[..., Dict], cache_dir: Path, max_workers: int = 1, max_jobs: int = 256):
+        self.fn = fn
+        self.cache_dir = Path(cache_dir)
+        self.max_jobs = int(max_jobs)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, str] = {}   # key -> job id
+        self._results: Dict[str, Dict] = {}   # key -> result
+
+    def _new_job(self, key: str, params: Dict) -> Dict[str, Any]:
+        job = {"id": uuid.uuid4().hex[:12], "key": key, "params": params, "status": "queued", "cached": False,
+               "submitted_at": time.time(), "started_at": None, "finished_at": None,
+               "result": None, "error": None}
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        return job
+
+    def cached(self, key: str) -> Optional[Dict]:
+        """Result for `key` from memory or its run directory, if a run ever completed."""
+        if key in self._results:
+            return self._results[key]
+        path = self.cache_dir / key / RESULT_FILE
+        if path.exists():
+            result = json.loads(path.read_text())
+            self._results[key] = result
+            return result
+        return None
+
+    def submit(self, key: str, **params) -> Dict[str, Any]:
+        """Start (or reuse) the job for `key`; returns a snapshot of its record."""
+        with self._lock:
+            inflight = self._jobs.get(self._inflight.get(key, ""))
+            if inflight is not None:
+                return dict(inflight)
+            job = self._new_job(key, params)
+            result = self.cached(key)
+            if result is not None:
+                job.update(status="done", cached=True, result=result,
+                           started_at=job["submitted_at"], finished_at=job["submitted_at"])
+                return dict(job)
+            self._inflight[key] = job["id"]
+        self._pool.submit(self._run, job)
+        return self.get(job["id"])
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        key = job["key"]
+        out_dir = self.cache_dir / key
+        with self._lock:
+            job.update(status="running", started_at=time.time())
+        try:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            result = self.fn(out_dir=out_dir, **job["params"])
+            tmp = out_dir / f".{RESULT_FILE}.{uuid.uuid4().hex}.tmp"
+            tmp.write_text(json.dumps(result, default=str))
+            os.replace(tmp, out_dir / RESULT_FILE)
+            with self._lock:
+                self._results[key] = result
+                job.update(status="done", result=result, finished_at=time.time())
+                self._inflight.pop(key, None)
+        except Exception as e:
+            with self._lock:
+                job.update(status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+                self._inflight.pop(key, None)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll: float = 0.05) -> Optional[Dict[str, Any]]:
+        """Block until the job is done/failed (or `timeout` seconds pass); returns its record."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in ("done", "failed"):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll)
+
+    def list(self) -> list:
+        with self._lock:
+            return [{k: v for k, v in j.items() if k != "result"} for j in reversed(self._jobs.values())]
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -1,12 +1,19 @@
 # src/model_io.py
 from __future__ import annotations
+import os
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
+from .scorer import CompiledScorer
+from .utils_storage import OutputManifest
+from .feature_cache import FeatureMatrix, build_feature_matrix
+from .instrument import span
 
 MODEL_PATH = Path("model/model.pkl")
 PROC = Path("data/processed")
@@ -16,12 +23,23 @@ DEFAULT_FEATURES: List[str] = [
     "ret_vol_10","volume_z20","rsi_14","macd","macd_signal"
 ]
 
-def load_latest_processed(pattern: str = "prices_with_tech_features_model*.csv") -> pd.DataFrame:
+def latest_processed_path(pattern: str = "prices_with_tech_features_model*.csv") -> Path:
+    """
+    Newest registered output in data/processed/_manifest.json matching `pattern`;
+    falls back to newest mtime for files that were never registered.
+    """
+    path = OutputManifest(PROC).latest(pattern)
+    if path is not None:
+        return path
     cands = sorted(PROC.glob(pattern), key=lambda p: p.stat().st_mtime, reverse=True)
     if not cands:
         raise FileNotFoundError(f"No processed feature files found in {PROC} matching {pattern}")
-    df = pd.read_csv(cands[0], parse_dates=["date"]).sort_values("date").reset_index(drop=True)
-    df.attrs["source_file"] = cands[0].name
+    return cands[0]
+
+def load_latest_processed(pattern: str = "prices_with_tech_features_model*.csv") -> pd.DataFrame:
+    path = latest_processed_path(pattern)
+    df = pd.read_csv(path, parse_dates=["date"]).sort_values("date").reset_index(drop=True)
+    df.attrs["source_file"] = path.name
     return df
 
 def build_pipeline() -> Pipeline:
@@ -31,29 +49,30 @@ def build_pipeline() -> Pipeline:
     ])
 
 def train_model(df: pd.DataFrame, features: List[str] = DEFAULT_FEATURES, threshold: float = 0.44) -> Dict:
-    df = df.copy()
-    df["y_up"] = (df["ret_1d"].shift(-1) > 0).astype(int)
-    dfm = df.dropna(subset=features + ["y_up"]).reset_index(drop=True)
-
-    cut = int(len(dfm) * 0.8)
-    train = dfm.iloc[:cut]
-    X_tr, y_tr = train[features], train["y_up"]
+    return train_from_matrix(build_feature_matrix(df, features), threshold=threshold)
 
+def train_from_matrix(fm: FeatureMatrix, threshold: float = 0.44, train_frac: float = 0.8) -> Dict:
+    """Fit on the first `train_frac` of a FeatureMatrix (chronological) and return a bundle."""
+    cut = int(len(fm) * train_frac)
     pipe = build_pipeline()
-    pipe.fit(X_tr, y_tr)
+    with span("train", rows=cut):
+        pipe.fit(fm.frame(slice(0, cut)), fm.y[:cut])
 
     bundle = {
         "pipeline": pipe,
-        "features": features,
+        "features": fm.features,
         "threshold": float(threshold),
-        "trained_on": df.attrs.get("source_file", "<unknown>"),
+        "trained_on": fm.source_file,
         "version": "1.0.0"
     }
     return bundle
 
 def save_bundle(bundle: Dict, path: Path = MODEL_PATH) -> Path:
+    """Dump to a temp file and rename, so readers never see a half-written model."""
     path.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(bundle, path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    joblib.dump(bundle, tmp)
+    os.replace(tmp, path)
     return path
 
 def load_bundle(path: Path = MODEL_PATH) -> Dict:
@@ -69,3 +88,30 @@ def ensure_model(features: List[str] = DEFAULT_FEATURES, threshold: float = 0.44
     bundle = train_model(df, features=features, threshold=threshold)
     save_bundle(bundle, MODEL_PATH)
     return bundle
+
+def compile_bundle(bundle: Dict, check_tol: Optional[float] = 1e-12) -> CompiledScorer:
+    """
+    Fold the fitted StandardScaler + binary LogisticRegression of a bundle into a CompiledScorer.
+    If `check_tol` is set, compare against pipe.predict_proba on probe rows around the training
+    distribution and raise ValueError if any probability differs by more than `check_tol`.
+    """
+    pipe = bundle["pipeline"]
+    scaler, clf = pipe.named_steps.get("scaler"), pipe.named_steps.get("clf")
+    if not isinstance(scaler, StandardScaler) or not isinstance(clf, LogisticRegression):
+        raise ValueError("Can only compile a StandardScaler + LogisticRegression pipeline.")
+    if clf.coef_.shape[0] != 1:
+        raise ValueError("Can only compile a binary LogisticRegression.")
+    features = bundle["features"]
+    k = len(features)
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(k)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(k)
+    scorer = CompiledScorer.from_linear(features, clf.coef_[0], clf.intercept_[0], mean, scale,
+                                        threshold=bundle.get("threshold", 0.5))
+    if check_tol is not None:
+        rng = np.random.default_rng(0)
+        probe = mean + rng.standard_normal((256, k)) * 3 * scale
+        ref = pipe.predict_proba(pd.DataFrame(probe, columns=features))[:, 1]
+        err = float(np.max(np.abs(scorer.predict_proba_up(probe) - ref)))
+        if err > check_tol:
+            raise ValueError(f"Compiled scorer differs from pipeline by {err:.3g} (> {check_tol:g}).")
+    return scorer
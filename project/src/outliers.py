@@ -1,4 +1,9 @@
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
 import pandas as pd
+from .stats import RunningMoments
 
 def detect_outliers_iqr(series: pd.Series, k: float = 1.5) -> pd.Series:
     """Return boolean mask for IQR-based outliers."""
@@ -21,3 +26,314 @@ def winsorize_series(series: pd.Series, lower: float = 0.05, upper: float = 0.95
     lo = series.quantile(lower)
     hi = series.quantile(upper)
     return series.clip(lower=lo, upper=hi)
+
+# ---- DataFrame-level detection (all columns, optionally per group, in one quantile call)
+
+def _numeric_columns(df: pd.DataFrame, columns: Optional[Iterable[str]], by: Optional[str] = None) -> List[str]:
+    if columns is None:
+        return [c for c in df.select_dtypes(include=["number"]).columns if c != by]
+    cols = list(columns)
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not in DataFrame: {missing}")
+    return cols
+
+def _row_bounds(df: pd.DataFrame, stats: pd.DataFrame, by: Optional[str]) -> pd.DataFrame:
+    """Per-group statistics (index = group) broadcast to df's rows."""
+    return stats.reindex(df[by].to_numpy()).set_axis(df.index) if by else stats
+
+def outlier_bounds(df: pd.DataFrame, columns: Optional[Iterable[str]] = None, method: str = "iqr",
+                   k: float = 1.5, threshold: float = 3.0, by: Optional[str] = None) -> pd.DataFrame:
+    """
+    Lower/upper fences per column (rows ("lower", "upper")), or per group when `by` names a
+    column such as "ticker" (MultiIndex (group, bound)). One DataFrame.quantile / groupby
+    quantile call covers every column. For method="zscore" the fences are mu ± threshold * sigma.
+    """
+    cols = _numeric_columns(df, columns, by)
+    src = df.groupby(by, sort=False)[cols] if by else df[cols]
+    if method == "iqr":
+        q = src.quantile([0.25, 0.75])
+        q1 = q.xs(0.25, level=-1) if by else q.loc[0.25]
+        q3 = q.xs(0.75, level=-1) if by else q.loc[0.75]
+        lower, upper = q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+    elif method == "zscore":
+        mu, sigma = src.mean(), src.std(ddof=0)
+        sigma = sigma.where(sigma != 0, 1.0)
+        lower, upper = mu - threshold * sigma, mu + threshold * sigma
+    else:
+        raise ValueError("`method` must be 'iqr' or 'zscore'.")
+    if by:
+        return pd.concat({"lower": lower, "upper": upper}).swaplevel().sort_index()
+    return pd.DataFrame({"lower": lower, "upper": upper}).T
+
+def detect_outliers_frame(df: pd.DataFrame, columns: Optional[Iterable[str]] = None, method: str = "iqr",
+                          k: float = 1.5, threshold: float = 3.0, by: Optional[str] = None) -> pd.DataFrame:
+    """
+    Boolean outlier mask for many columns at once (same index as df, one column per feature).
+    Without `by`, matches detect_outliers_iqr / detect_outliers_zscore applied column by column.
+    With `by` (e.g. "ticker"), fences are computed per group.
+    """
+    cols = _numeric_columns(df, columns, by)
+    if method not in ("iqr", "zscore"):
+        raise ValueError("`method` must be 'iqr' or 'zscore'.")
+    if not by and all(isinstance(df[c].dtype, np.dtype) for c in cols):
+        return _detect_block(df[cols], method, k, threshold)
+    src = df.groupby(by, sort=False)[cols] if by else df[cols]
+    if method == "iqr":
+        q = src.quantile([0.25, 0.75])
+        q1 = _row_bounds(df, q.xs(0.25, level=-1) if by else q.loc[0.25], by)
+        q3 = _row_bounds(df, q.xs(0.75, level=-1) if by else q.loc[0.75], by)
+        iqr = q3 - q1
+        values = df[cols]
+        return (values < q1 - k * iqr) | (values > q3 + k * iqr)
+    if method == "zscore":
+        mu = _row_bounds(df, src.mean(), by)
+        sigma = _row_bounds(df, src.std(ddof=0), by)
+        z = (df[cols] - mu) / sigma.where(sigma != 0, 1.0)
+        return z.abs() > threshold
+
+def _detect_block(values: pd.DataFrame, method: str, k: float, threshold: float) -> pd.DataFrame:
+    """NumPy-dtype columns: quantiles in one frame call, comparisons on the 2-D block."""
+    x = values.to_numpy(dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        if method == "iqr":
+            q1, q3 = values.quantile([0.25, 0.75]).to_numpy()
+            iqr = q3 - q1
+            mask = (x < q1 - k * iqr) | (x > q3 + k * iqr)
+        else:
+            # per-column Series reductions: exact, and faster than frame reductions over a strided block
+            mu = np.array([values[c].mean() for c in values.columns])
+            sigma = np.array([values[c].std(ddof=0) for c in values.columns])
+            mask = np.abs((x - mu) / np.where(sigma != 0, sigma, 1.0)) > threshold
+    return pd.DataFrame(mask, index=values.index, columns=values.columns)
+
+def winsorize_frame(df: pd.DataFrame, columns: Optional[Iterable[str]] = None, lower: float = 0.05,
+                    upper: float = 0.95, by: Optional[str] = None) -> pd.DataFrame:
+    """Copy of df with `columns` clipped to their [lower, upper] quantiles (per group with `by`)."""
+    cols = _numeric_columns(df, columns, by)
+    src = df.groupby(by, sort=False)[cols] if by else df[cols]
+    q = src.quantile([lower, upper])
+    lo = _row_bounds(df, q.xs(lower, level=-1) if by else q.loc[lower], by)
+    hi = _row_bounds(df, q.xs(upper, level=-1) if by else q.loc[upper], by)
+    out = df.copy()
+    out[cols] = df[cols].clip(lower=lo, upper=hi, axis=1 if not by else None)
+    return out
+
+# ---- Mergeable quantile sketch + streaming / rolling detector
+
+class QuantileSketch:
+    """
+    KLL-style mergeable quantile sketch over floats (NaNs ignored). Level h holds items of weight
+    2**h; a level over capacity is sorted and every other item (random offset) is promoted, so
+    memory stays O(k log(n/k)) and rank error is roughly 1.7/k (about 1% at k=200).
+    Sketches built on different partitions merge() into the sketch of their union; min/max
+    are exact.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        if k < 8:
+            raise ValueError("`k` must be >= 8.")
+        self.k = int(k)
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h: int) -> int:
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** (len(self.levels) - h - 1))))
+
+    def update(self, values) -> "QuantileSketch":
+        x = np.asarray(values, dtype=np.float64).ravel()
+        x = x[~np.isnan(x)]
+        if len(x):
+            self.n += len(x)
+            self.min = min(self.min, float(x.min()))
+            self.max = max(self.max, float(x.max()))
+            self.levels[0] = np.concatenate([self.levels[0], x])
+            self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.k != self.k:
+            raise ValueError("Can only merge sketches with the same `k`.")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            if len(items):
+                self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        while True:
+            over = [h for h, items in enumerate(self.levels) if len(items) > self._capacity(h)]
+            if not over:
+                return
+            h = over[0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            keep = len(items) % 2  # odd count: the smallest item stays at level h
+            self.levels[h] = items[:keep]
+            promoted = items[keep + int(self._rng.integers(2))::2]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+
+    def _sorted_weights(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(a), 2.0 ** h) for h, a in enumerate(self.levels)])
+        order = np.argsort(items, kind="mergesort")
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Approximate quantile(s) for q in [0, 1] (q=0 / q=1 return the exact min / max)."""
+        qs = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if self.n == 0:
+            out = np.full(len(qs), np.nan)
+        else:
+            items, cum = self._sorted_weights()
+            idx = np.searchsorted(cum, qs * cum[-1], side="left").clip(0, len(items) - 1)
+            out = items[idx]
+            out[qs <= 0] = self.min
+            out[qs >= 1] = self.max
+        return out if np.ndim(q) else float(out[0])
+
+    def rank(self, x: float) -> float:
+        """Approximate fraction of values <= x."""
+        if self.n == 0:
+            return math.nan
+        items, cum = self._sorted_weights()
+        i = np.searchsorted(items, x, side="right")
+        return float(cum[i - 1] / cum[-1]) if i else 0.0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def to_dict(self) -> Dict:
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max,
+                "levels": [a.tolist() for a in self.levels]}
+
+    @classmethod
+    def from_dict(cls, d: Dict, seed: Optional[int] = None) -> "QuantileSketch":
+        s = cls(d["k"], seed)
+        s.n, s.min, s.max = int(d["n"]), float(d["min"]), float(d["max"])
+        s.levels = [np.asarray(a, dtype=np.float64) for a in d["levels"]]
+        return s
+
+class StreamingOutlierDetector:
+    """
+    Outlier fences and winsor bounds kept current on live bars, without re-reading history.
+    Per column it keeps a QuantileSketch (method="iqr", winsorize) and RunningMoments
+    (method="zscore") per bucket of `bucket_rows` rows. With window_buckets=None every bar
+    seen so far counts; with window_buckets=N the statistics cover the last N full buckets
+    plus the current one (a rolling window with bucket granularity; old buckets are dropped,
+    nothing is recomputed). merge() folds in a detector built on another partition.
+    """
+
+    def __init__(self, columns: Sequence[str], method: str = "iqr", k: float = 1.5, threshold: float = 3.0,
+                 winsor: Sequence[float] = (0.05, 0.95), sketch_k: int = 200,
+                 window_buckets: Optional[int] = None, bucket_rows: int = 10_000, seed: Optional[int] = None):
+        if method not in ("iqr", "zscore"):
+            raise ValueError("`method` must be 'iqr' or 'zscore'.")
+        self.columns = list(columns)
+        self.method, self.k, self.threshold = method, float(k), float(threshold)
+        self.winsor = (float(winsor[0]), float(winsor[1]))
+        self.sketch_k, self.bucket_rows, self.seed = int(sketch_k), int(bucket_rows), seed
+        self.window_buckets = window_buckets
+        self._closed: deque = deque(maxlen=window_buckets)
+        self._current = self._new_bucket()
+        self._merged: Optional[Dict] = None
+
+    def _new_bucket(self) -> Dict:
+        return {"rows": 0,
+                "sketch": {c: QuantileSketch(self.sketch_k, self.seed) for c in self.columns},
+                "moments": {c: RunningMoments() for c in self.columns}}
+
+    def update(self, df: pd.DataFrame) -> "StreamingOutlierDetector":
+        """Add new rows (a frame of bars; columns beyond `columns` are ignored)."""
+        start = 0
+        while start < len(df):
+            take = min(self.bucket_rows - self._current["rows"], len(df) - start)
+            part = df.iloc[start:start + take]
+            for c in self.columns:
+                values = part[c].to_numpy(dtype=np.float64, na_value=np.nan)
+                self._current["sketch"][c].update(values)
+                self._current["moments"][c].update(values)
+            self._current["rows"] += take
+            start += take
+            if self._current["rows"] >= self.bucket_rows:
+                self._closed.append(self._current)
+                self._current = self._new_bucket()
+        self._merged = None
+        return self
+
+    def merge(self, other: "StreamingOutlierDetector") -> "StreamingOutlierDetector":
+        """
+        Combine with a detector over another partition (same columns and settings). Its statistics
+        arrive as one closed bucket, older than the current one: the current bucket keeps filling
+        to `bucket_rows`, and with window_buckets the merged data expires as a single bucket.
+        """
+        if other.columns != self.columns or other.sketch_k != self.sketch_k:
+            raise ValueError("Can only merge detectors with the same columns and sketch_k.")
+        theirs, bucket = other._stats(), self._new_bucket()
+        for c in self.columns:
+            bucket["sketch"][c].merge(theirs["sketch"][c])
+            bucket["moments"][c].merge(theirs["moments"][c])
+        bucket["rows"] = theirs["rows"]
+        if bucket["rows"]:
+            self._closed.append(bucket)
+        self._merged = None
+        return self
+
+    def _stats(self) -> Dict:
+        if self._merged is None:
+            merged = self._new_bucket()
+            for b in list(self._closed) + [self._current]:
+                for c in self.columns:
+                    merged["sketch"][c].merge(b["sketch"][c])
+                    merged["moments"][c].merge(b["moments"][c])
+                merged["rows"] += b["rows"]
+            self._merged = merged
+        return self._merged
+
+    @property
+    def rows(self) -> int:
+        return self._stats()["rows"]
+
+    def bounds(self) -> pd.DataFrame:
+        """Current fences per column (rows "lower", "upper"), same layout as outlier_bounds()."""
+        st = self._stats()
+        out = {}
+        for c in self.columns:
+            if self.method == "iqr":
+                q1, q3 = st["sketch"][c].quantile([0.25, 0.75])
+                out[c] = (q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1))
+            else:
+                m = st["moments"][c]
+                sigma = m.std(ddof=0)
+                sigma = 1.0 if sigma == 0 else sigma
+                out[c] = (m.mean - self.threshold * sigma, m.mean + self.threshold * sigma)
+        return pd.DataFrame(out, index=["lower", "upper"])
+
+    def winsor_bounds(self) -> pd.DataFrame:
+        st = self._stats()
+        return pd.DataFrame({c: st["sketch"][c].quantile(list(self.winsor)) for c in self.columns},
+                            index=["lower", "upper"])
+
+    def flag(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Boolean mask of rows outside the current fences (does not update the statistics)."""
+        b = self.bounds()
+        values = df[self.columns]
+        return (values < b.loc["lower"]) | (values > b.loc["upper"])
+
+    def process(self, df: pd.DataFrame) -> pd.DataFrame:
+        """update(df) then flag(df): each batch is judged against everything seen so far, itself included."""
+        return self.update(df).flag(df)
+
+    def winsorize(self, df: pd.DataFrame) -> pd.DataFrame:
+        b = self.winsor_bounds()
+        out = df.copy()
+        out[self.columns] = df[self.columns].clip(lower=b.loc["lower"], upper=b.loc["upper"], axis=1)
+        return out
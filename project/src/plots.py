@@ -0,0 +1,83 @@
+# src/plots.py
+from __future__ import annotations
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Sequence, Tuple
+import numpy as np
+
+class LRUCache:
+    """Small thread-safe LRU map; get_or_create renders at most once per key under concurrency."""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            return None
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_create(self, key: Hashable, create: Callable[[], object]):
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)
+            if value is None:
+                with self._lock:
+                    self.misses += 1
+                value = create()
+                self.put(key, value)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+def plot_etag(key: Tuple) -> str:
+    """Strong ETag (unquoted) derived from the cache key (model version + parameters), known before rendering."""
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:20]
+
+def sweep_grid(features: Sequence[str], feature: str, lo: float, hi: float, n: int,
+               base: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (grid, X): `feature` swept over linspace(lo, hi, n), every other column held at `base`
+    (e.g. the training means) or 0 when base is None.
+    """
+    j = list(features).index(feature)
+    grid = np.linspace(lo, hi, n)
+    X = np.zeros((n, len(features))) if base is None else np.tile(np.asarray(base, dtype=float), (n, 1))
+    X[:, j] = grid
+    return grid, X
+
+def render_proba_curve(grid: np.ndarray, p_up: np.ndarray, threshold: float, feature: str,
+                       title: str, dpi: int = 150) -> bytes:
+    """PNG bytes of P(up) vs one feature (matplotlib Figure API: no pyplot state, thread-safe)."""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(5,3))
+    ax = fig.subplots()
+    ax.plot(grid, p_up)
+    ax.axhline(threshold, ls="--", color="gray")
+    ax.set_title(title)
+    ax.set_xlabel(feature); ax.set_ylabel("P(Up)")
+    buf = io.BytesIO(); fig.tight_layout(); fig.savefig(buf, format="png", dpi=dpi)
+    return buf.getvalue()
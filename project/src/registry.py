@@ -0,0 +1,292 @@
+# src/registry.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from .scorer import CompiledScorer
+
+# joblib / sklearn (via model_io) are imported only when a pickled bundle is actually needed:
+# serving a published version reads the NumPy-only scorer sidecar.
+
+REGISTRY_DIR = Path("model/registry")
+VERSION_RE = re.compile(r"[0-9a-f]{16}")
+
+class UnknownModelVersion(KeyError):
+    """A version id that is malformed or not stored in the registry."""
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+class ModelRegistry:
+    """
+    Immutable, content-addressed model bundles plus an atomic CURRENT pointer:
+        <root>/bundles/<version>.joblib   joblib dump (never rewritten)
+        <root>/bundles/<version>.json     metadata (features, threshold, trained_on, created_at)
+        <root>/bundles/<version>.scorer.json  compiled scorer (CompiledScorer.to_dict), if linear
+        <root>/CURRENT                    version id of the served model (replaced atomically)
+    The version id is the first 16 hex chars of the sha256 of the dumped bytes, so publishing the
+    same bundle twice yields the same version.
+    """
+
+    def __init__(self, root: Path = REGISTRY_DIR):
+        self.root = Path(root)
+        self.bundles = self.root / "bundles"
+        self.pointer = self.root / "CURRENT"
+
+    def path(self, version: str) -> Path:
+        return self.bundles / f"{version}.joblib"
+
+    def exists(self, version: str) -> bool:
+        """True for a well-formed version id (16 hex chars) with a stored bundle."""
+        return isinstance(version, str) and VERSION_RE.fullmatch(version) is not None \
+            and self.path(version).exists()
+
+    def require(self, version: str) -> str:
+        """`version` if it exists, else UnknownModelVersion: ids are never used as raw paths."""
+        if not self.exists(version):
+            raise UnknownModelVersion(f"Unknown model version '{version}'")
+        return version
+
+    def scorer_path(self, version: str) -> Path:
+        return self.bundles / f"{version}.scorer.json"
+
+    def save_scorer(self, version: str, scorer: CompiledScorer) -> Path:
+        path = self.scorer_path(version)
+        _atomic_write(path, json.dumps(scorer.to_dict()))
+        return path
+
+    def load_scorer(self, version: str) -> Optional[CompiledScorer]:
+        """The version's compiled scorer from its sidecar (no unpickling), or None if absent."""
+        self.require(version)
+        try:
+            return CompiledScorer.from_dict(json.loads(self.scorer_path(version).read_text()))
+        except FileNotFoundError:
+            return None
+
+    def publish(self, bundle: Dict, set_current: bool = True) -> str:
+        """Store `bundle` under its content hash (no-op if already stored); returns the version."""
+        import joblib
+        from .model_io import compile_bundle
+        self.bundles.mkdir(parents=True, exist_ok=True)
+        tmp = self.bundles / f".{uuid.uuid4().hex}.tmp"
+        joblib.dump({k: v for k, v in bundle.items() if k != "version"}, tmp)
+        h = hashlib.sha256()
+        with open(tmp, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        version = h.hexdigest()[:16]
+        if self.path(version).exists():
+            tmp.unlink()
+        else:
+            os.replace(tmp, self.path(version))
+            meta = {"version": version, "features": list(bundle["features"]),
+                    "threshold": float(bundle.get("threshold", 0.5)), "trained_on": bundle.get("trained_on"),
+                    "created_at": datetime.now(timezone.utc).isoformat(), **_feature_stats(bundle)}
+            _atomic_write(self.bundles / f"{version}.json", json.dumps(meta, indent=2))
+            try:
+                self.save_scorer(version, compile_bundle(bundle))
+            except ValueError:  # not a StandardScaler + LogisticRegression pipeline
+                pass
+        if set_current:
+            self.set_current(version)
+        return version
+
+    def set_current(self, version: str) -> None:
+        self.require(version)
+        self.root.mkdir(parents=True, exist_ok=True)
+        _atomic_write(self.pointer, version + "\n")
+
+    def current(self) -> Optional[str]:
+        try:
+            return self.pointer.read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self, version: str, mmap_mode: Optional[str] = "r") -> Dict:
+        """
+        Load a bundle; with mmap_mode='r' its numpy arrays are read-only memory maps of the file,
+        so every worker process serving the same version shares one copy in the page cache.
+        """
+        import joblib
+        bundle = joblib.load(self.path(self.require(version)), mmap_mode=mmap_mode)
+        bundle["version"] = version
+        return bundle
+
+    def meta(self, version: str) -> Dict:
+        return json.loads((self.bundles / f"{self.require(version)}.json").read_text())
+
+    def versions(self) -> List[Dict]:
+        """Metadata of every stored version, oldest first."""
+        metas = [json.loads(p.read_text()) for p in self.bundles.glob("*.json")
+                 if not p.name.endswith(".scorer.json")]
+        return sorted(metas, key=lambda m: m["created_at"])
+
+def _feature_stats(bundle: Dict) -> Dict[str, List[float]]:
+    """Training means / scales of the bundle's StandardScaler ({} if it has none)."""
+    scaler = getattr(bundle.get("pipeline"), "named_steps", {}).get("scaler")
+    mean, scale = getattr(scaler, "mean_", None), getattr(scaler, "scale_", None)
+    if mean is None or scale is None:
+        return {}
+    return {"feature_means": [float(v) for v in mean], "feature_scales": [float(v) for v in scale]}
+
+class LoadedModel:
+    """
+    A registry version ready to score. With fast=True and a scorer sidecar only NumPy is needed;
+    the pickled bundle (and sklearn) is loaded on first access to `.bundle` / `.pipeline`.
+    """
+    __slots__ = ("version", "features", "threshold", "scorer", "loaded_at", "_registry", "_bundle", "_stats")
+
+    def __init__(self, version: str, registry: ModelRegistry, fast: bool = True):
+        self.version = version
+        self._registry = registry
+        self._bundle: Optional[Dict] = None
+        self._stats: Optional[Dict[str, List[float]]] = None
+        self.scorer: Optional[CompiledScorer] = registry.load_scorer(version) if fast else None
+        if self.scorer is not None:
+            self.features: List[str] = self.scorer.features
+            self.threshold = self.scorer.threshold
+        else:
+            bundle = self.bundle
+            self.features = list(bundle["features"])
+            self.threshold = float(bundle.get("threshold", 0.5))
+            if fast:
+                from .model_io import compile_bundle
+                self.scorer = compile_bundle(bundle)
+                registry.save_scorer(version, self.scorer)
+        self.loaded_at = time.time()
+
+    @property
+    def bundle(self) -> Dict:
+        if self._bundle is None:
+            self._bundle = self._registry.load(self.version)
+        return self._bundle
+
+    @property
+    def pipeline(self):
+        return self.bundle["pipeline"]
+
+    def feature_stats(self) -> Dict[str, List[float]]:
+        """{"feature_means", "feature_scales"} from the registry metadata (or the bundle's scaler)."""
+        if self._stats is None:
+            try:
+                meta = self._registry.meta(self.version)
+            except FileNotFoundError:
+                meta = {}
+            stats = {k: meta[k] for k in ("feature_means", "feature_scales") if k in meta}
+            self._stats = stats or _feature_stats(self.bundle)
+        return self._stats
+
+    def predict_proba_up(self, X: np.ndarray) -> np.ndarray:
+        if self.scorer is not None:
+            return self.scorer.predict_proba_up(X)
+        return self.pipeline.predict_proba(X)[:, 1]
+
+    def score_one(self, x: np.ndarray) -> float:
+        if self.scorer is not None:
+            return self.scorer.score_one(x)
+        return float(self.pipeline.predict_proba(np.asarray(x).reshape(1, -1))[0, 1])
+
+class ModelHolder:
+    """
+    Serving-side view of a ModelRegistry.
+    - `current` is a plain attribute holding an immutable LoadedModel. Readers just read it (no
+      lock); a reload builds the new LoadedModel completely and then rebinds the attribute, so
+      in-flight requests finish on the model they started with and none are dropped.
+    - Up to `keep_warm` versions stay loaded (LRU) for A/B scoring and instant rollback.
+    - maybe_reload() re-reads CURRENT at most every `check_interval` seconds.
+    - An A/B split sends a stable `fraction` of routing keys to a candidate version.
+    """
+
+    def __init__(self, registry: ModelRegistry, keep_warm: int = 2, check_interval: float = 2.0,
+                 fast: bool = True):
+        self.registry = registry
+        self.keep_warm = max(1, int(keep_warm))
+        self.check_interval = float(check_interval)
+        self.fast = fast
+        self._warm: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()   # writers only (reload / warm-up / A/B changes)
+        self._last_check = 0.0
+        self.ab: Optional[tuple] = None  # (candidate version, fraction)
+        version = registry.current()
+        if version is None:
+            raise FileNotFoundError(f"No current model in {registry.root}; publish one first.")
+        self.current: LoadedModel = self.get(version)
+
+    def get(self, version: str) -> LoadedModel:
+        """
+        Warm model for `version`, loading it (and evicting the least recently used) if needed.
+        UnknownModelVersion unless `version` is a stored registry id.
+        """
+        warm = self._warm
+        model = warm.get(version)
+        if model is not None:
+            if next(reversed(warm)) != version:  # mark most recently used (copy-on-write, like a load)
+                with self._lock:
+                    if version in self._warm:
+                        warm = OrderedDict(self._warm)
+                        warm.move_to_end(version)
+                        self._warm = warm
+            return model
+        self.registry.require(version)
+        with self._lock:
+            model = self._warm.get(version)
+            if model is None:
+                model = LoadedModel(version, self.registry, fast=self.fast)
+                warm = OrderedDict(self._warm)
+                warm[version] = model
+                pinned = {getattr(self, "current", model).version, model.version}
+                if self.ab:
+                    pinned.add(self.ab[0])
+                for v in list(warm):
+                    if len(warm) <= self.keep_warm:
+                        break
+                    if v not in pinned:
+                        del warm[v]
+                self._warm = warm
+            return model
+
+    def reload(self) -> bool:
+        """Swap to the registry's CURRENT version if it changed; returns True on a swap."""
+        self._last_check = time.monotonic()
+        version = self.registry.current()
+        if version is None or version == self.current.version:
+            return False
+        self.current = self.get(version)
+        return True
+
+    def maybe_reload(self) -> bool:
+        if time.monotonic() - self._last_check < self.check_interval:
+            return False
+        return self.reload()
+
+    def set_ab(self, version: Optional[str], fraction: float = 0.0) -> None:
+        """Route `fraction` of keys to `version` (None clears the split; unknown ids raise)."""
+        if version is None:
+            self.ab = None
+            return
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("`fraction` must be in [0, 1].")
+        self.get(version)
+        self.ab = (version, float(fraction))
+
+    def pick(self, key: Optional[str] = None) -> LoadedModel:
+        """Model for a request: the A/B candidate for a stable share of keys, else current."""
+        ab, current = self.ab, self.current
+        if ab is None or key is None:
+            return current
+        bucket = int.from_bytes(hashlib.sha256(key.encode()).digest()[:4], "big") / 2**32
+        return self.get(ab[0]) if bucket < ab[1] else current
+
+    def warm_versions(self) -> List[str]:
+        return list(self._warm)
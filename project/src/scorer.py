@@ -0,0 +1,57 @@
+# src/scorer.py
+from __future__ import annotations
+import math
+from typing import Dict, List, Sequence
+import numpy as np
+
+class CompiledScorer:
+    """
+    Closed-form logistic scorer: p_up = sigmoid(x . w + b).
+    The StandardScaler is folded into w/b, so scoring needs NumPy only (no sklearn validation).
+    `params` holds [w_0 .. w_{k-1}, b] in one contiguous float64 array.
+    """
+    __slots__ = ("features", "threshold", "params", "coef", "intercept", "_b")
+
+    def __init__(self, features: List[str], params: np.ndarray, threshold: float = 0.5):
+        params = np.ascontiguousarray(params, dtype=np.float64)
+        if params.shape != (len(features) + 1,):
+            raise ValueError(f"Expected {len(features) + 1} parameters, got shape {params.shape}.")
+        self.features = list(features)
+        self.threshold = float(threshold)
+        self.params = params
+        self.coef = params[:-1]
+        self.intercept = params[-1:]
+        self._b = float(params[-1])
+
+    @classmethod
+    def from_linear(cls, features: List[str], coef: np.ndarray, intercept: float,
+                    mean: np.ndarray, scale: np.ndarray, threshold: float = 0.5) -> "CompiledScorer":
+        """Fold z = ((x - mean) / scale) . coef + intercept into z = x . w + b."""
+        coef = np.asarray(coef, dtype=np.float64).ravel()
+        w = coef / np.asarray(scale, dtype=np.float64)
+        b = float(intercept) - float(np.dot(w, np.asarray(mean, dtype=np.float64)))
+        return cls(features, np.append(w, b), threshold)
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef + self._b
+
+    def predict_proba_up(self, X: np.ndarray) -> np.ndarray:
+        """P(up) for a 2D (n_rows, n_features) array."""
+        z = self.decision_function(X)
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-z))
+
+    def score_one(self, x: Sequence[float]) -> float:
+        """P(up) for one row (1D array or (1, n_features)), without any array allocation."""
+        z = float(np.dot(self.coef, np.ravel(x))) + self._b
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+
+    def to_dict(self) -> Dict:
+        return {"features": self.features, "threshold": self.threshold, "params": self.params.tolist()}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "CompiledScorer":
+        return cls(d["features"], np.asarray(d["params"], dtype=np.float64), d.get("threshold", 0.5))
@@ -0,0 +1,255 @@
+# src/sentiment.py
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .cleaning import _parse_dates, detect_date_format
+from .instrument import span
+
+MARKET_TZ = "America/New_York"
+MARKET_CLOSE = "16:00"
+# additive per-(ticker, session) sums; every daily statistic is a ratio of these
+SUM_COLS = ["articles", "w_sum", "wscore_sum", "score_sum", "score_n", "overall_sum", "overall_n"]
+_DAY_BITS = 32  # composite key: ticker code << 32 | session index
+
+def sentiment_features(max_age: int = 2) -> List[str]:
+    """Columns SentimentIndex.join(..., max_age=max_age) adds; the ffill column carries the age limit."""
+    return ["sent_weighted", "sent_neutral0", f"sent_ffill{max_age}", "sent_articles", "sent_age"]
+
+SENTIMENT_FEATURES = sentiment_features()  # the default max_age=2 columns
+
+def session_days(dates: pd.Series, tz: str = MARKET_TZ) -> pd.Series:
+    """
+    Bar timestamps -> exchange session date (naive midnight). Tz-aware timestamps (e.g. the
+    UTC dates of the feature tables) are converted to `tz` first; naive ones are taken as is.
+    """
+    d = dates
+    if not pd.api.types.is_datetime64_any_dtype(d):
+        fmt = detect_date_format(d)
+        d = _parse_dates(d, fmt) if "%z" in fmt or fmt in ("ISO8601", "mixed") \
+            else pd.to_datetime(d, format=fmt, errors="coerce")
+    if isinstance(d.dtype, pd.DatetimeTZDtype):
+        d = d.dt.tz_convert(tz).dt.tz_localize(None)
+    return d.dt.normalize()
+
+def trading_calendar(dates: Iterable, tz: str = MARKET_TZ) -> pd.DatetimeIndex:
+    """Sorted unique session dates of a price table's `date` column."""
+    days = session_days(pd.Series(dates), tz).dropna()
+    return pd.DatetimeIndex(days.unique()).sort_values()
+
+def session_closes(calendar: pd.DatetimeIndex, close: str = MARKET_CLOSE, tz: str = MARKET_TZ) -> np.ndarray:
+    """UTC close instant (int64 ns) of every session: local date + close time, localized (DST-safe)."""
+    local = pd.DatetimeIndex(calendar) + pd.Timedelta(close + ":00")
+    return local.tz_localize(tz).tz_convert("UTC").asi8
+
+def article_frame(articles: pd.DataFrame, ticker: Optional[str] = None) -> pd.DataFrame:
+    """
+    Normalize Alpha Vantage article rows (data/raw/sentiment_alpha_articles_*.csv) to
+    ticker / published (naive UTC) / score / w / overall, with the same fallbacks as the daily file:
+    score = ticker_sentiment_score, else overall_sentiment_score; weight = relevance_score, else 1.
+    """
+    n = len(articles)
+    if "ticker" in articles.columns:
+        tick = articles["ticker"].astype(object).to_numpy()
+    elif ticker is not None:
+        tick = np.full(n, ticker, dtype=object)
+    else:
+        raise ValueError("Articles have no 'ticker' column; pass ticker=.")
+    if "published_utc" in articles.columns:
+        published = _parse_dates(articles["published_utc"])
+    elif "time_published" in articles.columns:  # 20240831T102400, UTC
+        published = pd.to_datetime(articles["time_published"].astype(str), format="%Y%m%dT%H%M%S",
+                                   errors="coerce", utc=True)
+    else:
+        raise ValueError("Articles need a 'published_utc' or 'time_published' column.")
+
+    def col(c: str) -> np.ndarray:
+        if c not in articles.columns:
+            return np.full(n, np.nan)
+        return pd.to_numeric(articles[c], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+    overall = col("overall_sentiment_score")
+    score = col("ticker_sentiment_score")
+    score = np.where(np.isnan(score), overall, score)
+    w = col("relevance_score")
+    w = np.where(np.isnan(w), 1.0, w)
+    published = published.dt.tz_convert("UTC").dt.tz_localize(None)  # naive UTC, stays datetime64
+    return pd.DataFrame({"ticker": tick, "published": published.to_numpy(), "score": score, "w": w,
+                         "overall": overall})
+
+def bucket_articles(published_ns: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """
+    Session index per article: the first session whose close is strictly after publication, so
+    after-close and weekend news count toward the next session. len(closes) = after the last
+    close (not yet assignable); -1 = before the close preceding the first session, or no time.
+    """
+    idx = np.searchsorted(closes, published_ns, side="right")
+    if len(closes):
+        idx[published_ns <= closes[0] - 86_400 * 10**9] = -1
+    idx[published_ns == np.iinfo(np.int64).min] = -1  # NaT
+    return idx
+
+def _sums(codes: np.ndarray, days: np.ndarray, arts: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Group articles by composite key -> (sorted unique keys, SUM_COLS matrix)."""
+    keys = (codes.astype(np.int64) << _DAY_BITS) | days.astype(np.int64)
+    uniq, inv = np.unique(keys, return_inverse=True)
+    score, w, overall = (arts[c].to_numpy() for c in ("score", "w", "overall"))
+    has_s, has_o = ~np.isnan(score), ~np.isnan(overall)
+    cols = [np.ones(len(keys)), np.where(has_s, w, 0.0), np.where(has_s, w * score, 0.0),
+            np.where(has_s, score, 0.0), has_s.astype(np.float64),
+            np.where(has_o, overall, 0.0), has_o.astype(np.float64)]
+    out = np.zeros((len(uniq), len(SUM_COLS)))
+    for j, v in enumerate(cols):
+        out[:, j] = np.bincount(inv, weights=v, minlength=len(uniq))
+    return uniq, out
+
+class SentimentIndex:
+    """
+    Article sentiment bucketed into trading sessions, kept as per-(ticker, session) sums under a
+    sorted int64 key (ticker code << 32 | session index), so
+
+      - update(new_articles) buckets the batch with one searchsorted over the session closes,
+        drops articles already seen (url + time_published + ticker), and adds the batch's sums
+        into the affected keys in place (new keys are inserted); other days are not touched;
+      - join(prices) is an as-of join: one searchsorted of the price rows' keys into the sorted
+        keys finds each row's latest sentiment session at or before it, for all tickers at once.
+
+    Articles published after the last close wait in `pending` until extend_calendar() adds the
+    session they belong to. The calendar only grows at the end, so session indices stay stable.
+
+        idx = SentimentIndex(trading_calendar(prices["date"]))
+        idx.update(pd.read_csv("data/raw/sentiment_alpha_articles_AAPL_20250823-1041.csv"))
+        feats = idx.join(prices)        # adds SENTIMENT_FEATURES
+    """
+
+    def __init__(self, calendar: Iterable, close: str = MARKET_CLOSE, tz: str = MARKET_TZ):
+        self.close, self.tz = close, tz
+        self.calendar = pd.DatetimeIndex(calendar).sort_values()
+        if self.calendar.has_duplicates:
+            raise ValueError("Calendar has duplicate sessions.")
+        self._closes = session_closes(self.calendar, close, tz)
+        self._tickers: Dict[str, int] = {}
+        self._keys = np.empty(0, dtype=np.int64)
+        self._sums = np.zeros((0, len(SUM_COLS)))
+        self._seen = np.empty(0, dtype=np.uint64)
+        self.pending = article_frame(pd.DataFrame({"ticker": [], "time_published": []}))
+
+    def _codes(self, tickers: np.ndarray, add: bool) -> np.ndarray:
+        inv, uniq = pd.factorize(tickers)
+        if add:
+            for t in uniq:
+                self._tickers.setdefault(t, len(self._tickers))
+        return np.append(np.array([self._tickers.get(t, -1) for t in uniq], dtype=np.int64), -1)[inv]
+
+    def _dedupe(self, articles: pd.DataFrame) -> pd.DataFrame:
+        key_cols = [c for c in ("ticker", "url", "time_published") if c in articles.columns]
+        if key_cols == ["ticker"] or not key_cols:
+            return articles
+        h = pd.util.hash_pandas_object(articles[key_cols], index=False).to_numpy()
+        keep = ~pd.Series(h).duplicated().to_numpy()
+        if len(self._seen):
+            pos = np.minimum(np.searchsorted(self._seen, h), len(self._seen) - 1)
+            keep &= self._seen[pos] != h
+        self._seen = np.sort(np.r_[self._seen, h[keep]])
+        return articles.loc[keep]
+
+    def _add(self, arts: pd.DataFrame) -> pd.DataFrame:
+        """Bucket normalized articles and fold their sums in; returns the affected (ticker, date)."""
+        days = bucket_articles(arts["published"].to_numpy().astype("datetime64[ns]").view(np.int64), self._closes)
+        later = days == len(self._closes)
+        self.pending = pd.concat([self.pending, arts.loc[later]], ignore_index=True) if later.any() else self.pending
+        ok = (days >= 0) & ~later
+        arts, days = arts.loc[ok], days[ok]
+        keys, sums = _sums(self._codes(arts["ticker"].to_numpy(), add=True), days, arts)
+        pos = np.searchsorted(self._keys, keys)
+        hit = pos < len(self._keys)
+        hit[hit] = self._keys[pos[hit]] == keys[hit]
+        self._sums[pos[hit]] += sums[hit]
+        if (~hit).any():
+            self._keys = np.insert(self._keys, pos[~hit], keys[~hit])
+            self._sums = np.insert(self._sums, pos[~hit], sums[~hit], axis=0)
+        return self._frame(keys)
+
+    def update(self, articles: pd.DataFrame, ticker: Optional[str] = None) -> pd.DataFrame:
+        """Add raw article rows; returns the daily rows of the sessions they changed."""
+        with span("sentiment.update", len(articles)):
+            return self._add(article_frame(self._dedupe(articles), ticker))
+
+    def extend_calendar(self, sessions: Iterable) -> pd.DataFrame:
+        """Append new sessions (after the last one) and bucket pending articles that now fit."""
+        new = pd.DatetimeIndex(sessions).sort_values()
+        new = new[~new.isin(self.calendar)]
+        if len(new) and len(self.calendar) and new[0] <= self.calendar[-1]:
+            raise ValueError(f"Sessions must extend the calendar: {new[0].date()} <= {self.calendar[-1].date()}.")
+        self.calendar = self.calendar.append(new)
+        self._closes = np.r_[self._closes, session_closes(new, self.close, self.tz)]
+        pending, self.pending = self.pending, self.pending.iloc[:0]
+        return self._add(pending)
+
+    def _frame(self, keys: np.ndarray) -> pd.DataFrame:
+        pos = np.searchsorted(self._keys, keys)
+        s = self._sums[pos]
+        names = np.array(sorted(self._tickers, key=self._tickers.get) or [""], dtype=object)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = pd.DataFrame({
+                "ticker": names[keys >> _DAY_BITS],
+                "date": self.calendar[keys & ((1 << _DAY_BITS) - 1)],
+                "articles": s[:, 0].astype(np.int64),
+                "sent_mean": np.where(s[:, 4] > 0, s[:, 3] / s[:, 4], np.nan),
+                "sent_overall_mean": np.where(s[:, 6] > 0, s[:, 5] / s[:, 6], np.nan),
+                "sent_weighted": np.where(s[:, 1] > 0, s[:, 2] / s[:, 1], np.nan),
+            })
+        return out
+
+    def daily(self) -> pd.DataFrame:
+        """Per (ticker, session) sentiment for every session with at least one article."""
+        return self._frame(self._keys)
+
+    def join(self, prices: pd.DataFrame, max_age: int = 2, ticker: Optional[str] = None,
+             on: str = "date") -> pd.DataFrame:
+        """
+        Copy of `prices` with
+          sent_weighted  same-session weighted sentiment (NaN without news that session),
+          sent_neutral0  the same with 0.0 for no news,
+          sent_ffill{max_age}  latest sentiment at most `max_age` sessions old, else 0.0
+                         (max_age=2 is the notebook's ffill(limit=2) policy),
+          sent_articles  same-session article count,
+          sent_age       sessions since the latest sentiment (NaN if none yet).
+        Rows whose date is not a calendar session get no sentiment. The added columns are
+        sentiment_features(max_age).
+        """
+        out = prices.copy()
+        with span("sentiment.join", len(out)):
+            if "ticker" in out.columns:
+                tick = out["ticker"].astype(object).to_numpy()
+            elif ticker is not None:
+                tick = np.full(len(out), ticker, dtype=object)
+            else:
+                raise ValueError("Prices have no 'ticker' column; pass ticker=.")
+            days = session_days(out[on], self.tz).to_numpy()
+            day = np.searchsorted(self.calendar.to_numpy(), days)
+            code = self._codes(tick, add=False)
+            valid = (day < len(self.calendar)) & (code >= 0) & ~np.isnat(days)
+            valid[valid] = self.calendar.to_numpy()[day[valid]] == days[valid]
+            key = (code << _DAY_BITS) | np.where(valid, day, 0)
+            pos = np.searchsorted(self._keys, key, side="right") - 1
+            found = valid & (pos >= 0)
+            found[found] = (self._keys[pos[found]] >> _DAY_BITS) == code[found]
+            age = np.where(found, day - (self._keys[np.maximum(pos, 0)] & ((1 << _DAY_BITS) - 1)), -1)
+            s = self._sums[np.maximum(pos, 0)] if len(self._keys) else np.zeros((len(out), len(SUM_COLS)))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                latest = np.where(found & (s[:, 1] > 0), s[:, 2] / s[:, 1], np.nan)
+            same = found & (age == 0)
+            out["sent_weighted"] = np.where(same, latest, np.nan)
+            out["sent_neutral0"] = np.nan_to_num(out["sent_weighted"].to_numpy(), nan=0.0)
+            out[f"sent_ffill{max_age}"] = np.where(found & (age <= max_age) & ~np.isnan(latest), latest, 0.0)
+            out["sent_articles"] = np.where(same, s[:, 0], 0).astype(np.int64)
+            out["sent_age"] = np.where(found, age, np.nan)
+        return out
+
+def align_sentiment(prices: pd.DataFrame, articles: pd.DataFrame, max_age: int = 2,
+                    ticker: Optional[str] = None) -> pd.DataFrame:
+    """One-shot: bucket `articles` on the sessions of `prices` and as-of join them (see SentimentIndex.join)."""
+    idx = SentimentIndex(trading_calendar(prices["date"]))
+    idx.update(articles, ticker=ticker)
+    return idx.join(prices, max_age=max_age, ticker=ticker)
@@ -0,0 +1,51 @@
+# src/stats.py
+from __future__ import annotations
+import math
+from typing import Dict
+import numpy as np
+
+# Streaming statistics with no project imports (NumPy only), shared by streaming.py and outliers.py.
+
+class RunningMoments:
+    """
+    Streaming count / mean / M2 over chunks (NaNs skipped): each chunk's moments are computed
+    with NumPy and merged with the pairwise Welford update (Chan et al.), so no pass needs the
+    full column in memory. Mergeable, so partial results from workers can be combined.
+    """
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.n, self.mean, self.m2 = int(n), float(mean), float(m2)
+
+    def update(self, values: np.ndarray) -> "RunningMoments":
+        # Chunk moments use pandas' two-pass nanvar arithmetic (NaNs zeroed, not dropped), so a
+        # single chunk reproduces Series.mean() / .std(ddof=0) exactly.
+        x = np.asarray(values, dtype=np.float64)
+        mask = np.isnan(x)
+        count = len(x) - int(mask.sum())
+        if count:
+            x = np.where(mask, 0.0, x)
+            mean = x.sum() / float(count)
+            sqr = (mean - x) ** 2
+            sqr[mask] = 0.0
+            self.merge(RunningMoments(count, float(mean), float(sqr.sum())))
+        return self
+
+    def merge(self, other: "RunningMoments") -> "RunningMoments":
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        return self
+
+    def std(self, ddof: int = 0) -> float:
+        return math.sqrt(self.m2 / (self.n - ddof)) if self.n > ddof else math.nan
+
+    def to_dict(self) -> Dict:
+        return {"n": self.n, "mean": self.mean, "m2": self.m2}
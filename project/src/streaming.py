@@ -0,0 +1,171 @@
+# src/streaming.py
+from __future__ import annotations
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+import numpy as np
+import pandas as pd
+from .cleaning import detect_date_format, sort_and_cast_ohlcv
+from .features import FeatureState
+from .instrument import span
+from .stats import RunningMoments
+
+DEFAULT_CHUNK_ROWS = 250_000
+OHLCV = ["open", "high", "low", "close", "volume"]
+
+def iter_chunks(path: Union[str, Path], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield a CSV or Parquet file as DataFrames of at most `chunk_rows` rows (Parquet: by row group)."""
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            yield from reader
+
+class OHLCVStream:
+    """
+    Chunk-at-a-time version of the cleaning + feature path
+        sort_and_cast_ohlcv -> ffill_ohlcv_by_date -> add_returns -> add_technical_features
+    for date-sorted input. State carried across chunk boundaries: the last date (order check),
+    the last valid OHLCV values (forward fill), the last padded close (pct_change), the rolling /
+    EWM accumulators of FeatureState (20-bar ring buffers, MACD/RSI EWM state), and running
+    moments of ret_1d for the global z-score. process() returns everything but ret_1d_z, which
+    needs those moments over the whole input (see stream_features).
+    """
+
+    def __init__(self):
+        self.features = FeatureState()
+        self.ret_moments = RunningMoments()
+        self.last_valid: Dict[str, object] = {}
+        self.last_close = math.nan  # padded, as pct_change sees it
+        self.last_date: Optional[pd.Timestamp] = None
+        self.date_format: Optional[str] = None  # detected on the first chunk, reused for the rest
+        self.rows = 0
+
+    def process(self, chunk: pd.DataFrame, price_col: str = "close", ret_col: str = "ret_1d") -> pd.DataFrame:
+        if self.date_format is None and "date" in chunk.columns and len(chunk) \
+                and not pd.api.types.is_datetime64_any_dtype(chunk["date"]):
+            self.date_format = detect_date_format(chunk["date"])
+        out = sort_and_cast_ohlcv(chunk, date_format=self.date_format)
+        dates = pd.to_datetime(out["date"], errors="coerce", utc=True)
+        if len(out) and self.last_date is not None and dates.iloc[0] < self.last_date:
+            raise ValueError(f"Input is not sorted by date across chunks: {dates.iloc[0]} < {self.last_date}.")
+
+        # ffill_ohlcv_by_date, seeded with the previous chunk's last valid values
+        cols = [c for c in OHLCV if c in out.columns]
+        out[cols] = out[cols].ffill()
+        for c in cols:
+            if c in self.last_valid and out[c].isna().any():
+                out[c] = out[c].fillna(self.last_valid[c])
+            valid = out[c].dropna()
+            if len(valid):
+                self.last_valid[c] = valid.iloc[-1]
+
+        # add_returns (raw % return); pct_change pads, so carry the last padded close
+        if price_col not in out.columns:
+            raise ValueError(f"Price column '{price_col}' not found.")
+        close = pd.Series(np.r_[self.last_close, out[price_col].to_numpy(dtype=np.float64, na_value=np.nan)])
+        padded = close.ffill()
+        out[ret_col] = (padded / padded.shift(1) - 1).to_numpy()[1:] * 100.0
+        if len(out):
+            self.last_close = float(padded.iloc[-1])
+            self.last_date = dates.iloc[-1]
+        self.ret_moments.update(out[ret_col].to_numpy())
+
+        self.rows += len(out)
+        feats = self.features.update_many(out)
+        # add_technical_features on an Int64 volume yields a nullable Float64 volume_z20 (NA while
+        # warming up); FeatureState computes in float64, so cast back to the in-memory dtype
+        if "volume_z20" in feats.columns and isinstance(out["volume"].dtype, pd.Int64Dtype):
+            feats["volume_z20"] = feats["volume_z20"].astype("Float64")
+        return feats
+
+def stream_features(src: Union[str, Path], out_path: Union[str, Path], chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                    winsorize_z: Optional[float] = None, price_col: str = "close", ret_col: str = "ret_1d",
+                    ret_z_col: str = "ret_1d_z") -> Dict:
+    """
+    Clean a date-sorted OHLCV CSV/Parquet file and add technical features out of core, writing
+    Parquet incrementally. Memory is bounded by `chunk_rows`, not by the file size.
+    Pass 1 streams chunks through OHLCVStream into a temporary Parquet file while accumulating
+    ret_1d moments. Pass 2 re-reads it row group by row group, adds ret_z_col from the Welford
+    mean/std (optionally clipped at ±winsorize_z like winsorize_zscores), and writes `out_path`
+    atomically.
+    Every column matches the in-memory path (read -> sort_and_cast_ohlcv -> ffill_ohlcv_by_date ->
+    add_returns -> add_technical_features) bit for bit, dtypes included (volume Int64, volume_z20
+    Float64). The one exception is ret_z_col when the input spans several chunks: its global
+    mean/std then come from merged chunk moments rather than pandas' whole-column sums, so it
+    agrees to within a few ulps.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    t0 = time.perf_counter()
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    pass1 = out_path.with_name(f".{out_path.name}.pass1.tmp")
+    final_tmp = out_path.with_name(f".{out_path.name}.tmp")
+
+    stream = OHLCVStream()
+    writer: Optional[pq.ParquetWriter] = None
+    final: Optional[pq.ParquetWriter] = None
+    n_chunks = 0
+    try:
+        with span("stream.pass1"):
+            for chunk in iter_chunks(src, chunk_rows):
+                with span("stream.chunk", len(chunk)):
+                    feats = stream.process(chunk, price_col, ret_col)
+                    table = pa.Table.from_pandas(feats, preserve_index=False,
+                                                 schema=writer.schema if writer else None)
+                    if writer is None:
+                        writer = pq.ParquetWriter(pass1, table.schema)
+                    writer.write_table(table, row_group_size=chunk_rows)
+                n_chunks += 1
+        if writer is None:
+            raise ValueError(f"No rows in {src}.")
+        writer.close()
+
+        mu, sd = stream.ret_moments.mean, stream.ret_moments.std(ddof=0)
+        with span("stream.pass2", stream.rows):
+            for batch in pq.ParquetFile(pass1).iter_batches(batch_size=chunk_rows):
+                df = batch.to_pandas()
+                z = (df[ret_col] - mu) / sd if sd and sd != 0 else np.nan
+                df.insert(df.columns.get_loc(ret_col) + 1, ret_z_col, z)
+                if winsorize_z is not None:
+                    df[ret_z_col] = df[ret_z_col].clip(lower=-winsorize_z, upper=winsorize_z)
+                table = pa.Table.from_pandas(df, preserve_index=False, schema=final.schema if final else None)
+                if final is None:
+                    final = pq.ParquetWriter(final_tmp, table.schema)
+                final.write_table(table, row_group_size=chunk_rows)
+            final.close()
+        os.replace(final_tmp, out_path)
+    finally:
+        for w in (writer, final):
+            if w is not None:
+                w.close()
+        for tmp in (pass1, final_tmp):
+            if tmp.exists():
+                tmp.unlink()
+    return {
+        "out_path": str(out_path),
+        "rows": stream.rows,
+        "chunks": n_chunks,
+        "chunk_rows": int(chunk_rows),
+        "ret_mean": mu,
+        "ret_std": sd,
+        "seconds": time.perf_counter() - t0,
+    }
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    ap = argparse.ArgumentParser(description="Out-of-core OHLCV cleaning + technical features to Parquet.")
+    ap.add_argument("src")
+    ap.add_argument("out")
+    ap.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    ap.add_argument("--winsorize-z", type=float, default=None)
+    args = ap.parse_args()
+    print(json.dumps(stream_features(args.src, args.out, args.chunk_rows, args.winsorize_z), indent=2))
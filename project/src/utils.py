@@ -1,3 +1,9 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
 import pandas as pd
 
 def get_summary_stats(df: pd.DataFrame, group_col: str, value_col: str) -> pd.DataFrame:
@@ -6,3 +12,184 @@ def get_summary_stats(df: pd.DataFrame, group_col: str, value_col: str) -> pd.Da
     grouped by a category column.
     """
     return df.groupby(group_col)[value_col].agg(["count", "mean", "std", "min", "max"])
+
+# ---- Mergeable partial aggregates (same summary over many partitions / files)
+
+Keys = Union[str, Sequence[str]]
+
+def _as_list(cols: Keys) -> List[str]:
+    return [cols] if isinstance(cols, str) else list(cols)
+
+def partial_stats(df: pd.DataFrame, group_cols: Keys, value_cols: Keys) -> pd.DataFrame:
+    """
+    Mergeable partials per group: columns (value_col, stat) with stat in n, sum, m2, min, max
+    (m2 = sum of squared deviations from the group mean, NaNs skipped).
+    Combine any number of these with merge_partials(); summarize() turns them into the
+    get_summary_stats table.
+    """
+    keys, cols = _as_list(group_cols), _as_list(value_cols)
+    vals = df[cols]
+    g = vals.groupby([df[k] for k in keys], sort=False, observed=True)
+    gf = vals.astype(np.float64).groupby([df[k] for k in keys], sort=False, observed=True)
+    dev = vals.astype(np.float64) - gf.transform("mean")
+    m2 = (dev * dev).groupby([df[k] for k in keys], sort=False, observed=True).sum()
+    parts = {"n": g.count(), "sum": gf.sum(), "m2": m2, "min": g.min(), "max": g.max()}
+    out = pd.concat(parts, axis=1).swaplevel(axis=1)
+    return out[[(c, s) for c in cols for s in parts]]
+
+def merge_partials(partials: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Combine partials over the same group keys / value columns. Counts, min and max combine
+    exactly; sums add; M2 uses the parallel Welford update
+        M2 = sum_i [M2_i + n_i * (mean_i - mean)^2].
+    """
+    frames = [p for p in partials if len(p)]
+    if not frames:
+        raise ValueError("No partials to merge.")
+    allp = pd.concat(frames)
+    if len(frames) == 1:
+        return allp
+    cols = list(dict.fromkeys(allp.columns.get_level_values(0)))
+    levels = list(range(allp.index.nlevels))
+    stat = {s: allp.xs(s, axis=1, level=1) for s in ("n", "sum", "m2", "min", "max")}
+    g = {s: v.groupby(level=levels, sort=False) for s, v in stat.items()}
+    n, total = g["n"].sum(), g["sum"].sum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_i = stat["sum"] / stat["n"]
+        mean = g["sum"].transform("sum") / g["n"].transform("sum")
+        between = (stat["n"] * (mean_i - mean) ** 2).where(stat["n"] > 0, 0.0)
+    m2 = (stat["m2"] + between).groupby(level=levels, sort=False).sum()
+    parts = {"n": n, "sum": total, "m2": m2, "min": g["min"].min(), "max": g["max"].max()}
+    out = pd.concat(parts, axis=1).swaplevel(axis=1)
+    return out[[(c, s) for c in cols for s in parts]]
+
+def summarize(partials: pd.DataFrame, ddof: int = 1) -> pd.DataFrame:
+    """
+    Partials -> count / mean / std / min / max, laid out like get_summary_stats (one value
+    column) or groupby(...)[cols].agg([...]) (several: columns (value_col, stat)).
+    """
+    cols = list(dict.fromkeys(partials.columns.get_level_values(0)))
+    out = {}
+    for c in cols:
+        p = partials[c]
+        n = p["n"].astype(np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (p["sum"] / n).where(n > 0)
+            std = np.sqrt(p["m2"] / (n - ddof)).where(n > ddof)
+        out[c] = pd.DataFrame({"count": n, "mean": mean, "std": std, "min": p["min"], "max": p["max"]})
+    res = out[cols[0]] if len(cols) == 1 else pd.concat(out, axis=1)
+    return res.sort_index()
+
+def _hive_base(path: Path) -> Path:
+    """Directory above the `key=value` segments of a Hive-partitioned file path."""
+    base = path.parent
+    while "=" in base.name:
+        base = base.parent
+    return base
+
+def _hive_keys(path: Path) -> Dict[str, object]:
+    """{key: value} from `key=value` directories (ints where they parse, as pyarrow infers)."""
+    keys: Dict[str, object] = {}
+    for part in path.relative_to(_hive_base(path)).parts[:-1]:
+        k, _, v = part.partition("=")
+        try:
+            keys[k] = int(v)
+        except ValueError:
+            keys[k] = v
+    return keys
+
+def _read_partition(path: Union[str, Path], columns: List[str]) -> pd.DataFrame:
+    """
+    Read `columns` of one file. Group keys that only exist in the path of a Hive-partitioned
+    store (`.../ticker=AAPL/year=2024/part-*.parquet`, see PartitionedDataset) are filled in
+    from the directory names.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.dataset as ds
+        dset = ds.dataset([str(path)], format="parquet", partitioning="hive",
+                          partition_base_dir=str(_hive_base(path)))
+        return dset.to_table(columns=columns).to_pandas()
+    header = pd.read_csv(path, nrows=0).columns
+    df = pd.read_csv(path, usecols=[c for c in columns if c in header])
+    keys = _hive_keys(path)
+    missing = [c for c in columns if c not in df.columns]
+    for c in missing:
+        if c not in keys:
+            raise ValueError(f"Column {c!r} is neither in {path} nor a partition key of its path.")
+        df[c] = keys[c]
+    return df[columns]
+
+def _dataset_files(root: Path) -> List[Path]:
+    """Part files of a directory: the committed ones of a PartitionedDataset, else every CSV / Parquet."""
+    manifest = root / "_manifest.json"
+    if manifest.exists():
+        return [root / f["path"] for f in json.loads(manifest.read_text())["files"]]
+    return sorted(p for p in root.rglob("*") if p.suffix.lower() in (".csv", ".parquet")
+                  and not p.name.startswith("."))
+
+def _file_partial(path: str, group_cols: List[str], value_cols: List[str]) -> pd.DataFrame:
+    return partial_stats(_read_partition(path, group_cols + value_cols), group_cols, value_cols)
+
+def _signature(path: Union[str, Path]) -> Tuple[int, int]:
+    st = Path(path).stat()
+    return st.st_size, st.st_mtime_ns
+
+class SummaryAggregator:
+    """
+    get_summary_stats over many partitions (files or frames) without concatenating them.
+    Each partition is reduced to its partials once (files in parallel worker processes);
+    result() merges the cached partials. refresh(paths) only reads files that are new or
+    changed since the last call and drops partitions whose files are gone.
+
+        agg = SummaryAggregator(["ticker", "year"], ["close", "volume"])
+        agg.refresh(["data/lake/prices"], n_jobs=8)   # PartitionedDataset root: ticker / year from the path
+        table = agg.result()
+    """
+
+    def __init__(self, group_cols: Keys, value_cols: Keys):
+        self.group_cols, self.value_cols = _as_list(group_cols), _as_list(value_cols)
+        self._partials: Dict[str, Tuple[Optional[Tuple[int, int]], pd.DataFrame]] = {}
+
+    def add_frame(self, name: str, df: pd.DataFrame) -> None:
+        """Add (or replace) an in-memory partition."""
+        self._partials[name] = (None, partial_stats(df, self.group_cols, self.value_cols))
+
+    def remove(self, name: str) -> None:
+        self._partials.pop(name, None)
+
+    def refresh(self, paths: Iterable[Union[str, Path]], n_jobs: Optional[int] = None) -> Dict[str, List[str]]:
+        """
+        Sync file partitions with `paths` (files, or directories such as a PartitionedDataset root,
+        which contribute their committed part files). n_jobs=None uses every CPU, n_jobs=1 reads
+        in-process. Returns the names that were added, updated and removed.
+        """
+        files: List[Path] = []
+        for p in map(Path, paths):
+            files.extend(_dataset_files(p) if p.is_dir() else [p])
+        wanted = {str(p): _signature(p) for p in files}
+        todo = [p for p, sig in wanted.items() if p not in self._partials or self._partials[p][0] != sig]
+        removed = [p for p, (sig, _) in self._partials.items() if sig is not None and p not in wanted]
+        for p in removed:
+            del self._partials[p]
+        added = [p for p in todo if p not in self._partials]
+        workers = max(1, min(n_jobs or os.cpu_count() or 1, len(todo)))
+        if workers == 1:
+            results = [_file_partial(p, self.group_cols, self.value_cols) for p in todo]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                results = list(ex.map(_file_partial, todo, [self.group_cols] * len(todo),
+                                      [self.value_cols] * len(todo)))
+        for p, part in zip(todo, results):
+            self._partials[p] = (wanted[p], part)
+        return {"added": added, "updated": [p for p in todo if p not in added], "removed": removed}
+
+    @property
+    def partitions(self) -> List[str]:
+        return list(self._partials)
+
+    def partials(self) -> pd.DataFrame:
+        return merge_partials(part for _, part in self._partials.values())
+
+    def result(self, ddof: int = 1) -> pd.DataFrame:
+        return summarize(self.partials(), ddof=ddof)
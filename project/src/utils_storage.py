@@ -1,5 +1,8 @@
+import io, json, os, threading, uuid
+from datetime import datetime
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Union
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 import pandas as pd
 
 def ensure_dir(path: Path) -> None:
@@ -9,12 +12,22 @@ def detect_format(path: Union[str, Path]) -> str:
     s = str(path).lower()
     if s.endswith(".csv"): return "csv"
     if s.endswith(".parquet") or s.endswith(".pq") or s.endswith(".parq"): return "parquet"
+    if Path(path).suffix == "": return "dataset"
     raise ValueError(f"Unsupported format: {path}")
 
-def write_df(df: pd.DataFrame, path: Union[str, Path]) -> Path:
+def write_df(df: pd.DataFrame, path: Union[str, Path], register: bool = False, **kwargs) -> Path:
+    """
+    Write by suffix: .csv / .parquet files, or a suffix-less directory as a partitioned
+    dataset (`kwargs` go to PartitionedDataset.write, e.g. mode="upsert").
+    register=True records a written file as the newest version in its directory's
+    OutputManifest (what model_io.latest_processed_path reads).
+    """
     path = Path(path)
-    ensure_dir(path)
     fmt = detect_format(path)
+    if fmt == "dataset":
+        PartitionedDataset(path).write(df, **kwargs)
+        return path
+    ensure_dir(path)
     if fmt == "csv":
         df.to_csv(path, index=False)
     else:
@@ -22,11 +35,19 @@ def write_df(df: pd.DataFrame, path: Union[str, Path]) -> Path:
             df.to_parquet(path)
         except Exception as e:
             raise RuntimeError("Parquet engine not available. Install 'pyarrow' or 'fastparquet'.") from e
+    if register:
+        OutputManifest(path.parent).register(path)
     return path
 
-def read_df(path: Union[str, Path]) -> pd.DataFrame:
+def read_df(path: Union[str, Path], **kwargs) -> pd.DataFrame:
+    """
+    Read by suffix: .csv / .parquet files, or a suffix-less directory as a partitioned
+    dataset (`kwargs` go to PartitionedDataset.read: columns, tickers, start, end, version).
+    """
     path = Path(path)
     fmt = detect_format(path)
+    if fmt == "dataset":
+        return PartitionedDataset(path).read(**kwargs)
     if fmt == "csv":
         cols = pd.read_csv(path, nrows=0).columns
         parse = ["date"] if "date" in cols else None
@@ -36,3 +57,233 @@ def read_df(path: Union[str, Path]) -> pd.DataFrame:
             return pd.read_parquet(path)
         except Exception as e:
             raise RuntimeError("Parquet engine not available. Install 'pyarrow' or 'fastparquet'.") from e
+
+def read_df_bytes(data: bytes, fmt: str) -> pd.DataFrame:
+    """Decode an in-memory Arrow IPC (stream or file) or Parquet payload into a DataFrame."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Arrow/Parquet payloads need 'pyarrow'.") from e
+    if fmt == "parquet":
+        return pq.read_table(io.BytesIO(data)).to_pandas()
+    if fmt == "arrow":
+        try:
+            return pa.ipc.open_stream(data).read_all().to_pandas()
+        except pa.ArrowInvalid:
+            return pa.ipc.open_file(pa.BufferReader(data)).read_all().to_pandas()
+    raise ValueError(f"Unsupported format: {fmt}")
+
+# ---- Partitioned Parquet dataset (ticker/year) with a versioned manifest
+
+def _price_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("date", pa.timestamp("ns", tz="UTC")),
+        ("open", pa.float64()), ("high", pa.float64()),
+        ("low", pa.float64()), ("close", pa.float64()),
+        ("volume", pa.int64()),
+    ])
+
+def _utc(ts) -> Optional[pd.Timestamp]:
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+class PartitionedDataset:
+    """
+    Hive-partitioned Parquet store: `<root>/ticker=<T>/year=<YYYY>/part-*.parquet`.
+    - Writes use an explicit schema (default: OHLCV, UTC timestamps) and zstd compression;
+      columns outside the schema are dropped, missing nullable ones are written as nulls.
+    - Every write commits a new manifest version (`_manifests/v000001.json`, ...) and then
+      atomically repoints `_manifest.json`. Readers only see files listed in a committed
+      manifest, so a half-finished write is never visible; `read(version=k)` time-travels.
+    - Reads prune files by ticker / date range from the manifest, then push the same
+      predicates and the column projection down to pyarrow.
+    Writers are serialized per process (thread lock); use one writer process per dataset.
+    """
+    PARTITIONS = ("ticker", "year")
+
+    def __init__(self, root: Union[str, Path], schema=None, compression: str = "zstd"):
+        self.root = Path(root)
+        self.schema = schema if schema is not None else _price_schema()
+        self.compression = compression
+        self._lock = threading.Lock()
+
+    # -- manifest
+
+    def manifest(self, version: Optional[int] = None) -> Dict:
+        path = self.root / "_manifest.json" if version is None else self.root / "_manifests" / f"v{version:06d}.json"
+        if not path.exists():
+            if version is None:
+                return {"version": 0, "files": []}
+            raise FileNotFoundError(f"No manifest version {version} in {self.root}")
+        return json.loads(path.read_text())
+
+    @property
+    def version(self) -> int:
+        return int(self.manifest()["version"])
+
+    def _commit(self, files: List[Dict], note: str) -> int:
+        version = self.version + 1
+        m = {"version": version, "created": datetime.now().isoformat(), "note": note,
+             "schema": [f"{f.name}:{f.type}" for f in self.schema],
+             "partitioning": list(self.PARTITIONS), "files": files}
+        (self.root / "_manifests").mkdir(parents=True, exist_ok=True)
+        text = json.dumps(m, indent=1)
+        _atomic_write_text(self.root / "_manifests" / f"v{version:06d}.json", text)
+        _atomic_write_text(self.root / "_manifest.json", text)
+        return version
+
+    def watermarks(self) -> Dict[str, pd.Timestamp]:
+        """Last stored date per ticker (from the manifest, no data read)."""
+        out: Dict[str, pd.Timestamp] = {}
+        for f in self.manifest()["files"]:
+            d = pd.Timestamp(f["max_date"])
+            if f["ticker"] not in out or d > out[f["ticker"]]:
+                out[f["ticker"]] = d
+        return out
+
+    def tickers(self) -> List[str]:
+        return sorted({f["ticker"] for f in self.manifest()["files"]})
+
+    # -- write
+
+    def _write_file(self, part: pd.DataFrame, ticker: str, year: int) -> Dict:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        cols = [f.name for f in self.schema]
+        missing = [f.name for f in self.schema if f.name not in part.columns and not f.nullable]
+        if missing:
+            raise ValueError(f"Columns required by schema are missing: {missing}")
+        table = pa.Table.from_pandas(part.reindex(columns=cols), schema=self.schema, preserve_index=False)
+        rel = Path(f"ticker={ticker}") / f"year={year}" / f"part-{uuid.uuid4().hex[:12]}.parquet"
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        pq.write_table(table, tmp, compression=self.compression)
+        os.replace(tmp, path)
+        return {"path": rel.as_posix(), "ticker": ticker, "year": int(year), "rows": int(len(part)),
+                "min_date": part["date"].min().isoformat(), "max_date": part["date"].max().isoformat()}
+
+    def write(self, df: pd.DataFrame, mode: str = "append") -> int:
+        """
+        Write a long frame with `ticker` and `date` columns; returns the new manifest version.
+        mode="append"    -> add files next to existing ones
+        mode="upsert"    -> merge into touched (ticker, year) partitions, one row per (ticker, date),
+                            new rows win
+        mode="overwrite" -> replace touched (ticker, year) partitions with `df`
+        """
+        if mode not in ("append", "upsert", "overwrite"):
+            raise ValueError("`mode` must be 'append', 'upsert' or 'overwrite'.")
+        if "ticker" not in df.columns or "date" not in df.columns:
+            raise ValueError("Dataset writes need 'ticker' and 'date' columns.")
+        df = df.copy()
+        df["date"] = pd.to_datetime(df["date"], utc=True)
+        df["_year"] = df["date"].dt.year
+        with self._lock:
+            files = list(self.manifest()["files"])
+            added: List[Dict] = []
+            for (ticker, year), part in df.groupby(["ticker", "_year"], sort=True):
+                ticker, year = str(ticker), int(year)
+                old = [f for f in files if f["ticker"] == ticker and f["year"] == year]
+                if mode == "upsert" and old:
+                    prev = self.read(tickers=[ticker], files=old)
+                    part = pd.concat([prev, part.drop(columns=["_year"])], ignore_index=True)
+                if mode != "append":
+                    files = [f for f in files if f not in old]
+                part = part.drop_duplicates(subset=["date"], keep="last").sort_values("date")
+                added.append(self._write_file(part, ticker, year))
+            return self._commit(files + added, note=f"{mode}: {len(added)} file(s)")
+
+    # -- read
+
+    def read(self, columns: Optional[Sequence[str]] = None, tickers: Optional[Iterable[str]] = None,
+             start=None, end=None, version: Optional[int] = None,
+             files: Optional[List[Dict]] = None) -> pd.DataFrame:
+        """
+        Read a (projected, filtered) frame. `tickers` / `start` / `end` (inclusive) are applied
+        to the manifest first (whole files skipped) and then pushed down to the Parquet scan.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        tickers = None if tickers is None else {str(t) for t in tickers}
+        start, end = _utc(start), _utc(end)
+        entries = files if files is not None else self.manifest(version)["files"]
+        keep = [f for f in entries
+                if (tickers is None or f["ticker"] in tickers)
+                and (start is None or pd.Timestamp(f["max_date"]) >= start)
+                and (end is None or pd.Timestamp(f["min_date"]) <= end)]
+        part_schema = pa.schema([("ticker", pa.string()), ("year", pa.int32())])
+        full_schema = pa.schema(list(self.schema) + list(part_schema))
+        if columns is not None:
+            columns = list(dict.fromkeys(columns))
+        if not keep:
+            names = columns or [f.name for f in full_schema]
+            return full_schema.empty_table().select(names).to_pandas()
+        dset = ds.dataset([str(self.root / f["path"]) for f in keep], schema=full_schema, format="parquet",
+                          partitioning=ds.partitioning(part_schema, flavor="hive"),
+                          partition_base_dir=str(self.root))
+        flt = None
+        for cond in (
+            ds.field("ticker").isin(sorted(tickers)) if tickers is not None else None,
+            ds.field("date") >= pa.scalar(start, type=self.schema.field("date").type) if start is not None else None,
+            ds.field("date") <= pa.scalar(end, type=self.schema.field("date").type) if end is not None else None,
+        ):
+            if cond is not None:
+                flt = cond if flt is None else flt & cond
+        out = dset.to_table(columns=columns, filter=flt).to_pandas()
+        sort_cols = [c for c in ("ticker", "date") if c in out.columns]
+        return out.sort_values(sort_cols, kind="mergesort").reset_index(drop=True) if sort_cols else out
+
+    def vacuum(self, keep_versions: int = 1) -> List[str]:
+        """Delete part files not referenced by the last `keep_versions` manifests."""
+        v = self.version
+        live = set()
+        for k in range(max(1, v - keep_versions + 1), v + 1):
+            live |= {f["path"] for f in self.manifest(k)["files"]}
+        removed = []
+        for p in self.root.glob("ticker=*/year=*/part-*.parquet"):
+            rel = p.relative_to(self.root).as_posix()
+            if rel not in live:
+                p.unlink()
+                removed.append(rel)
+        return removed
+
+# ---- Versioned outputs for flat files (replaces "newest mtime wins")
+
+class OutputManifest:
+    """
+    Versioned registry of flat output files in a directory (`<dir>/_manifest.json`).
+    `register(path)` records a new version; `latest(pattern)` returns the newest registered
+    file whose name matches the glob `pattern`, independent of filesystem mtimes.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.path = self.root / "_manifest.json"
+
+    def entries(self) -> List[Dict]:
+        return json.loads(self.path.read_text())["outputs"] if self.path.exists() else []
+
+    def register(self, path: Union[str, Path]) -> int:
+        path = Path(path)
+        outputs = self.entries()
+        version = max((e["version"] for e in outputs), default=0) + 1
+        outputs.append({"version": version, "file": path.name, "created": datetime.now().isoformat(),
+                        "bytes": path.stat().st_size})
+        self.root.mkdir(parents=True, exist_ok=True)
+        _atomic_write_text(self.path, json.dumps({"outputs": outputs}, indent=1))
+        return version
+
+    def latest(self, pattern: str = "*") -> Optional[Path]:
+        for e in sorted(self.entries(), key=lambda e: e["version"], reverse=True):
+            if fnmatch(e["file"], pattern) and (self.root / e["file"]).exists():
+                return self.root / e["file"]
+        return None
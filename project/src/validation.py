@@ -0,0 +1,66 @@
+# src/validation.py
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Request validation for the serving path: NumPy only at import (pandas loads on the first batch).
+
+def validate_features(payload: Dict[str, Any], required: List[str]) -> np.ndarray:
+    """
+    Expect payload like: {"features": {"gap_pct":0.01, "daily_range_pct":0.02, ...}}
+    Returns 2D array (1, n_features) ordered per `required`.
+    """
+    if "features" not in payload or not isinstance(payload["features"], dict):
+        raise ValueError("Payload must contain an object 'features' with named keys.")
+    feats = payload["features"]
+    missing = [f for f in required if f not in feats]
+    if missing:
+        raise ValueError(f"Missing feature(s): {missing}")
+    try:
+        row = [float(feats[f]) for f in required]
+    except Exception as e:
+        raise ValueError(f"All features must be numeric: {e}")
+    return np.array(row, dtype=float).reshape(1, -1)
+
+def validate_batch(payload: Any, required: List[str]) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """
+    Accepts any of:
+      - a list of feature dicts: [{"gap_pct":..., ...}, ...] (optionally under "rows")
+      - a columnar object: {"columns": {"gap_pct": [...], ...}} (one array per feature)
+      - a DataFrame (e.g. decoded from an Arrow/Parquet body)
+    Returns (X, errors): X is (n_rows, n_features) float64 ordered per `required`, with NaN
+    in rows that failed; errors[i] is None for a valid row or a message for a bad one.
+    Shape problems (wrong container, ragged columns) raise ValueError for the whole batch.
+    """
+    import pandas as pd
+    if isinstance(payload, dict) and "rows" in payload:
+        payload = payload["rows"]
+    if isinstance(payload, pd.DataFrame):
+        frame = payload.reindex(columns=required)
+    elif isinstance(payload, list):
+        if not all(isinstance(r, dict) for r in payload):
+            raise ValueError("Each row must be an object with named features.")
+        frame = pd.DataFrame.from_records(payload, columns=required)
+    elif isinstance(payload, dict) and isinstance(payload.get("columns"), dict):
+        cols = payload["columns"]
+        missing = [f for f in required if f not in cols]
+        if missing:
+            raise ValueError(f"Missing feature column(s): {missing}")
+        lengths = {len(cols[f]) if isinstance(cols[f], list) else -1 for f in required}
+        if len(lengths) != 1 or -1 in lengths:
+            raise ValueError("Columnar payload must have one array per feature, all the same length.")
+        frame = pd.DataFrame({f: cols[f] for f in required})
+    else:
+        raise ValueError("Payload must be a list of feature objects, {'rows': [...]} or {'columns': {...}}.")
+
+    # one coercion per column; anything non-numeric becomes NaN and is reported below
+    X = np.empty((len(frame), len(required)), dtype=float)
+    for j, f in enumerate(required):
+        X[:, j] = pd.to_numeric(frame[f], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    bad = ~np.isfinite(X)
+    errors: List[Optional[str]] = [None] * len(frame)
+    names = np.asarray(required)
+    for i in np.flatnonzero(bad.any(axis=1)):
+        errors[i] = f"Missing or non-numeric feature(s): {names[bad[i]].tolist()}"
+        X[i] = np.nan
+    return X, errors
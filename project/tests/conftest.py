@@ -0,0 +1,9 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+# Tests import the project as `src.*` (as app.py does) and the benchmark data generators.
+PROJECT = Path(__file__).resolve().parents[1]
+for p in (PROJECT, PROJECT / "benchmarks"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
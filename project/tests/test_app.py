@@ -0,0 +1,108 @@
+# tests/test_app.py
+import importlib
+import os
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model_io import DEFAULT_FEATURES, train_model
+from src.registry import ModelRegistry
+
+PROCESSED = Path(__file__).resolve().parents[1] / "data" / "processed" / "prices_with_tech_features_model.csv"
+
+@pytest.fixture(scope="module")
+def served(tmp_path_factory):
+    """app.py imported in a scratch working directory with its own registry (two versions)."""
+    root = tmp_path_factory.mktemp("serve")
+    df = pd.read_csv(PROCESSED, parse_dates=["date"]).sort_values("date").reset_index(drop=True)
+    registry = ModelRegistry(root / "model" / "registry")
+    other = registry.publish(train_model(df.iloc[:len(df) // 2], features=DEFAULT_FEATURES, threshold=0.5),
+                             set_current=False)
+    current = registry.publish(train_model(df, features=DEFAULT_FEATURES, threshold=0.44))
+    cwd = os.getcwd()
+    os.chdir(root)
+    sys.modules.pop("app", None)
+    try:
+        app = importlib.import_module("app")
+        yield app, current, other
+    finally:
+        sys.modules.pop("app", None)
+        os.chdir(cwd)
+
+@pytest.fixture
+def client(served):
+    return served[0].app.test_client()
+
+def _features(app):
+    return {"features": {f: 0.1 for f in app.holder.current.features}}
+
+@pytest.mark.parametrize("bad", ["../../x", "..%2F..%2Fx", "0123456789abcdef", "ABCDEF0123456789", "x" * 16])
+def test_unknown_or_malformed_model_is_404(served, client, bad):
+    app = served[0]
+    assert client.post(f"/predict?model={bad}", json=_features(app)).status_code == 404
+    assert client.post(f"/predict/batch?model={bad}", json=[_features(app)["features"]]).status_code == 404
+    assert client.get(f"/plot?model={bad}&hold=zero").status_code == 404
+    assert bad not in app.holder.warm_versions()
+
+def test_pinned_version(served, client):
+    app, current, other = served
+    r = client.post(f"/predict?model={other}", json=_features(app))
+    assert r.status_code == 200 and r.get_json()["version"] == other and r.get_json()["threshold"] == 0.5
+    assert client.post("/predict", json=_features(app)).get_json()["version"] == current
+
+def test_admin_endpoints_need_token(served, client, monkeypatch):
+    app, current, other = served
+    assert client.post("/models/current", json={"version": other}).status_code == 403
+    assert client.post("/models/ab", json={"version": other, "fraction": 0.5}).status_code == 403
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/models/current", json={"version": other}).status_code == 401
+    auth = {"Authorization": "Bearer s3cret"}
+    assert client.post("/models/current", json={"version": "../../x"}, headers=auth).status_code == 404
+    assert client.post("/models/ab", json={"version": "../../x", "fraction": 0.5}, headers=auth).status_code == 404
+    try:
+        r = client.post("/models/current", json={"version": other}, headers=auth)
+        assert r.status_code == 200 and app.holder.current.version == other
+    finally:
+        client.post("/models/current", json={"version": current}, headers=auth)
+    assert app.holder.current.version == current
+
+def test_predict_ticker(served, client):
+    from synthetic import make_ohlcv
+    app, current, other = served
+    df = make_ohlcv(60, seed=5)
+    bars = [{"date": d.isoformat(), "open": r.open, "high": r.high, "low": r.low, "close": r.close,
+             "volume": float(r.volume)} for d, r in zip(df["date"], df.itertuples())]
+    assert client.get("/predict/ticker/ZZZ").status_code == 404
+    assert client.post("/bars/zzz", json={"bars": bars[:5]}).status_code == 200
+    assert client.get("/predict/ticker/ZZZ").status_code == 409  # too few bars for the rolling features
+    client.post("/bars/zzz", json={"bars": bars[5:]})
+    r = client.get(f"/predict/ticker/ZZZ?model={other}")
+    assert r.status_code == 200 and r.get_json()["version"] == other
+    for bad in ("../../x", "0123456789abcdef"):
+        r = client.get(f"/predict/ticker/ZZZ?model={bad}")
+        assert r.status_code == 404 and "Unknown model version" in r.get_json()["error"]
+
+def test_coalesced_predict_reports_the_model_that_scored(served, monkeypatch):
+    import threading
+    import time
+    from src.batching import MicroBatcher
+    app, current, other = served
+    batcher = MicroBatcher(app.predict_proba_up, len(app.holder.current.features), max_wait_ms=300)
+    monkeypatch.setattr(app, "batcher", batcher)
+    payload = _features(app)
+    x = np.array([list(payload["features"].values())])
+    before, after = app.holder.current, app.holder.get(other)
+    out = {}
+    t = threading.Thread(target=lambda: out.update(r=app.app.test_client().post("/predict", json=payload)))
+    try:
+        t.start()
+        time.sleep(0.1)  # the row is queued in the batcher; hot-swap before it is scored
+        monkeypatch.setattr(app.holder, "current", after)
+        t.join()
+    finally:
+        batcher.close()
+    body = out["r"].get_json()
+    assert body["version"] == before.version and body["threshold"] == before.threshold
+    assert body["p_up"] == before.score_one(x) != after.score_one(x)
@@ -0,0 +1,98 @@
+# tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest import walk_forward, walk_forward_splits
+from src.feature_cache import FeatureMatrix
+from src.model_io import build_pipeline
+
+def _matrix(n=600, k=4, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, k))
+    y = (X @ rng.normal(size=k) + rng.normal(scale=2.0, size=n) > 0).astype(np.int8)
+    dates = pd.date_range("2020-01-01", periods=n, freq="D", tz="UTC").asi8
+    return FeatureMatrix(X, y, dates, [f"f{i}" for i in range(k)])
+
+def _run(fm, tmp_path, name, **kw):
+    res = walk_forward(fm, out_dir=tmp_path / name, cache_dir=tmp_path / "cache", **kw)
+    preds = pd.read_parquet(res["predictions_path"]).sort_values(["fold", "date"]).reset_index(drop=True)
+    return res, preds
+
+def _folds(res):
+    return pd.DataFrame(res["folds"]).drop(columns=["fit_seconds"])
+
+@pytest.mark.parametrize("window,train_size", [("expanding", None), ("rolling", 120)])
+@pytest.mark.parametrize("embargo", [0, 1, 5])
+def test_splits_cover_the_tail_without_overlap(window, train_size, embargo):
+    n, test_size = 500, 30
+    folds = walk_forward_splits(n, test_size, min_train=200, window=window, train_size=train_size,
+                                embargo=embargo)
+    assert folds[0].test_start == 200 + embargo and folds[-1].test_end == n
+    for prev, f in zip(folds, folds[1:]):
+        assert f.test_start == prev.test_end  # default step: back-to-back test blocks
+    for f in folds:
+        assert f.train_end == f.test_start - embargo and f.train_start < f.train_end
+        assert 0 < f.test_end - f.test_start <= test_size
+        if window == "expanding":
+            assert f.train_start == 0
+        else:
+            assert f.train_end - f.train_start == min(train_size, f.train_end)
+
+def test_splits_step_and_errors():
+    folds = walk_forward_splits(100, 10, min_train=50, step=5)
+    assert [f.test_start for f in folds] == list(range(50, 100, 5))
+    assert walk_forward_splits(50, 10, min_train=50) == []
+    with pytest.raises(ValueError, match="train_size"):
+        walk_forward_splits(100, 10, window="rolling")
+    with pytest.raises(ValueError, match="window"):
+        walk_forward_splits(100, 10, window="sliding")
+    with pytest.raises(ValueError, match="embargo"):
+        walk_forward_splits(100, 10, embargo=-1)
+
+def test_folds_train_only_on_their_window(tmp_path):
+    fm = _matrix()
+    res, preds = _run(fm, tmp_path, "full", test_size=50, min_train=300, window="rolling",
+                      train_size=200, embargo=2, n_jobs=1)
+    f = res["folds"][2]
+    pipe = build_pipeline().fit(fm.frame(slice(f["train_start"], f["train_end"])),
+                                fm.y[f["train_start"]:f["train_end"]])
+    ref = pipe.predict_proba(fm.frame(slice(f["test_start"], f["test_end"])))[:, 1]
+    np.testing.assert_array_equal(preds.loc[preds["fold"] == 2, "p_up"].to_numpy(), ref)
+
+    # rows after a fold's test block must not change it: rerun on a truncated matrix
+    cut = res["folds"][3]["test_end"]
+    head = FeatureMatrix(fm.X[:cut], fm.y[:cut], fm.dates[:cut], fm.features)
+    res_h, preds_h = _run(head, tmp_path, "head", test_size=50, min_train=300, window="rolling",
+                          train_size=200, embargo=2, n_jobs=1)
+    assert res_h["n_folds"] == 4
+    pd.testing.assert_frame_equal(preds_h, preds[preds["fold"] < 4])
+    pd.testing.assert_frame_equal(_folds(res_h), _folds(res).iloc[:4])
+
+def test_n_jobs_agree(tmp_path):
+    fm = _matrix()
+    kw = dict(test_size=40, min_train=200, embargo=1)
+    one, preds_1 = _run(fm, tmp_path, "one", n_jobs=1, **kw)
+    two, preds_2 = _run(fm, tmp_path, "two", n_jobs=2, **kw)
+    assert one["n_folds"] == two["n_folds"] == 10
+    pd.testing.assert_frame_equal(preds_1, preds_2)
+    pd.testing.assert_frame_equal(_folds(one), _folds(two))
+    assert one["summary"] == two["summary"]
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_warm_start_restarts_cold_per_chunk(tmp_path, n_jobs):
+    fm = _matrix()
+    kw = dict(test_size=40, min_train=200, embargo=1)
+    cold, preds_c = _run(fm, tmp_path, "cold", n_jobs=1, **kw)
+    warm, preds_w = _run(fm, tmp_path, f"warm{n_jobs}", warm_start=True, n_jobs=n_jobs, **kw)
+    assert warm["warm_start"] and warm["n_folds"] == cold["n_folds"]
+
+    # each worker's first fold is a cold fit; the rest start from the previous fold's solution
+    firsts = [int(c[0]) for c in np.array_split(np.arange(cold["n_folds"]), n_jobs)]
+    for i in firsts:
+        np.testing.assert_array_equal(preds_w.loc[preds_w["fold"] == i, "p_up"],
+                                      preds_c.loc[preds_c["fold"] == i, "p_up"])
+    np.testing.assert_allclose(preds_w["p_up"], preds_c["p_up"], atol=1e-3)
+    n_iter_c, n_iter_w = _folds(cold)["n_iter"], _folds(warm)["n_iter"]
+    assert n_iter_w.sum() < n_iter_c.sum()
+    assert (n_iter_w[firsts].to_numpy() == n_iter_c[firsts].to_numpy()).all()
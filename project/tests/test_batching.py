@@ -0,0 +1,95 @@
+# tests/test_batching.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+
+from src.batching import MicroBatcher
+
+class _Recorder:
+    """score_fn / model stand-in: p_up = offset + row sum; records the size of every call."""
+
+    def __init__(self, offset=0.0, n_features=3, fail=False):
+        self.offset, self.features, self.fail = offset, ["f"] * n_features, fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def predict_proba_up(self, X):
+        with self._lock:
+            self.calls.append(len(X))
+        if self.fail:
+            raise ValueError("boom")
+        return self.offset + X.sum(axis=1)
+
+    __call__ = predict_proba_up
+
+def _rows(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, 3))
+
+def test_concurrent_calls_coalesce():
+    fn = _Recorder()
+    b = MicroBatcher(fn, 3, max_batch=256, max_wait_ms=50)
+    X = _rows(64)
+    try:
+        with ThreadPoolExecutor(16) as ex:
+            got = list(ex.map(b.score, X))
+    finally:
+        b.close()
+    assert got == pytest.approx(X.sum(axis=1).tolist(), abs=0)
+    assert sum(fn.calls) == 64 and len(fn.calls) < 64
+    st = b.stats()
+    assert st["rows"] == 64 and st["batches"] == len(fn.calls) and st["queue_depth"] == 0
+
+def test_max_batch_splits():
+    fn = _Recorder()
+    b = MicroBatcher(fn, 3, max_batch=8, max_wait_ms=200)
+    X = _rows(20)
+    try:
+        futs = [b.submit(x) for x in X]
+        got = [f.result(timeout=5) for f in futs]
+    finally:
+        b.close()
+    assert got == pytest.approx(X.sum(axis=1).tolist(), abs=0)
+    assert sum(fn.calls) == 20 and max(fn.calls) == 8
+
+def test_errors_reach_every_caller_and_batcher_recovers():
+    fn = _Recorder(fail=True)
+    b = MicroBatcher(fn, 3, max_wait_ms=20)
+    try:
+        futs = [b.submit(x) for x in _rows(5)]
+        for f in futs:
+            with pytest.raises(ValueError, match="boom"):
+                f.result(timeout=5)
+        fn.fail = False
+        assert b.score(np.ones(3), timeout=5) == 3.0
+        with pytest.raises(ValueError, match="Expected 3 features"):
+            b.submit(np.ones(4))
+    finally:
+        b.close()
+    with pytest.raises(RuntimeError):
+        b.submit(np.ones(3))
+
+def test_rows_are_scored_by_their_own_model():
+    default, a, c = _Recorder(), _Recorder(offset=100.0), _Recorder(offset=200.0)
+    b = MicroBatcher(default, 3, max_wait_ms=100)
+    X = _rows(30)
+    models = [None, a, c] * 10
+    try:
+        futs = [b.submit(x, model=m) for x, m in zip(X, models)]
+        got = np.array([f.result(timeout=5) for f in futs])
+    finally:
+        b.close()
+    offsets = np.array([0.0 if m is None else m.offset for m in models])
+    assert np.array_equal(got, offsets + X.sum(axis=1))
+    assert sum(default.calls) == sum(a.calls) == sum(c.calls) == 10
+
+def test_model_error_does_not_fail_other_models():
+    good, bad = _Recorder(offset=1.0), _Recorder(fail=True)
+    b = MicroBatcher(good, 3, max_wait_ms=100)
+    try:
+        f_bad, f_good = b.submit(np.ones(3), model=bad), b.submit(np.ones(3), model=good)
+        assert f_good.result(timeout=5) == 4.0
+        with pytest.raises(ValueError):
+            f_bad.result(timeout=5)
+    finally:
+        b.close()
@@ -0,0 +1,154 @@
+# tests/test_cleaning.py
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cleaning import (CleaningPipeline, add_returns, drop_missing, ffill_ohlcv_by_date, fill_missing_median,
+                          normalize_data, sort_and_cast_ohlcv, winsorize_zscores)
+from synthetic import as_raw_csv_frame, make_ohlcv
+
+STEPS = [
+    sort_and_cast_ohlcv,
+    ffill_ohlcv_by_date,
+    (add_returns, {"price_col": "close"}),
+    (winsorize_zscores, {"columns": ["ret_1d"], "z": 1.0}),
+    (drop_missing, {"threshold": 0.2, "axis": "rows"}),
+    (fill_missing_median, {}),
+    (normalize_data, {"columns": None}),
+]
+
+def _raw(n=400, seed=0):
+    """read_csv-like input: offset date strings, shuffled rows, NaN OHLC cells, an extra numeric and text column."""
+    rng = np.random.default_rng(seed)
+    df = as_raw_csv_frame(make_ohlcv(n, seed=seed, nan_frac=0.05))
+    df["volume"] = df["volume"].astype(float)
+    df.loc[rng.choice(n, 10, replace=False), "volume"] = np.nan
+    df["extra"] = rng.normal(size=n)
+    df.loc[rng.choice(n, 120, replace=False), "extra"] = np.nan
+    df["ticker"] = "AAPL"
+    return df
+
+def _both(steps, df):
+    """(pipeline result or exception type, sequential result or exception type); df must not change."""
+    before = df.copy(deep=True)
+    results = []
+    for run in ("run", "run_sequential"):
+        try:
+            results.append(getattr(CleaningPipeline(steps), run)(df))
+        except (ValueError, TypeError) as e:
+            results.append(type(e))
+        pd.testing.assert_frame_equal(df, before, check_exact=True)
+    return results
+
+@pytest.mark.parametrize("mask", range(1, 2 ** len(STEPS)))
+def test_every_step_subset_matches_sequential(mask):
+    steps = [s for i, s in enumerate(STEPS) if mask >> i & 1]
+    fused, seq = _both(steps, _raw())
+    if isinstance(seq, type):
+        assert fused is seq
+    else:
+        pd.testing.assert_frame_equal(fused, seq, check_exact=True)
+
+def test_shuffled_orders_match_sequential():
+    rng = np.random.default_rng(1)
+    df = _raw(seed=3)
+    for _ in range(25):
+        steps = [STEPS[i] for i in rng.permutation(len(STEPS))]
+        fused, seq = _both(steps, df)
+        if isinstance(seq, type):
+            assert fused is seq
+        else:
+            pd.testing.assert_frame_equal(fused, seq, check_exact=True)
+
+@pytest.mark.parametrize("axis", ["rows", "cols"])
+def test_drop_missing_axes(axis):
+    steps = [sort_and_cast_ohlcv, (drop_missing, {"threshold": 0.1, "axis": axis}), fill_missing_median]
+    fused, seq = _both(steps, _raw())
+    pd.testing.assert_frame_equal(fused, seq, check_exact=True)
+
+def test_output_owns_its_buffers():
+    df = make_ohlcv(200, seed=4)  # already parsed and sorted: every column starts out borrowed
+    before = df.copy(deep=True)
+    out = CleaningPipeline([sort_and_cast_ohlcv, ffill_ohlcv_by_date]).run(df)
+    for c in ["open", "high", "low", "close", "ret_1d"]:
+        assert not np.shares_memory(out[c].to_numpy(), df[c].to_numpy()), c
+    out.loc[:, ["open", "close"]] = 0.0
+    pd.testing.assert_frame_equal(df, before, check_exact=True)
+
+def test_bad_step_fails_at_build():
+    with pytest.raises(ValueError, match="Unknown cleaning step"):
+        CleaningPipeline(["not_a_step"])
+    with pytest.raises(TypeError):
+        CleaningPipeline([(add_returns, {"nope": 1})])
+
+# ---- sort_and_cast_ohlcv / read_ohlcv: UTC dates, format detection, sort skipping, per-file cache
+
+def _bars(dates):
+    n = len(dates)
+    return pd.DataFrame({"date": dates, "open": np.arange(n, dtype=float), "high": np.arange(n) + 1.0,
+                         "low": np.arange(n) - 1.0, "close": np.arange(n) + 0.5, "volume": np.arange(n) * 10})
+
+@pytest.mark.parametrize("dates", [
+    ["2024-08-16 00:00:00-04:00", "2024-08-19 00:00:00-04:00"],                            # yfinance
+    ["2024-03-08 16:00:00-05:00", "2024-03-11 16:00:00-04:00", "2024-11-04 16:00:00-05:00"],  # DST
+    ["2024-08-16T09:30:00+05:30", "2024-08-16T12:00:00Z"],
+])
+def test_offset_dates_become_utc_instants(dates):
+    out = sort_and_cast_ohlcv(_bars(dates))
+    assert str(out["date"].dtype) == "datetime64[ns, UTC]"
+    expected = pd.Series([pd.Timestamp(d).tz_convert("UTC") for d in dates]).sort_values(ignore_index=True)
+    assert list(out["date"]) == list(expected)
+
+@pytest.mark.parametrize("dates,first", [
+    (["2024-08-16 09:30:00", "2024-08-19 09:30:00"], "2024-08-16 09:30:00+00:00"),
+    (["2024-08-16", "2024-08-19"], "2024-08-16 00:00:00+00:00"),
+    (["08/16/2024", "08/19/2024"], "2024-08-16 00:00:00+00:00"),
+])
+def test_naive_dates_are_taken_as_utc(dates, first):
+    out = sort_and_cast_ohlcv(_bars(dates))
+    assert str(out["date"].dtype) == "datetime64[ns, UTC]"
+    assert out["date"].iloc[0] == pd.Timestamp(first)
+
+def test_off_format_values_reparsed_and_bad_values_nat():
+    dates = ["2024-08-16 00:00:00-04:00", " 2024-08-19 00:00:00-04:00", "2024-08-20 00:00:00.5-04:00", "nope"]
+    out = sort_and_cast_ohlcv(_bars(dates))
+    assert list(out["date"].iloc[:3]) == [pd.Timestamp(d.strip()).tz_convert("UTC") for d in dates[:3]]
+    assert out["date"].isna().sum() == 1 and out["open"].iloc[-1] == 3.0  # NaT sorts last
+
+def test_sort_skipped_when_sorted_and_stable_otherwise(monkeypatch):
+    df = make_ohlcv(50, seed=5)
+    calls = []
+    orig = pd.DataFrame.sort_values
+    monkeypatch.setattr(pd.DataFrame, "sort_values", lambda self, *a, **k: calls.append(1) or orig(self, *a, **k))
+    out = sort_and_cast_ohlcv(df.set_axis(range(100, 150)))
+    assert calls == [] and out.index.equals(pd.RangeIndex(50))
+    pd.testing.assert_series_equal(out["close"], df["close"])
+
+    shuffled = pd.concat([df.iloc[25:], df.iloc[:25]])
+    shuffled.loc[shuffled.index[0], "date"] = df["date"].iloc[0]  # a tie with the first row of the second half
+    out = sort_and_cast_ohlcv(shuffled)
+    assert calls == [1] and out["date"].is_monotonic_increasing
+    assert out["close"].iloc[0] == df["close"].iloc[25] and out["close"].iloc[1] == df["close"].iloc[0]
+
+def test_read_ohlcv_matches_and_caches_format(tmp_path, monkeypatch):
+    from src import cleaning
+    raw = as_raw_csv_frame(make_ohlcv(300, seed=6))
+    raw.loc[7, "open"] = "n/a"  # malformed cell: typed read falls back to a coercing cast
+    path = tmp_path / "bars.csv"
+    raw.to_csv(path, index=False)
+    ref = sort_and_cast_ohlcv(pd.read_csv(path))
+
+    cleaning._DATE_FORMAT_CACHE.pop(str(path.resolve()), None)
+    pd.testing.assert_frame_equal(cleaning.read_ohlcv(path), ref, check_exact=True)
+    assert cleaning._DATE_FORMAT_CACHE[str(path.resolve())] == "%Y-%m-%d %H:%M:%S%z"
+
+    def no_detect(*a, **k):
+        raise AssertionError("format should come from the cache")
+    monkeypatch.setattr(cleaning, "detect_date_format", no_detect)
+    pd.testing.assert_frame_equal(cleaning.read_ohlcv(path), ref, check_exact=True)
+
+    pq = tmp_path / "bars.parquet"
+    pd.read_csv(path).to_parquet(pq, index=False)
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(cleaning.read_ohlcv(pq), ref, check_exact=True)
@@ -0,0 +1,20 @@
+# tests/test_feature_cache.py
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src.feature_cache import build_feature_matrix, load_feature_matrix
+from src.model_io import DEFAULT_FEATURES
+
+PROCESSED = Path(__file__).resolve().parents[1] / "data" / "processed" / "prices_with_tech_features_model.csv"
+
+def test_str_paths_build_then_hit(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    miss = load_feature_matrix(DEFAULT_FEATURES, path=str(PROCESSED), cache_dir=cache_dir)
+    hit = load_feature_matrix(DEFAULT_FEATURES, path=str(PROCESSED), cache_dir=cache_dir)
+    assert (tmp_path / "cache" / miss.key / "meta.json").exists() and hit.key == miss.key
+    assert isinstance(hit.X, np.memmap)
+
+    df = pd.read_csv(PROCESSED, parse_dates=["date"]).sort_values("date").reset_index(drop=True)
+    ref = build_feature_matrix(df, DEFAULT_FEATURES)
+    assert np.array_equal(hit.X, ref.X) and np.array_equal(hit.y, ref.y)
@@ -0,0 +1,70 @@
+# tests/test_feature_store.py
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cleaning import add_returns, sort_and_cast_ohlcv
+from src.feature_store import STORE_FEATURES, FeatureStore
+from src.features import FEATURE_COLUMNS, add_technical_features
+from synthetic import make_ohlcv
+
+AAPL = Path(__file__).resolve().parents[1] / "data" / "raw" / "api_yfinance_AAPL_20250817-2321.csv"
+# follow pandas' kernels step for step; the rolling terms are recomputed from the window
+EXACT = ["gap_pct", "daily_range_pct", "rsi_14", "macd", "macd_signal"]
+
+def _bars(df: pd.DataFrame):
+    return [{"date": d.isoformat(), "open": r.open, "high": r.high, "low": r.low, "close": r.close,
+             "volume": float(r.volume)} for d, r in zip(df["date"], df.itertuples())]
+
+def _frames():
+    aapl = add_returns(sort_and_cast_ohlcv(pd.read_csv(AAPL)))
+    aapl["volume"] = aapl["volume"].astype(float)
+    return {"aapl": aapl, "synthetic": make_ohlcv(400, seed=7)}
+
+@pytest.mark.parametrize("name", ["aapl", "synthetic"])
+def test_push_one_bar_at_a_time_matches_batch_every_row(name):
+    df = _frames()[name]
+    ref = add_technical_features(df)
+    assert STORE_FEATURES == FEATURE_COLUMNS
+    store = FeatureStore()
+    for i, bar in enumerate(_bars(df)):
+        got = store.push("T", bar)["features"]
+        exp = ref.loc[i, FEATURE_COLUMNS]
+        for f in FEATURE_COLUMNS:
+            g, e = got[f], exp[f]
+            if pd.isna(e):
+                assert g is None or np.isnan(g), (i, f, g)
+            elif f in EXACT:
+                assert g == e, (i, f, g, e)
+            else:
+                assert g == pytest.approx(e, rel=1e-9, abs=1e-12), (i, f, g, e)
+
+def test_chunked_pushes_match_single_bar_pushes():
+    df = make_ohlcv(200, seed=3)
+    bars = _bars(df)
+    one, chunked = FeatureStore(), FeatureStore()
+    for b in bars:
+        one.push("X", b)
+    for i in range(0, len(bars), 37):
+        chunked.push("x", bars[i:i + 37])
+    assert one.info("X") == chunked.info("X")
+
+def test_ewm_start_matches_pandas():
+    closes = [1.0, 2.0, 3.0]
+    store = FeatureStore()
+    for i, c in enumerate(closes):
+        store.push("E", {"date": f"2024-01-0{i + 1}", "open": c, "high": c, "low": c, "close": c, "volume": 1.0})
+    ema12 = pd.Series(closes).ewm(span=12, adjust=False).mean()
+    ema26 = pd.Series(closes).ewm(span=26, adjust=False).mean()
+    assert store.info("E")["features"]["macd"] == ema12.iloc[-1] - ema26.iloc[-1]
+
+def test_vector_errors():
+    store = FeatureStore()
+    with pytest.raises(KeyError):
+        store.vector("NOPE", ["gap_pct"])
+    store.push("S", _bars(make_ohlcv(10))[:10])
+    with pytest.raises(ValueError, match="Not enough history"):
+        store.vector("S", ["ma_ratio_5_20"])
+    with pytest.raises(ValueError, match="strictly increasing"):
+        store.push("S", _bars(make_ohlcv(10))[3])
@@ -0,0 +1,100 @@
+# tests/test_features.py
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cleaning import add_returns, sort_and_cast_ohlcv
+from src.features import (FEATURE_COLUMNS, FeatureState, add_technical_features, add_technical_features_panel,
+                          add_technical_features_wide)
+from synthetic import make_ohlcv
+
+AAPL = Path(__file__).resolve().parents[1] / "data" / "raw" / "api_yfinance_AAPL_20250817-2321.csv"
+
+def _frames():
+    aapl = add_returns(sort_and_cast_ohlcv(pd.read_csv(AAPL)))
+    return {"aapl": aapl, "synthetic": make_ohlcv(500, seed=11)}
+
+def _assert_same(got: pd.DataFrame, ref: pd.DataFrame):
+    for c in FEATURE_COLUMNS:
+        g, e = got[c].to_numpy(dtype=float), ref[c].to_numpy(dtype=float)
+        assert np.array_equal(g, e, equal_nan=True), c
+
+@pytest.mark.parametrize("name", ["aapl", "synthetic"])
+def test_update_matches_batch(name):
+    df = _frames()[name]
+    ref = add_technical_features(df)
+    state = FeatureState()
+    rows = [state.update(bar) for bar in df.to_dict("records")]
+    _assert_same(pd.DataFrame(rows), ref)
+
+@pytest.mark.parametrize("name", ["aapl", "synthetic"])
+def test_update_many_matches_batch(name):
+    df = _frames()[name]
+    ref = add_technical_features(df)
+    state = FeatureState()
+    parts = [state.update_many(df.iloc[i:i + 33]) for i in range(0, len(df), 33)]
+    _assert_same(pd.concat(parts, ignore_index=True), ref)
+
+def test_round_trip_partway(tmp_path):
+    df = _frames()["aapl"]
+    ref = add_technical_features(df)
+    cut = 120
+    state = FeatureState()
+    head = state.update_many(df.iloc[:cut])
+
+    restored = FeatureState.from_dict(state.to_dict())
+    loaded = FeatureState.load(state.save(tmp_path / "state.json"))
+    tails = [restored.update_many(df.iloc[cut:]),
+             pd.DataFrame([loaded.update(bar) for bar in df.iloc[cut:].to_dict("records")])]
+    for tail in tails:
+        _assert_same(pd.concat([head, tail], ignore_index=True), ref)
+
+def test_rejects_out_of_order_bars():
+    df = make_ohlcv(30)
+    state = FeatureState()
+    state.update_many(df.iloc[10:])
+    with pytest.raises(ValueError):
+        state.update_many(df.iloc[:5])
+
+def _panel(int64_volume=False):
+    """Three tickers on ragged calendars (different starts and lengths, one missing bar), shuffled."""
+    frames = []
+    for i, t in enumerate(["AAPL", "MSFT", "NVDA"]):
+        d = make_ohlcv(200 + 37 * i, seed=i, start=f"2000-01-03 00:{7 * i:02d}")
+        d["ticker"] = t
+        frames.append(d.drop(index=100) if t == "MSFT" else d)
+    df = pd.concat(frames).sample(frac=1.0, random_state=0)
+    if int64_volume:  # as sort_and_cast_ohlcv returns it
+        df["volume"] = df["volume"].astype("Int64")
+    return df
+
+@pytest.mark.parametrize("int64_volume", [False, True])
+def test_panel_matches_per_ticker(int64_volume):
+    df = _panel(int64_volume)
+    panel = add_technical_features_panel(df)
+    assert panel["ticker"].is_monotonic_increasing
+    for t, part in panel.groupby("ticker", sort=False):
+        ref = add_technical_features(df[df["ticker"] == t])
+        pd.testing.assert_frame_equal(part.reset_index(drop=True), ref, check_exact=True)
+
+def test_wide_matches_per_ticker_on_shared_calendar():
+    # Rule (see add_technical_features_wide): a NaN cell is a missing bar that still takes a
+    # window position, i.e. the same as add_technical_features over the ticker's rows reindexed
+    # to the shared calendar, with NaN rows where it has no bar.
+    df = _panel()
+    fields = {k: df.pivot(index="date", columns="ticker", values=k).sort_index()
+              for k in ("open", "high", "low", "close", "volume", "ret_1d")}
+    feats = add_technical_features_wide(fields)
+    calendar = fields["close"].index
+    for t in fields["close"].columns:
+        own = df[df["ticker"] == t].drop(columns="ticker").set_index("date")
+        ref = add_technical_features(own.reindex(calendar).rename_axis("date").reset_index())
+        for f in FEATURE_COLUMNS:
+            assert np.array_equal(feats[f][t].to_numpy(), ref[f].to_numpy(dtype=float), equal_nan=True), (t, f)
+    # MSFT's missing bar takes a position: its 5-bar mean is NaN from the gap until it leaves the window
+    msft = feats["ma_5"]["MSFT"].dropna()
+    gap = calendar.get_loc(calendar[(calendar > msft.index[0]) & (calendar < msft.index[-1])]
+                           .difference(msft.index)[0])
+    ma5 = feats["ma_5"]["MSFT"].iloc[gap - 1:gap + 6]
+    assert ma5.notna().tolist() == [True, False, False, False, False, False, True]
@@ -0,0 +1,113 @@
+# tests/test_ingest_api.py
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import ingest_api
+from src.ingest_api import fetch_with_retry, normalize_ohlcv, run_many
+from src.utils_storage import PartitionedDataset
+
+def _bars(start="2024-12-20", periods=30, seed=0):
+    """yfinance-shaped bars with naive dates (as in the CSV fixtures)."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+    return pd.DataFrame({"Date": pd.date_range(start, periods=periods, freq="B"), "Open": close,
+                         "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": rng.integers(1_000, 100_000, periods)})
+
+class FakeSource:
+    """In-memory PriceSource: serves `bars[ticker]` from `start` on, failing the first `fail[ticker]` calls."""
+    name = "fake"
+
+    def __init__(self, bars, fail=None):
+        self.bars, self.fail = dict(bars), dict(fail or {})
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch(self, ticker, period="1y", interval="1d", start=None):
+        with self._lock:
+            self.calls.append((ticker, start))
+            if self.fail.get(ticker, 0) > 0:
+                self.fail[ticker] -= 1
+                raise ConnectionError(f"{ticker}: connection reset")
+        df = self.bars[ticker]
+        if start is not None:
+            df = df[normalize_ohlcv(df)["date"] >= start.normalize()]
+        return df.copy()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(ingest_api.time, "sleep", delays.append)
+    return delays
+
+def test_normalize_dates_are_utc():
+    naive = normalize_ohlcv(_bars(periods=3))
+    assert str(naive["date"].dt.tz) == "UTC"
+    assert naive["date"].iloc[0] == pd.Timestamp("2024-12-20", tz="UTC")
+
+    ny = _bars(periods=3)
+    ny["Date"] = ny["Date"].dt.tz_localize("America/New_York")
+    out = normalize_ohlcv(ny)
+    assert str(out["date"].dt.tz) == "UTC" and out["date"].iloc[0] == ny["Date"].iloc[0]
+
+    text = _bars(periods=3).assign(Date=lambda d: d["Date"].dt.strftime("%Y-%m-%d"))
+    pd.testing.assert_frame_equal(normalize_ohlcv(text), naive)
+    assert (normalize_ohlcv(text)["date"] > pd.Timestamp("2024-12-20", tz="UTC")).tolist() == [False, True, True]
+
+def test_retry_backs_off_exponentially(sleeps):
+    src = FakeSource({"AAPL": _bars()}, fail={"AAPL": 2})
+    df, attempts = fetch_with_retry(src, "AAPL", retries=3, backoff=0.5)
+    assert attempts == 3 and len(df) == 30
+    assert sleeps == [0.5, 1.0]
+
+    src = FakeSource({"AAPL": _bars()}, fail={"AAPL": 5})
+    with pytest.raises(ConnectionError):
+        fetch_with_retry(src, "AAPL", retries=2, backoff=0.1)
+    assert len(src.calls) == 3 and sleeps[2:] == [0.1, 0.2]
+
+def test_failed_ticker_is_reported_not_raised(tmp_path, sleeps):
+    src = FakeSource({"AAPL": _bars(), "MSFT": _bars(seed=1)}, fail={"MSFT": 9})
+    report = run_many(["AAPL", "MSFT"], tmp_path, source=src, retries=1, backoff=0.01).set_index("ticker")
+    assert report.loc["AAPL", "status"] == "ok" and report.loc["AAPL", "attempts"] == 1
+    assert report.loc["MSFT", "status"] == "error" and report.loc["MSFT", "attempts"] == 0
+    assert "ConnectionError" in report.loc["MSFT", "error"]
+    assert PartitionedDataset(tmp_path).tickers() == ["AAPL"]
+
+def test_incremental_fetch_from_watermark(tmp_path):
+    full = {"AAPL": _bars(), "MSFT": _bars(seed=1)}  # spans the 2024/2025 partition boundary
+    first = FakeSource({t: b.iloc[:20] for t, b in full.items()})
+    report = run_many(["AAPL", "MSFT"], tmp_path, source=first)
+    assert report["rows"].tolist() == [20, 20] and report["watermark"].isna().all()
+    assert [s for _, s in first.calls] == [None, None]
+
+    ds = PartitionedDataset(tmp_path)
+    wm = ds.watermarks()["AAPL"]
+    assert wm == pd.Timestamp(full["AAPL"]["Date"].iloc[19], tz="UTC")
+
+    second = FakeSource(full)
+    report = run_many(["AAPL", "MSFT"], tmp_path, source=second).set_index("ticker")
+    assert dict(second.calls)["AAPL"] == wm  # fetch starts at the watermark day
+    assert report.loc["AAPL", "rows"] == 10 and report.loc["AAPL", "watermark"] == wm.isoformat()
+
+    third = run_many(["AAPL", "MSFT"], tmp_path, source=FakeSource(full))
+    assert (third["status"] == "up_to_date").all() and ds.version == report["version"].max()
+
+    stored = ds.read(tickers=["AAPL"]).sort_values("date").reset_index(drop=True)
+    ref = normalize_ohlcv(full["AAPL"])
+    pd.testing.assert_series_equal(stored["date"], ref["date"], check_dtype=False)
+    np.testing.assert_allclose(stored["close"], ref["close"])
+
+def test_full_refetch_upsert_is_idempotent(tmp_path):
+    src = FakeSource({"AAPL": _bars(), "MSFT": _bars(seed=1)})
+    run_many(["AAPL", "MSFT"], tmp_path, source=src, incremental=False)
+    ds = PartitionedDataset(tmp_path)
+    once = ds.read().sort_values(["ticker", "date"]).reset_index(drop=True)
+    for _ in range(2):
+        report = run_many(["AAPL", "MSFT", "AAPL"], tmp_path, source=src, incremental=False)
+        assert report["ticker"].tolist() == ["AAPL", "MSFT"] and (report["status"] == "ok").all()
+    again = ds.read().sort_values(["ticker", "date"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(again, once)
+    assert not again.duplicated(["ticker", "date"]).any() and len(again) == 60
+    assert sum(f["rows"] for f in ds.manifest()["files"]) == 60
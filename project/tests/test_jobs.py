@@ -0,0 +1,92 @@
+# tests/test_jobs.py
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import analysis
+from src.jobs import RESULT_FILE, JobRunner
+
+class Work:
+    """Job function that records its calls; blocks on `gate` and raises while `fail` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = False
+
+    def __call__(self, out_dir, **params):
+        self.calls.append(params)
+        self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("boom")
+        (out_dir / "report.txt").write_text("ok")
+        return {"out_dir": str(out_dir), **params}
+
+@pytest.fixture
+def runner(tmp_path):
+    work = Work()
+    r = JobRunner(work, tmp_path / "runs", max_workers=4)
+    r.work = work
+    yield r
+    work.gate.set()
+    r.shutdown()
+
+def test_unchanged_analysis_key_is_a_cache_hit(runner, tmp_path, monkeypatch):
+    data = tmp_path / "prices_with_tech_features_model.csv"
+    data.write_text("date,close\n2024-01-02,1.0\n")
+    monkeypatch.setattr(analysis, "latest_processed_path", lambda: data)
+    key = analysis.analysis_key(threshold=0.44)
+    assert analysis.analysis_key(threshold=0.44) == key
+    assert analysis.analysis_key(threshold=0.5) != key
+
+    first = runner.wait(runner.submit(key, threshold=0.44)["id"], timeout=5)
+    assert first["status"] == "done" and not first["cached"]
+    assert (tmp_path / "runs" / key / "report.txt").exists()
+    assert json.loads((tmp_path / "runs" / key / RESULT_FILE).read_text()) == first["result"]
+
+    again = runner.submit(analysis.analysis_key(threshold=0.44), threshold=0.44)
+    assert again["status"] == "done" and again["cached"] and again["id"] != first["id"]
+    assert again["result"] == first["result"] and len(runner.work.calls) == 1
+
+    # a fresh runner (e.g. after a restart) finds the result on disk
+    restarted = JobRunner(runner.work, tmp_path / "runs")
+    assert restarted.submit(key, threshold=0.44)["cached"] and len(runner.work.calls) == 1
+    restarted.shutdown()
+
+    data.write_text("date,close\n2024-01-02,1.0\n2024-01-03,1.1\n")  # new data version
+    new_key = analysis.analysis_key(threshold=0.44)
+    assert new_key != key
+    assert not runner.wait(runner.submit(new_key, threshold=0.44)["id"], timeout=5)["cached"]
+    assert len(runner.work.calls) == 2
+
+def test_failed_job_is_reported_and_not_cached(runner, tmp_path):
+    runner.work.fail = True
+    job = runner.wait(runner.submit("k1", x=1)["id"], timeout=5)
+    assert job["status"] == "failed" and job["error"] == "RuntimeError: boom"
+    assert job["result"] is None and job["finished_at"] >= job["started_at"]
+    assert runner.cached("k1") is None and not (tmp_path / "runs" / "k1" / RESULT_FILE).exists()
+
+    runner.work.fail = False  # a resubmit runs again instead of replaying the failure
+    retry = runner.wait(runner.submit("k1", x=1)["id"], timeout=5)
+    assert retry["status"] == "done" and retry["id"] != job["id"] and len(runner.work.calls) == 2
+    assert [j["status"] for j in runner.list()] == ["done", "failed"]
+
+def test_concurrent_submissions_share_one_run(runner):
+    runner.work.gate.clear()
+    with ThreadPoolExecutor(16) as ex:
+        jobs = list(ex.map(lambda _: runner.submit("same", x=1), range(32)))
+    assert len({j["id"] for j in jobs}) == 1
+    assert all(j["status"] in ("queued", "running") for j in jobs)
+
+    other = runner.submit("other", x=2)  # a different key runs alongside
+    assert other["id"] != jobs[0]["id"]
+    runner.work.gate.set()
+    done = runner.wait(jobs[0]["id"], timeout=5)
+    assert done["status"] == "done" and runner.wait(other["id"], timeout=5)["status"] == "done"
+    assert sorted(c["x"] for c in runner.work.calls) == [1, 2]
+
+    after = runner.submit("same", x=1)
+    assert after["cached"] and after["result"] == done["result"] and len(runner.work.calls) == 2
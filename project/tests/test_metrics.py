@@ -0,0 +1,72 @@
+# tests/test_metrics.py
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, precision_score, recall_score
+
+from src.metrics import SWEEP_METRICS, best_threshold, confusion_sweep, threshold_sweep
+
+def _scores(n=400, seed=0, decimals=2):
+    """Labels and scores rounded to `decimals`, so many rows tie on the same score."""
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 2, n)
+    p = np.round(np.clip(0.5 + 0.2 * (y - 0.5) + rng.normal(0, 0.2, n), 0, 1), decimals)
+    return y, p
+
+def _reference(y, p, t, cost_fp=1.0, cost_fn=1.0):
+    pred = (p >= t).astype(int)
+    tn, fp, fn, tp = confusion_matrix(y, pred, labels=[0, 1]).ravel()
+    return {
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "accuracy": accuracy_score(y, pred),
+        "precision": precision_score(y, pred, zero_division=0),
+        "recall": recall_score(y, pred, zero_division=0),
+        "f1": f1_score(y, pred, zero_division=0),
+        "youden_j": recall_score(y, pred, zero_division=0) - (fp / (fp + tn) if fp + tn else 0.0),
+        "expected_cost": (cost_fp * fp + cost_fn * fn) / len(y),
+    }
+
+@pytest.mark.parametrize("decimals", [1, 2, 6])
+def test_sweep_matches_sklearn_at_every_threshold(decimals):
+    y, p = _scores(decimals=decimals)
+    # every distinct score (ties included), midpoints, and thresholds outside [min, max]
+    thr = np.r_[np.unique(p), (np.unique(p)[:-1] + np.unique(p)[1:]) / 2, -0.5, 0.0, 1.0, 1.5]
+    sweep = threshold_sweep(y, p, thr, cost_fp=2.0, cost_fn=0.5)
+    np.testing.assert_array_equal(sweep["threshold"], thr)
+    for i, t in enumerate(thr):
+        ref = _reference(y, p, t, cost_fp=2.0, cost_fn=0.5)
+        for k, v in ref.items():
+            assert sweep[k][i] == pytest.approx(v, abs=1e-12), (k, t)
+
+def test_sweep_defaults_to_distinct_scores_and_edges():
+    y, p = _scores(decimals=1)
+    sweep = threshold_sweep(y, p)
+    np.testing.assert_array_equal(sweep["threshold"], np.unique(p))
+    low, high = threshold_sweep(y, p, [p.min() - 1, p.max() + 1])["recall"]
+    assert (low, high) == (1.0, 0.0)
+    edge = threshold_sweep(y, p, [p.max() + 1])
+    assert edge["precision"][0] == 0.0 and edge["f1"][0] == 0.0  # no positive predictions
+    assert edge["accuracy"][0] == pytest.approx(accuracy_score(y, np.zeros_like(y)))
+
+    one_class = confusion_sweep(np.zeros(5), np.linspace(0, 1, 5), [0.5])
+    assert (one_class["tp"][0], one_class["fp"][0], one_class["tn"][0]) == (0, 3, 2)
+    with pytest.raises(ValueError, match="same length"):
+        threshold_sweep(y, p[:-1])
+
+@pytest.mark.parametrize("metric", SWEEP_METRICS)
+def test_best_threshold_is_the_brute_force_optimum(metric):
+    y, p = _scores(decimals=1)
+    thr = np.unique(p)
+    vals = np.array([_reference(y, p, t, cost_fn=3.0)[metric] for t in thr])
+    best = vals.min() if metric == "expected_cost" else vals.max()
+    t, v = best_threshold(y, p, metric=metric, cost_fn=3.0)
+    assert v == pytest.approx(best, abs=1e-12)
+    assert t == thr[np.flatnonzero(np.isclose(vals, best, rtol=0, atol=1e-12))[0]]  # lowest of ties
+
+def test_best_threshold_ties_go_to_the_lowest_threshold():
+    y = np.array([0, 0, 1, 1])
+    p = np.array([0.1, 0.2, 0.8, 0.9])
+    # every threshold in (0.2, 0.8] separates the classes perfectly
+    assert best_threshold(y, p, "accuracy", thresholds=[0.7, 0.3, 0.8, 0.05, 0.95]) == (0.3, 1.0)
+    assert best_threshold(y, p, "expected_cost", thresholds=[0.8, 0.5]) == (0.5, 0.0)
+    with pytest.raises(ValueError, match="metric"):
+        best_threshold(y, p, "auc")
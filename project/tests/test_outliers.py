@@ -0,0 +1,92 @@
+# tests/test_outliers.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.outliers import (StreamingOutlierDetector, detect_outliers_frame, detect_outliers_iqr,
+                          detect_outliers_zscore, outlier_bounds, winsorize_frame, winsorize_series)
+
+COLS = ["a", "b", "c"]
+
+def _frame(n=600, seed=0, nullable=False):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"ticker": rng.choice(["AAPL", "MSFT", "NVDA"], n),
+                       "a": rng.standard_t(3, n), "b": rng.normal(5, 2, n), "c": rng.lognormal(0, 1, n)})
+    df.loc[rng.choice(n, 20, replace=False), "b"] = np.nan
+    df.loc[::50, "c"] = 40.0  # spikes
+    if nullable:
+        df[COLS] = df[COLS].astype("Float64")
+    return df
+
+@pytest.mark.parametrize("nullable", [False, True])
+@pytest.mark.parametrize("method", ["iqr", "zscore"])
+def test_detect_frame_matches_series(method, nullable):
+    df = _frame(nullable=nullable)
+    per_series = detect_outliers_iqr if method == "iqr" else detect_outliers_zscore
+    got = detect_outliers_frame(df, COLS, method=method)
+    for c in COLS:
+        pd.testing.assert_series_equal(got[c], per_series(df[c]), check_names=False)
+    by = detect_outliers_frame(df, COLS, method=method, by="ticker")
+    for _, part in df.groupby("ticker"):
+        for c in COLS:
+            pd.testing.assert_series_equal(by.loc[part.index, c], per_series(part[c]), check_names=False)
+
+@pytest.mark.parametrize("nullable", [False, True])
+def test_winsorize_frame_matches_series(nullable):
+    df = _frame(nullable=nullable)
+    got = winsorize_frame(df, COLS, 0.05, 0.95)
+    assert got["ticker"].equals(df["ticker"])
+    for c in COLS:
+        pd.testing.assert_series_equal(got[c], winsorize_series(df[c], 0.05, 0.95))
+    by = winsorize_frame(df, COLS, 0.1, 0.9, by="ticker")
+    for _, part in df.groupby("ticker"):
+        for c in COLS:
+            pd.testing.assert_series_equal(by.loc[part.index, c], winsorize_series(part[c], 0.1, 0.9))
+
+def _feed(det, df, step=37):
+    for i in range(0, len(df), step):
+        det.update(df.iloc[i:i + step])
+    return det
+
+def _assert_zscore_bounds(det, ref):
+    np.testing.assert_allclose(det.bounds().to_numpy(), outlier_bounds(ref, COLS, method="zscore").to_numpy(),
+                               rtol=1e-12)
+
+def test_merge_keeps_bucket_accounting():
+    df = _frame(n=680)
+    a = _feed(StreamingOutlierDetector(COLS, method="zscore", bucket_rows=100), df.iloc[:250])
+    b = _feed(StreamingOutlierDetector(COLS, method="zscore", bucket_rows=100), df.iloc[250:380])
+    a.merge(b)
+    _feed(a, df.iloc[380:])
+    assert [bk["rows"] for bk in a._closed] == [100, 100, 130, 100, 100, 100]
+    assert a._current["rows"] == 50 and a.rows == 680
+    _assert_zscore_bounds(a, df)
+    assert b.rows == 130  # the merged-in detector is left as it was
+
+def test_window_expires_oldest_buckets():
+    df = _frame(n=550)
+    det = _feed(StreamingOutlierDetector(COLS, method="zscore", bucket_rows=100, window_buckets=2), df)
+    assert det.rows == 250  # two full buckets (300..499) plus the current 50 rows
+    _assert_zscore_bounds(det, df.iloc[300:])
+
+def test_window_expires_merged_bucket_as_one():
+    df = _frame(n=400)
+    a = _feed(StreamingOutlierDetector(COLS, method="zscore", bucket_rows=100, window_buckets=2), df.iloc[:150])
+    b = _feed(StreamingOutlierDetector(COLS, method="zscore", bucket_rows=100), df.iloc[300:380])
+    a.merge(b)  # closed: [rows 0..99, b]
+    _feed(a, df.iloc[150:250])  # closes 100..199, which pushes out 0..99
+    _assert_zscore_bounds(a, pd.concat([df.iloc[300:380], df.iloc[100:250]]))
+    _feed(a, df.iloc[250:300])  # closes 200..299, which pushes out b
+    assert a.rows == 200
+    _assert_zscore_bounds(a, df.iloc[100:300])
+
+def test_sketch_quantiles_close():
+    df = _frame(n=20_000, seed=3)
+    det = _feed(StreamingOutlierDetector(COLS, bucket_rows=1000, winsor=(0.05, 0.95), seed=0), df, step=777)
+    w = det.winsor_bounds()
+    for c in COLS:
+        x = df[c].dropna()
+        lo, hi = (x <= w.loc["lower", c]).mean(), (x <= w.loc["upper", c]).mean()
+        assert abs(lo - 0.05) < 0.01 and abs(hi - 0.95) < 0.01, (c, lo, hi)
+    flags = det.flag(df)
+    assert list(flags.columns) == COLS and len(flags) == len(df)
@@ -0,0 +1,104 @@
+# tests/test_registry.py
+import json
+import hashlib
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model_io import DEFAULT_FEATURES, train_model
+from src.registry import ModelHolder, ModelRegistry, UnknownModelVersion
+
+PROCESSED = Path(__file__).resolve().parents[1] / "data" / "processed" / "prices_with_tech_features_model.csv"
+
+@pytest.fixture(scope="module")
+def bundles():
+    df = pd.read_csv(PROCESSED, parse_dates=["date"]).sort_values("date").reset_index(drop=True)
+    return [train_model(df, features=DEFAULT_FEATURES, threshold=t) for t in (0.4, 0.5, 0.6, 0.7)]
+
+@pytest.fixture
+def registry(tmp_path, bundles):
+    reg = ModelRegistry(tmp_path / "registry")
+    versions = [reg.publish(b, set_current=False) for b in bundles]
+    reg.set_current(versions[0])
+    return reg, versions
+
+def test_publish_is_content_addressed(tmp_path, bundles):
+    reg = ModelRegistry(tmp_path / "registry")
+    assert reg.current() is None
+    v = reg.publish(bundles[0])
+    assert reg.current() == v and len(v) == 16
+    assert hashlib.sha256(reg.path(v).read_bytes()).hexdigest()[:16] == v
+    created = reg.meta(v)["created_at"]
+    assert reg.publish(bundles[0], set_current=False) == v  # same bytes, same version, metadata untouched
+    assert reg.meta(v)["created_at"] == created and len(reg.versions()) == 1
+    meta = reg.meta(v)
+    assert meta["features"] == DEFAULT_FEATURES and meta["threshold"] == 0.4
+    assert len(meta["feature_means"]) == len(DEFAULT_FEATURES)
+    assert reg.load_scorer(v).threshold == 0.4
+    loaded = reg.load(v)
+    assert loaded["version"] == v and loaded["threshold"] == 0.4
+
+@pytest.mark.parametrize("bad", ["../../x", "0123456789abcdef", "ABCDEF0123456789", "abc", "", None])
+def test_unknown_versions_rejected(registry, bad):
+    reg, versions = registry
+    assert not reg.exists(bad)
+    for call in (reg.set_current, reg.load, reg.load_scorer, reg.meta, reg.require):
+        with pytest.raises(UnknownModelVersion):
+            call(bad)
+    holder = ModelHolder(reg)
+    with pytest.raises(KeyError):
+        holder.get(bad)
+    if bad is not None:  # None clears the split
+        with pytest.raises(KeyError):
+            holder.set_ab(bad, 0.5)
+    assert reg.current() == versions[0] and holder.ab is None
+
+def test_reload_swaps_current(registry):
+    reg, versions = registry
+    holder = ModelHolder(reg, check_interval=3600)
+    first = holder.current
+    assert first.version == versions[0] and holder.reload() is False
+    reg.set_current(versions[1])
+    assert holder.maybe_reload() is False  # within check_interval
+    assert holder.reload() is True
+    assert holder.current.version == versions[1] and holder.current.threshold == 0.5
+    assert first.version == versions[0]  # the old model object is left intact for in-flight requests
+
+def test_warm_set_is_lru(registry):
+    reg, versions = registry
+    holder = ModelHolder(reg, keep_warm=3)  # current = v0 (pinned)
+    holder.get(versions[1])
+    holder.get(versions[2])
+    assert holder.warm_versions() == [versions[0], versions[1], versions[2]]
+    holder.get(versions[1])  # hit: v1 becomes most recently used
+    assert holder.warm_versions() == [versions[0], versions[2], versions[1]]
+    holder.get(versions[3])  # evicts the least recently used unpinned version: v2
+    assert holder.warm_versions() == [versions[0], versions[1], versions[3]]
+    assert holder.get(versions[1]) is holder.get(versions[1])
+
+def test_ab_split(registry):
+    reg, versions = registry
+    holder = ModelHolder(reg, keep_warm=2)
+    with pytest.raises(ValueError):
+        holder.set_ab(versions[1], 1.5)
+    holder.set_ab(versions[1], 0.25)
+    keys = [f"user-{i}" for i in range(4000)]
+    picks = [holder.pick(k).version for k in keys]
+    assert [holder.pick(k).version for k in keys] == picks  # stable per key
+    assert abs(picks.count(versions[1]) / len(keys) - 0.25) < 0.03
+    assert holder.pick(None).version == versions[0]
+    holder.get(versions[2])
+    holder.get(versions[3])  # the A/B candidate stays warm (pinned) while others come and go
+    assert versions[1] in holder.warm_versions() and versions[0] in holder.warm_versions()
+    holder.set_ab(None)
+    assert holder.ab is None and {holder.pick(k).version for k in keys[:50]} == {versions[0]}
+
+def test_loaded_model_scores_like_pipeline(registry, bundles):
+    reg, versions = registry
+    holder = ModelHolder(reg)
+    X = np.random.default_rng(0).normal(size=(20, len(DEFAULT_FEATURES)))
+    ref = bundles[0]["pipeline"].predict_proba(pd.DataFrame(X, columns=DEFAULT_FEATURES))[:, 1]
+    assert np.max(np.abs(holder.current.predict_proba_up(X) - ref)) <= 1e-12
+    slow = ModelHolder(reg, fast=False).current
+    assert slow.scorer is None and np.max(np.abs(slow.predict_proba_up(pd.DataFrame(X, columns=DEFAULT_FEATURES)) - ref)) <= 1e-12
@@ -0,0 +1,55 @@
+# tests/test_scorer.py
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model_io import DEFAULT_FEATURES, compile_bundle, train_model
+from src.registry import ModelRegistry
+from src.scorer import CompiledScorer
+
+PROCESSED = Path(__file__).resolve().parents[1] / "data" / "processed" / "prices_with_tech_features_model.csv"
+TOL = 1e-12
+
+@pytest.fixture(scope="module")
+def bundle():
+    df = pd.read_csv(PROCESSED, parse_dates=["date"]).sort_values("date").reset_index(drop=True)
+    return train_model(df, features=DEFAULT_FEATURES, threshold=0.44)
+
+@pytest.fixture(scope="module")
+def rows(bundle):
+    df = pd.read_csv(PROCESSED)
+    real = df[DEFAULT_FEATURES].dropna().to_numpy(dtype=float)
+    scaler = bundle["pipeline"].named_steps["scaler"]
+    rng = np.random.default_rng(1)
+    wide = scaler.mean_ + rng.standard_normal((500, len(DEFAULT_FEATURES))) * 5 * scaler.scale_
+    return np.vstack([real, wide])
+
+def _ref(bundle, X):
+    return bundle["pipeline"].predict_proba(pd.DataFrame(X, columns=bundle["features"]))[:, 1]
+
+def test_batch_matches_pipeline(bundle, rows):
+    scorer = compile_bundle(bundle, check_tol=None)
+    assert np.max(np.abs(scorer.predict_proba_up(rows) - _ref(bundle, rows))) <= TOL
+
+def test_single_rows_match_pipeline(bundle, rows):
+    scorer = compile_bundle(bundle)
+    ref = _ref(bundle, rows)
+    for x, p in zip(rows, ref):
+        assert abs(scorer.score_one(x) - p) <= TOL
+        assert abs(scorer.score_one(x.reshape(1, -1)) - p) <= TOL
+
+def test_scorer_json_round_trip(bundle, rows, tmp_path):
+    scorer = compile_bundle(bundle)
+    restored = CompiledScorer.from_dict(json.loads(json.dumps(scorer.to_dict())))
+    assert restored.features == scorer.features and restored.threshold == scorer.threshold
+    assert np.array_equal(restored.predict_proba_up(rows), scorer.predict_proba_up(rows))
+
+    registry = ModelRegistry(tmp_path / "registry")
+    version = registry.publish(bundle)
+    assert registry.scorer_path(version).exists()
+    loaded = registry.load_scorer(version)
+    assert np.max(np.abs(loaded.predict_proba_up(rows) - _ref(bundle, rows))) <= TOL
+    for x in rows[:50]:
+        assert loaded.score_one(x) == scorer.score_one(x)
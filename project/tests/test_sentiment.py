@@ -0,0 +1,94 @@
+# tests/test_sentiment.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.sentiment import SENTIMENT_FEATURES, SentimentIndex, align_sentiment, sentiment_features
+
+WEEK = pd.date_range("2024-03-04", "2024-03-08", freq="B")  # Mon-Fri; 16:00 New York = 21:00 UTC
+
+def _articles(rows):
+    """(ticker, time_published UTC, score, relevance) -> Alpha Vantage article rows, one url each."""
+    return pd.DataFrame([{"ticker": t, "time_published": p, "url": f"https://news/{t}/{p}",
+                          "ticker_sentiment_score": s, "relevance_score": w,
+                          "overall_sentiment_score": s} for t, p, s, w in rows])
+
+def _prices(tickers, days):
+    return pd.DataFrame([{"ticker": t, "date": d, "close": 1.0} for t in tickers for d in days])
+
+def _row(df, ticker, day):
+    return df[(df["ticker"] == ticker) & (df["date"] == pd.Timestamp(day))].iloc[0]
+
+def test_after_close_and_weekend_news_go_to_the_next_session():
+    idx = SentimentIndex(WEEK)
+    idx.update(_articles([
+        ("AAPL", "20240304T140000", 0.2, 1.0),   # Mon 09:00 NY -> Mon
+        ("AAPL", "20240304T210000", 0.4, 1.0),   # exactly at the close -> Tue
+        ("AAPL", "20240304T213000", 0.6, 3.0),   # after the close -> Tue
+        ("AAPL", "20240303T230000", -0.5, 1.0),  # Sunday evening, within a day of Mon's close -> Mon
+        ("AAPL", "20240301T230000", 0.7, 1.0),   # before the session preceding the calendar -> dropped
+        ("AAPL", "20240309T150000", 0.9, 1.0),   # Saturday after the last close -> pending
+    ]))
+    daily = idx.daily().set_index("date")
+    assert list(daily.index) == [WEEK[0], WEEK[1]]
+    assert daily.loc[WEEK[0], "articles"] == 2
+    assert daily.loc[WEEK[0], "sent_weighted"] == pytest.approx((0.2 - 0.5) / 2)
+    assert daily.loc[WEEK[1], "sent_weighted"] == pytest.approx((0.4 + 3 * 0.6) / 4)
+    assert len(idx.pending) == 1
+
+    changed = idx.extend_calendar([pd.Timestamp("2024-03-11")])
+    assert len(idx.pending) == 0
+    assert list(changed["date"]) == [pd.Timestamp("2024-03-11")]
+    assert changed["sent_weighted"].tolist() == [pytest.approx(0.9)]
+    with pytest.raises(ValueError, match="extend the calendar"):
+        idx.extend_calendar([pd.Timestamp("2024-03-01")])
+
+def test_dedupe_across_updates_and_incremental_sums_match_one_shot():
+    rows = [("AAPL", f"202403{d:02d}T150000", s, 1.0 + d % 2) for d, s in
+            [(4, 0.1), (5, -0.3), (5, 0.2), (7, 0.5)]] + [("MSFT", "20240306T120000", -0.4, 0.5)]
+    one = SentimentIndex(WEEK)
+    one.update(_articles(rows))
+
+    inc = SentimentIndex(WEEK)
+    inc.update(_articles(rows[:3]))
+    changed = inc.update(_articles(rows[1:]))  # rows 1-2 again, plus the rest
+    assert sorted(zip(changed["ticker"], changed["date"])) == [("AAPL", WEEK[3]), ("MSFT", WEEK[2])]
+    inc.update(_articles(rows))
+    pd.testing.assert_frame_equal(inc.daily(), one.daily())
+
+    dup = SentimentIndex(WEEK)
+    dup.update(_articles(rows + rows))  # duplicates within one batch are dropped too
+    pd.testing.assert_frame_equal(dup.daily(), one.daily())
+
+def test_join_as_of_ages_and_unknown_tickers():
+    arts = _articles([("AAPL", "20240304T150000", 0.3, 1.0), ("AAPL", "20240307T150000", -0.2, 2.0)])
+    prices = _prices(["AAPL", "TSLA"], WEEK)
+    out = align_sentiment(prices, arts)
+    assert list(out.columns) == list(prices.columns) + SENTIMENT_FEATURES
+
+    mon, tue, wed, thu, fri = (_row(out, "AAPL", d) for d in WEEK)
+    assert (mon["sent_weighted"], mon["sent_articles"], mon["sent_age"]) == (pytest.approx(0.3), 1, 0)
+    assert np.isnan(tue["sent_weighted"]) and tue["sent_neutral0"] == 0.0 and tue["sent_articles"] == 0
+    assert [r["sent_age"] for r in (tue, wed, thu, fri)] == [1, 2, 0, 1]
+    assert [r["sent_ffill2"] for r in (tue, wed)] == [pytest.approx(0.3)] * 2
+    assert thu["sent_ffill2"] == pytest.approx(-0.2) and fri["sent_ffill2"] == pytest.approx(-0.2)
+
+    tsla = out[out["ticker"] == "TSLA"]  # never seen by the index: no sentiment, no error
+    assert tsla["sent_weighted"].isna().all() and tsla["sent_age"].isna().all()
+    assert (tsla["sent_neutral0"] == 0).all() and (tsla["sent_ffill2"] == 0).all()
+    assert (tsla["sent_articles"] == 0).all()
+
+def test_join_column_names_follow_max_age():
+    idx = SentimentIndex(WEEK)
+    idx.update(_articles([("AAPL", "20240304T150000", 0.3, 1.0)]))
+    out = idx.join(_prices(["AAPL"], WEEK), max_age=1)
+    assert sentiment_features(1)[2] == "sent_ffill1"
+    assert set(sentiment_features(1)) <= set(out.columns) and "sent_ffill2" not in out.columns
+    assert out["sent_ffill1"].tolist() == [pytest.approx(0.3)] * 2 + [0.0] * 3
+
+def test_join_ignores_non_session_dates():
+    idx = SentimentIndex(WEEK)
+    idx.update(_articles([("AAPL", "20240308T150000", 0.3, 1.0)]))
+    out = idx.join(_prices(["AAPL"], [WEEK[4], pd.Timestamp("2024-03-09")]))  # Saturday is no session
+    assert out["sent_age"].tolist()[0] == 0 and np.isnan(out["sent_age"].tolist()[1])
+    assert out["sent_ffill2"].tolist() == [pytest.approx(0.3), 0.0]
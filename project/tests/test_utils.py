@@ -0,0 +1,82 @@
+# tests/test_utils.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import SummaryAggregator, get_summary_stats, merge_partials, partial_stats, summarize
+from src.utils_storage import PartitionedDataset
+
+STATS = ["count", "mean", "std", "min", "max"]
+
+def _prices(tickers=("AAPL", "MSFT", "NVDA"), start="2022-06-01", periods=500, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for t in tickers:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+        frames.append(pd.DataFrame({
+            "ticker": t, "date": pd.date_range(start, periods=periods, freq="D", tz="UTC"),
+            "open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+            "volume": rng.integers(1_000, 100_000, periods),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def _assert_close(got: pd.DataFrame, ref: pd.DataFrame):
+    assert list(got.columns) == list(ref.columns)
+    assert got.index.equals(ref.index)
+    exact = [c for c in got.columns if c[-1] in ("count", "min", "max")]
+    pd.testing.assert_frame_equal(got[exact], ref[exact], check_dtype=False, check_index_type=False)
+    np.testing.assert_allclose(got.to_numpy(float), ref.to_numpy(float), rtol=1e-12)
+
+def test_merge_matches_single_pass():
+    df = _prices()
+    df.loc[::17, "close"] = np.nan
+    ref = df.groupby(["ticker"])[["close", "volume"]].agg(STATS)
+    parts = [partial_stats(df.iloc[i:i + 211], ["ticker"], ["close", "volume"]) for i in range(0, len(df), 211)]
+    _assert_close(summarize(merge_partials(parts)), ref)
+    one = summarize(merge_partials([partial_stats(df, "ticker", "close")]))
+    _assert_close(one, get_summary_stats(df, "ticker", "close"))
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_partitioned_dataset_keys_from_path(tmp_path, n_jobs):
+    root = tmp_path / "prices"
+    ds = PartitionedDataset(root)
+    df = _prices()
+    ds.write(df)
+    # upsert rewrites touched partitions; the superseded part files stay on disk
+    patch = df[df["date"] >= "2023-06-01"].copy()
+    patch["close"] *= 1.5
+    ds.write(patch, mode="upsert")
+
+    agg = SummaryAggregator(["ticker", "year"], ["close", "volume"])
+    agg.refresh([root], n_jobs=n_jobs)
+    full = ds.read()
+    ref = full.groupby(["ticker", "year"])[["close", "volume"]].agg(STATS)
+    _assert_close(agg.result(), ref)
+    assert len(agg.partitions) == len(ds.manifest()["files"])
+
+def test_csv_partition_keys_from_path(tmp_path):
+    df = _prices(tickers=("AAPL", "MSFT"))
+    df["year"] = df["date"].dt.year
+    for (t, y), part in df.groupby(["ticker", "year"]):
+        d = tmp_path / f"ticker={t}" / f"year={y}"
+        d.mkdir(parents=True)
+        part.drop(columns=["ticker", "year"]).to_csv(d / "part-0.csv", index=False)
+    agg = SummaryAggregator(["ticker", "year"], "close")
+    agg.refresh([tmp_path], n_jobs=1)
+    _assert_close(agg.result(), df.groupby(["ticker", "year"])["close"].agg(STATS))
+
+def test_incremental_refresh(tmp_path):
+    df = _prices(tickers=("AAPL",), periods=300)
+    paths = []
+    for i in range(3):
+        p = tmp_path / f"part{i}.parquet"
+        df.iloc[i * 100:(i + 1) * 100].to_parquet(p, index=False)
+        paths.append(p)
+    agg = SummaryAggregator("ticker", "close")
+    assert len(agg.refresh(paths[:2], n_jobs=1)["added"]) == 2
+    r = agg.refresh(paths, n_jobs=1)
+    assert (len(r["added"]), len(r["updated"]), len(r["removed"])) == (1, 0, 0)
+    _assert_close(agg.result(), get_summary_stats(df, "ticker", "close"))
+    r = agg.refresh(paths[1:], n_jobs=1)
+    assert len(r["removed"]) == 1
+    _assert_close(agg.result(), get_summary_stats(df.iloc[100:], "ticker", "close"))
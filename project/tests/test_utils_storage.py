@@ -0,0 +1,20 @@
+# tests/test_utils_storage.py
+import os
+import pandas as pd
+
+from src import model_io
+from src.utils_storage import OutputManifest, write_df
+
+def test_registered_write_wins_over_mtime(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_io, "PROC", tmp_path)
+    df = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=3), "x": [1.0, 2.0, 3.0]})
+
+    older = write_df(df, tmp_path / "prices_with_tech_features_model_b.csv")
+    assert OutputManifest(tmp_path).entries() == []
+    assert model_io.latest_processed_path() == older  # nothing registered: newest mtime
+
+    newer = write_df(df, tmp_path / "prices_with_tech_features_model_a.csv", register=True)
+    os.utime(older, (newer.stat().st_mtime + 60,) * 2)  # unregistered file is newer on disk
+    assert [e["file"] for e in OutputManifest(tmp_path).entries()] == [newer.name]
+    assert model_io.latest_processed_path() == newer
+    pd.testing.assert_frame_equal(model_io.load_latest_processed(), df)